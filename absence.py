@@ -0,0 +1,36 @@
+import sqlite3
+
+# Students with no Attendance row at all (PRESENT or ABSENT) for the given date.
+_MISSING_STUDENTS = """
+    FROM Students s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM Attendance a WHERE a.date = ? AND a.student_id = s.id
+    )
+"""
+
+
+def record_absences(conn, date_str, enqueue=None):
+    """
+    Marks every student without an attendance record on date_str as ABSENT.
+
+    Runs as one set-based INSERT ... SELECT in a single write transaction, so
+    running it twice for the same day inserts nothing the second time.
+    enqueue(conn, absentees, date_str), if given, runs inside the same transaction
+    (e.g. notifications.enqueue_absence_notices), so no absence loses its notice.
+    Returns [(student_id, full_name, guardian_email)] for the students marked now.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        absentees = conn.execute(
+            "SELECT s.id, s.first_name || ' ' || s.last_name, s.guardian_email" + _MISSING_STUDENTS,
+            (date_str,)).fetchall()
+        conn.execute(
+            "INSERT INTO Attendance (student_id, date, status) SELECT s.id, ?, 'ABSENT'" + _MISSING_STUDENTS,
+            (date_str, date_str))
+        if enqueue is not None:
+            enqueue(conn, absentees, date_str)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return absentees
@@ -0,0 +1,364 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+# --- SETTINGS ---
+SOUND_FOLDER = "sounds"
+SOUND_EXTENSIONS = (".mp3", ".ogg", ".wav")
+GPIO_PIN_SERVO = 17
+LCD_I2C_ADDRESS = 0x27
+SERVO_OPEN_DUTY = 7       # 90 Deg
+SERVO_CLOSED_DUTY = 2     # 0 Deg
+SERVO_MOVE_SECONDS = 0.5  # PWM is switched off after each move so the servo does not jitter
+DOOR_OPEN_SECONDS = 5.0
+LCD_MIN_INTERVAL = 0.2    # I2C writes closer together than this are merged
+
+
+class ActuatorScheduler:
+    """
+    The one thread that drives the door, LCD and audio.
+
+    Work is queued as timed events (run func(*args) at a given time); nothing
+    sleeps on the caller's thread. All device state is only touched from this
+    thread, so the devices need no locks of their own.
+    """
+
+    def __init__(self):
+        self._events = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def schedule(self, delay, func, *args):
+        with self._cond:
+            heapq.heappush(self._events, (time.monotonic() + delay, next(self._seq), func, args))
+            self._cond.notify()
+
+    def call(self, func, *args):
+        self.schedule(0.0, func, *args)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and (not self._events or self._events[0][0] > time.monotonic()):
+                    timeout = self._events[0][0] - time.monotonic() if self._events else None
+                    self._cond.wait(timeout)
+                if not self._running:
+                    return
+                _, _, func, args = heapq.heappop(self._events)
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"HARDWARE ERROR: {e}")
+
+    def stop(self, drain_seconds=0.0):
+        """Runs events due within drain_seconds (e.g. closing the door), then stops."""
+        deadline = time.monotonic() + drain_seconds
+        while drain_seconds:
+            with self._cond:
+                if not self._events or self._events[0][0] > deadline:
+                    break
+            time.sleep(0.05)
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=2)
+
+
+# --- DEVICE BACKENDS ---
+# Hardware backends import their libraries on creation; the Sim* backends record
+# what they were asked to do so the whole subsystem runs without a Pi.
+
+class GpioServo:
+    def __init__(self, pin=GPIO_PIN_SERVO):
+        import RPi.GPIO as GPIO
+
+        self._gpio = GPIO
+        self._pin = pin
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(pin, GPIO.OUT)
+        self._pwm = GPIO.PWM(pin, 50)
+        self._pwm.start(0)
+
+    def set_duty(self, duty):
+        self._pwm.ChangeDutyCycle(duty)
+
+    def close(self):
+        self._pwm.stop()
+        self._gpio.cleanup(self._pin)  # only our pin: other doors may share the GPIO header
+
+
+class SimServo:
+    def __init__(self):
+        self.events = []  # (monotonic time, duty)
+
+    def set_duty(self, duty):
+        self.events.append((time.monotonic(), duty))
+
+    def close(self):
+        pass
+
+
+class I2CLcd:
+    def __init__(self, address=LCD_I2C_ADDRESS):
+        from RPLCD.i2c import CharLCD
+
+        self._lcd = CharLCD('PCF8574', address, auto_linebreaks=True)
+        self._lcd.backlight_enabled = True
+
+    def show(self, line1, line2):
+        self._lcd.clear()
+        self._lcd.cursor_pos = (0, 0)
+        self._lcd.write_string(line1[:16])
+        self._lcd.cursor_pos = (1, 0)
+        self._lcd.write_string(line2[:16])
+
+    def close(self):
+        self._lcd.clear()
+
+
+class SimLcd:
+    def __init__(self):
+        self.writes = []  # (monotonic time, line1, line2)
+
+    def show(self, line1, line2):
+        self.writes.append((time.monotonic(), line1[:16], line2[:16]))
+
+    def close(self):
+        pass
+
+
+def sound_key(name):
+    """'Ada Lovelace' -> 'adalovelace', the file name (without extension) of a student's greeting."""
+    return name.lower().replace(" ", "")
+
+
+class PygameAudio:
+    """Plays preloaded pygame.mixer.Sound objects; files are decoded once and cached."""
+
+    def __init__(self, folder=SOUND_FOLDER):
+        import pygame
+
+        pygame.mixer.init()
+        self._pygame = pygame
+        self.folder = folder
+        self._sounds = {}
+
+    def preload(self):
+        if not os.path.isdir(self.folder):
+            return 0
+        for filename in os.listdir(self.folder):
+            key, ext = os.path.splitext(filename)
+            if ext.lower() in SOUND_EXTENSIONS and key not in self._sounds:
+                self._sounds[key] = self._pygame.mixer.Sound(os.path.join(self.folder, filename))
+        return len(self._sounds)
+
+    def _sound(self, key):
+        if key not in self._sounds:
+            for ext in SOUND_EXTENSIONS:
+                path = os.path.join(self.folder, key + ext)
+                if os.path.exists(path):
+                    self._sounds[key] = self._pygame.mixer.Sound(path)
+                    break
+            else:
+                return None
+        return self._sounds[key]
+
+    def play(self, key):
+        """Starts the sound for key (or default) and returns its length in seconds, 0 if none."""
+        sound = self._sound(key) or self._sound("default")
+        if sound is None:
+            return 0.0
+        sound.play()
+        return sound.get_length()
+
+    def close(self):
+        self._pygame.mixer.quit()
+
+
+class SimAudio:
+    def __init__(self, length=1.0):
+        self.length = length
+        self.played = []  # (monotonic time, key)
+
+    def preload(self):
+        return 0
+
+    def play(self, key):
+        self.played.append((time.monotonic(), key))
+        return self.length
+
+    def close(self):
+        pass
+
+
+# --- DEVICES ---
+
+class Door:
+    """Servo door. open() returns immediately; the close is a timed event, pushed back if re-opened."""
+
+    def __init__(self, servo, scheduler, open_seconds=DOOR_OPEN_SECONDS):
+        self.servo = servo
+        self.scheduler = scheduler
+        self.open_seconds = open_seconds
+        self.is_open = False
+        self._generation = 0
+
+    def open(self):
+        self.scheduler.call(self._open)
+
+    def _open(self):
+        self._generation += 1
+        if not self.is_open:
+            print("DOOR: Opening...")
+            self.is_open = True
+            self._move(SERVO_OPEN_DUTY)
+        self.scheduler.schedule(self.open_seconds + SERVO_MOVE_SECONDS, self._close, self._generation)
+
+    def _close(self, generation):
+        if generation != self._generation:
+            return  # opened again since; that open scheduled its own close
+        print("DOOR: Closing...")
+        self.is_open = False
+        self._move(SERVO_CLOSED_DUTY)
+
+    def _move(self, duty):
+        self.servo.set_duty(duty)
+        self.scheduler.schedule(SERVO_MOVE_SECONDS, self.servo.set_duty, 0)
+
+
+class LcdWriter:
+    """
+    Debounced 16x2 LCD.
+
+    write() sets the resting text, flash() shows a message for a few seconds
+    before returning to it. Text equal to what is on screen is never re-sent,
+    and writes within LCD_MIN_INTERVAL of each other are merged into one.
+    """
+
+    def __init__(self, lcd, scheduler, min_interval=LCD_MIN_INTERVAL):
+        self.lcd = lcd
+        self.scheduler = scheduler
+        self.min_interval = min_interval
+        self.writes = 0
+        self._base = None
+        self._wanted = None
+        self._shown = None
+        self._last_write = 0.0
+        self._flush_pending = False
+        self._flash_generation = 0
+        self._flashing = False
+
+    def write(self, line1, line2=""):
+        self.scheduler.call(self._set_base, (line1, line2))
+
+    def flash(self, line1, line2, seconds):
+        self.scheduler.call(self._flash, (line1, line2), seconds)
+
+    def _set_base(self, text):
+        self._base = text
+        if not self._flashing:
+            self._want(text)
+
+    def _flash(self, text, seconds):
+        self._flash_generation += 1
+        self._flashing = True
+        self._want(text)
+        self.scheduler.schedule(seconds, self._end_flash, self._flash_generation)
+
+    def _end_flash(self, generation):
+        if generation == self._flash_generation:
+            self._flashing = False
+            if self._base is not None:
+                self._want(self._base)
+
+    def _want(self, text):
+        self._wanted = text
+        if self._flush_pending:
+            return
+        wait = self._last_write + self.min_interval - time.monotonic()
+        if wait > 0:
+            self._flush_pending = True
+            self.scheduler.schedule(wait, self._flush)
+        else:
+            self._flush()
+
+    def _flush(self):
+        self._flush_pending = False
+        if self._wanted == self._shown:
+            return
+        self.lcd.show(*self._wanted)
+        self._shown = self._wanted
+        self._last_write = time.monotonic()
+        self.writes += 1
+
+
+class AudioQueue:
+    """Plays greetings one after another; the next starts when the previous sound has ended."""
+
+    def __init__(self, audio, scheduler):
+        self.audio = audio
+        self.scheduler = scheduler
+        self._queue = deque()
+        self._playing = False
+
+    def play(self, name):
+        self.scheduler.call(self._enqueue, sound_key(name))
+
+    def _enqueue(self, key):
+        self._queue.append(key)
+        if not self._playing:
+            self._play_next()
+
+    def _play_next(self):
+        if not self._queue:
+            self._playing = False
+            return
+        self._playing = True
+        length = self.audio.play(self._queue.popleft())
+        self.scheduler.schedule(length, self._play_next)
+
+
+class Actuators:
+    """The door, LCD and audio of one entrance, all driven by one ActuatorScheduler."""
+
+    def __init__(self, servo, lcd, audio):
+        self.scheduler = ActuatorScheduler()
+        self.backends = (servo, lcd, audio)
+        self.door = Door(servo, self.scheduler)
+        self.lcd = LcdWriter(lcd, self.scheduler)
+        self.audio = AudioQueue(audio, self.scheduler)
+        self.scheduler.call(audio.preload)
+
+    def close(self):
+        # Let a pending door close happen before the PWM is released.
+        self.scheduler.stop(drain_seconds=DOOR_OPEN_SECONDS + 2 * SERVO_MOVE_SECONDS if self.door.is_open else 0.0)
+        for backend in self.backends:
+            try:
+                backend.close()
+            except Exception as e:
+                print(f"HARDWARE ERROR: {e}")
+
+
+def _with_fallback(create, simulator, label):
+    try:
+        return create()
+    except Exception as e:  # missing library, no I2C bus, not a Pi...
+        print(f"HARDWARE: {label} unavailable ({e}), using simulator.")
+        return simulator()
+
+
+def make_actuators(simulate=False, sound_folder=SOUND_FOLDER, servo_pin=GPIO_PIN_SERVO, lcd_address=LCD_I2C_ADDRESS):
+    """Real devices where available, simulators for the rest (or for everything if simulate)."""
+    if simulate:
+        return Actuators(SimServo(), SimLcd(), SimAudio())
+    return Actuators(
+        _with_fallback(lambda: GpioServo(servo_pin), SimServo, "servo"),
+        _with_fallback(lambda: I2CLcd(lcd_address), SimLcd, "LCD"),
+        _with_fallback(lambda: PygameAudio(sound_folder), SimAudio, "audio"),
+    )
@@ -0,0 +1,272 @@
+import argparse
+import csv
+import sqlite3
+from datetime import datetime
+
+from database_setup import setup_database
+
+# --- SETTINGS ---
+DB_NAME = "attendance.db"
+LATE_AFTER = "08:30:00"  # A day's first check-in after this counts as late
+EXPORT_BATCH = 10_000    # Rows fetched per round trip while exporting
+WEEKDAYS = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+
+# One row per student with any attendance on the day: were they present in any
+# lesson, when did they first check in, and how many lessons did they attend.
+_STUDENT_DAYS = """
+    SELECT student_id, date,
+           MAX(status = 'PRESENT') AS present,
+           MIN(CASE WHEN status = 'PRESENT' THEN check_in_time END) AS first_in,
+           COUNT(CASE WHEN status = 'PRESENT' THEN 1 END) AS lessons
+    FROM Attendance
+"""
+
+
+def _month_bounds(date_str):
+    month = date_str[:7]
+    return month, f"{month}-01", f"{month}-31"
+
+
+# --- AGGREGATION ---
+
+def refresh_day(conn, date_str, late_after=LATE_AFTER):
+    """
+    Recomputes the aggregates for one day in a single transaction.
+
+    DailySummary and LessonDaily rows for the day are rebuilt from the day's
+    Attendance rows only. StudentMonthly is updated incrementally by adding the
+    day's counts; if the day had already been applied (a re-run, or rows
+    added later) that month is rebuilt from the applied days instead, so
+    nothing is counted twice.
+    """
+    month, month_start, month_end = _month_bounds(date_str)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        already_applied = conn.execute("SELECT 1 FROM AnalyticsDays WHERE date = ?", (date_str,)).fetchone()
+        conn.execute("DROP TABLE IF EXISTS temp.day_students")
+        conn.execute("CREATE TEMP TABLE day_students AS" + _STUDENT_DAYS + "WHERE date = ? GROUP BY student_id",
+                     (date_str,))
+
+        conn.execute("DELETE FROM DailySummary WHERE date = ?", (date_str,))
+        conn.execute("""
+            INSERT INTO DailySummary (date, weekday, present, absent, late)
+            SELECT ?, CAST(strftime('%w', ?) AS INTEGER),
+                   COALESCE(SUM(present), 0), COALESCE(SUM(NOT present), 0),
+                   COALESCE(SUM(present AND first_in > ?), 0)
+            FROM temp.day_students
+        """, (date_str, date_str, late_after))
+
+        conn.execute("DELETE FROM LessonDaily WHERE date = ?", (date_str,))
+        conn.execute("""
+            INSERT INTO LessonDaily (date, lesson, classroom, present, late, mean_check_in_seconds)
+            SELECT date, COALESCE(lesson, ''), COALESCE(classroom, ''), COUNT(*), SUM(check_in_time > ?),
+                   AVG((julianday(check_in_time) - julianday('00:00:00')) * 86400)
+            FROM Attendance WHERE date = ? AND status = 'PRESENT'
+            GROUP BY COALESCE(lesson, ''), COALESCE(classroom, '')
+        """, (late_after, date_str))
+
+        if already_applied:
+            conn.execute("DELETE FROM StudentMonthly WHERE month = ?", (month,))
+            conn.execute("""
+                INSERT INTO StudentMonthly (student_id, month, present_days, absent_days, late_days, lessons)
+                SELECT student_id, ?, SUM(present), SUM(NOT present), SUM(present AND first_in > ?), SUM(lessons)
+                FROM (""" + _STUDENT_DAYS + """
+                      WHERE date BETWEEN ? AND ?
+                        AND date IN (SELECT date FROM AnalyticsDays WHERE date BETWEEN ? AND ?)
+                      GROUP BY student_id, date)
+                GROUP BY student_id
+            """, (month, late_after, month_start, month_end, month_start, month_end))
+        else:
+            conn.execute("""
+                INSERT INTO StudentMonthly (student_id, month, present_days, absent_days, late_days, lessons)
+                SELECT student_id, ?, present, NOT present, present AND first_in > ?, lessons
+                FROM temp.day_students WHERE 1
+                ON CONFLICT (student_id, month) DO UPDATE SET
+                    present_days = present_days + excluded.present_days,
+                    absent_days = absent_days + excluded.absent_days,
+                    late_days = late_days + excluded.late_days,
+                    lessons = lessons + excluded.lessons
+            """, (month, late_after))
+
+        conn.execute("INSERT OR REPLACE INTO AnalyticsDays (date) VALUES (?)", (date_str,))
+        conn.execute("DROP TABLE temp.day_students")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def refresh(conn, upto=None, late_after=LATE_AFTER):
+    """Applies every day in Attendance (up to and including upto) that has not been aggregated yet."""
+    upto = upto or datetime.now().strftime("%Y-%m-%d")
+    days = [row[0] for row in conn.execute("""
+        SELECT DISTINCT date FROM Attendance
+        WHERE date <= ? AND date NOT IN (SELECT date FROM AnalyticsDays)
+        ORDER BY date
+    """, (upto,))]
+    for date_str in days:
+        refresh_day(conn, date_str, late_after)
+    return days
+
+
+# --- QUERIES ---
+
+def student_history(conn, student_id):
+    """[(month, present_days, absent_days, late_days, lessons)] for one student, oldest first."""
+    return conn.execute("""
+        SELECT month, present_days, absent_days, late_days, lessons FROM StudentMonthly
+        WHERE student_id = ? ORDER BY month
+    """, (student_id,)).fetchall()
+
+
+def monthly_summary(conn, start="0000-00-00", end="9999-99-99"):
+    """[(month, school days, attendance rate, late rate)] over the whole school."""
+    return conn.execute("""
+        SELECT substr(date, 1, 7), COUNT(*),
+               1.0 * SUM(present) / NULLIF(SUM(present + absent), 0),
+               1.0 * SUM(late) / NULLIF(SUM(present), 0)
+        FROM DailySummary WHERE date BETWEEN ? AND ?
+        GROUP BY substr(date, 1, 7) ORDER BY 1
+    """, (start, end)).fetchall()
+
+
+def lesson_trend(conn, lesson, start="0000-00-00", end="9999-99-99"):
+    """[(month, classroom, days held, mean present, late rate, mean check-in HH:MM)] for one lesson."""
+    rows = conn.execute("""
+        SELECT substr(date, 1, 7), classroom, COUNT(*), AVG(present),
+               1.0 * SUM(late) / NULLIF(SUM(present), 0),
+               SUM(mean_check_in_seconds * present) / NULLIF(SUM(present), 0)
+        FROM LessonDaily WHERE lesson = ? AND date BETWEEN ? AND ?
+        GROUP BY substr(date, 1, 7), classroom ORDER BY 1, 2
+    """, (lesson, start, end)).fetchall()
+    return [(month, classroom, days, present, late,
+             None if seconds is None else f"{int(seconds) // 3600:02d}:{int(seconds) % 3600 // 60:02d}")
+            for month, classroom, days, present, late, seconds in rows]
+
+
+def weekday_rates(conn, start="0000-00-00", end="9999-99-99"):
+    """[(weekday name, school days, attendance rate, late rate)], Sunday first."""
+    rows = conn.execute("""
+        SELECT weekday, COUNT(*),
+               1.0 * SUM(present) / NULLIF(SUM(present + absent), 0),
+               1.0 * SUM(late) / NULLIF(SUM(present), 0)
+        FROM DailySummary WHERE date BETWEEN ? AND ?
+        GROUP BY weekday ORDER BY weekday
+    """, (start, end)).fetchall()
+    return [(WEEKDAYS[weekday], days, rate, late) for weekday, days, rate, late in rows]
+
+
+# --- EXPORT ---
+
+EXPORTS = {
+    "attendance": """
+        SELECT a.date, a.check_in_time, a.status, a.lesson, a.classroom, a.student_id, s.first_name, s.last_name
+        FROM Attendance a LEFT JOIN Students s ON s.id = a.student_id
+        WHERE a.date BETWEEN ? AND ? ORDER BY a.date, a.id
+    """,
+    "daily": "SELECT * FROM DailySummary WHERE date BETWEEN ? AND ? ORDER BY date",
+    "lessons": "SELECT * FROM LessonDaily WHERE date BETWEEN ? AND ? ORDER BY date, lesson, classroom",
+    "students": """
+        SELECT * FROM StudentMonthly WHERE month BETWEEN substr(?, 1, 7) AND substr(?, 1, 7)
+        ORDER BY month, student_id
+    """,
+}
+
+
+def export(conn, name, path, start="0000-00-00", end="9999-99-99", batch=EXPORT_BATCH):
+    """
+    Streams one of EXPORTS to CSV, or to Parquet if path ends in .parquet (needs pyarrow).
+    Rows are fetched EXPORT_BATCH at a time, so memory stays flat however large the range.
+    Returns the number of rows written.
+    """
+    cursor = conn.execute(EXPORTS[name], (start, end))
+    columns = [column[0] for column in cursor.description]
+    if path.endswith(".parquet"):
+        return _export_parquet(cursor, columns, path, batch)
+
+    rows = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        while True:
+            chunk = cursor.fetchmany(batch)
+            if not chunk:
+                return rows
+            writer.writerows(chunk)
+            rows += len(chunk)
+
+
+def _export_parquet(cursor, columns, path, batch):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {int: pa.int64(), float: pa.float64(), bytes: pa.binary()}
+    writer, schema, rows = None, None, 0
+    try:
+        while True:
+            chunk = cursor.fetchmany(batch)
+            if not chunk:
+                break
+            values = list(zip(*chunk))
+            if schema is None:
+                # SQLite has no column types to read, so take them from the first non-null values.
+                schema = pa.schema([(name, types.get(type(next((v for v in column if v is not None), "")), pa.string()))
+                                    for name, column in zip(columns, values)])
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(pa.table([pa.array(column, type=field.type) for column, field in zip(values, schema)],
+                                        schema=schema))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attendance analytics from precomputed aggregates.")
+    parser.add_argument("--db", default=DB_NAME)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("refresh", help="Aggregate every day not aggregated yet (first run backfills history).")
+    student_cmd = commands.add_parser("student", help="Monthly history of one student.")
+    student_cmd.add_argument("student_id", type=int)
+    for name, help_text in (("months", "School-wide attendance and lateness per month."),
+                            ("weekdays", "Attendance and lateness per weekday.")):
+        cmd = commands.add_parser(name, help=help_text)
+        cmd.add_argument("--from", dest="start", default="0000-00-00")
+        cmd.add_argument("--to", dest="end", default="9999-99-99")
+    lesson_cmd = commands.add_parser("lesson", help="Monthly trend of one lesson per classroom.")
+    lesson_cmd.add_argument("lesson")
+    export_cmd = commands.add_parser("export", help="Stream a table to .csv or .parquet.")
+    export_cmd.add_argument("table", choices=sorted(EXPORTS))
+    export_cmd.add_argument("path")
+    export_cmd.add_argument("--from", dest="start", default="0000-00-00")
+    export_cmd.add_argument("--to", dest="end", default="9999-99-99")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    setup_database(conn)
+    try:
+        if args.command == "refresh":
+            print(f"{len(refresh(conn))} day(s) aggregated.")
+        elif args.command == "student":
+            for month, present, absent, late, lessons in student_history(conn, args.student_id):
+                print(f"{month}  present {present:3}  absent {absent:3}  late {late:3}  lessons {lessons}")
+        elif args.command == "months":
+            for month, days, rate, late in monthly_summary(conn, args.start, args.end):
+                print(f"{month}  {days:3} days  attendance {rate or 0:6.1%}  late {late or 0:6.1%}")
+        elif args.command == "weekdays":
+            for weekday, days, rate, late in weekday_rates(conn, args.start, args.end):
+                print(f"{weekday:<10} {days:4} days  attendance {rate or 0:6.1%}  late {late or 0:6.1%}")
+        elif args.command == "lesson":
+            for month, classroom, days, present, late, check_in in lesson_trend(conn, args.lesson):
+                print(f"{month}  {classroom or '-':<10} {days:3} lessons  mean present {present:6.1f}  "
+                      f"late {late or 0:6.1%}  mean check-in {check_in or '-'}")
+        else:
+            rows = export(conn, args.table, args.path, args.start, args.end)
+            print(f"{rows} rows written to {args.path}.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
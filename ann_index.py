@@ -0,0 +1,252 @@
+import os
+import time
+
+import numpy as np
+
+from encoding_store import load_gallery
+from face_matcher import ENCODING_DIM
+
+# --- SETTINGS ---
+DB_NAME = "attendance.db"
+DEFAULT_PROBES = 8
+KMEANS_ITERATIONS = 10
+CHUNK_ROWS = 8192
+
+
+def index_path_for(db_name):
+    """The index is stored next to the database: attendance.db -> attendance.ivf.npz"""
+    return os.path.splitext(db_name)[0] + ".ivf.npz"
+
+
+def _squared_distances(a, b, b_sq=None):
+    if b_sq is None:
+        b_sq = np.einsum("ij,ij->i", b, b)
+    a_sq = np.einsum("ij,ij->i", a, a)
+    sq = a_sq[:, None] + b_sq[None, :] - 2.0 * (a @ b.T)
+    return np.maximum(sq, 0.0, out=sq)
+
+
+def _nearest_centroid(vectors, centroids):
+    """Assigns every vector to its closest centroid, in chunks to bound memory."""
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), CHUNK_ROWS):
+        chunk = vectors[start:start + CHUNK_ROWS]
+        labels[start:start + CHUNK_ROWS] = np.argmin(_squared_distances(chunk, centroids, c_sq), axis=1)
+    return labels
+
+
+def kmeans(vectors, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """Plain Lloyd's k-means. Empty clusters are re-seeded from random points."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _nearest_centroid(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=k)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index over face encodings.
+
+    Encodings are bucketed by their nearest k-means centroid; a search only
+    scans the n_probe buckets closest to the probe instead of the whole gallery.
+    """
+
+    def __init__(self, centroids, n_probe=DEFAULT_PROBES):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.n_probe = n_probe
+        self._centroid_sq = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        n_lists = len(self.centroids)
+        self.list_vectors = [np.empty((0, ENCODING_DIM), dtype=np.float32) for _ in range(n_lists)]
+        self.list_ids = [np.empty(0, dtype=np.int64) for _ in range(n_lists)]
+
+    @classmethod
+    def build(cls, encodings, ids, n_lists=None, n_probe=DEFAULT_PROBES, seed=0):
+        vectors = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        ids = np.asarray(ids, dtype=np.int64)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+        index = cls(kmeans(vectors, n_lists, seed=seed), n_probe=n_probe)
+        index._fill(vectors, ids, _nearest_centroid(vectors, index.centroids))
+        return index
+
+    def _fill(self, vectors, ids, labels):
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(len(self.centroids) + 1))
+        for c in range(len(self.centroids)):
+            rows = order[bounds[c]:bounds[c + 1]]
+            self.list_vectors[c] = np.ascontiguousarray(vectors[rows])
+            self.list_ids[c] = ids[rows]
+
+    def __len__(self):
+        return sum(len(ids) for ids in self.list_ids)
+
+    def ids(self):
+        return np.concatenate(self.list_ids) if self.list_ids else np.empty(0, dtype=np.int64)
+
+    def copy(self):
+        """
+        Returns an index that can be modified without affecting this one.
+        add() and remove() replace bucket arrays instead of writing into them,
+        so the arrays themselves are shared.
+        """
+        index = IVFIndex.__new__(IVFIndex)
+        index.centroids = self.centroids
+        index.n_probe = self.n_probe
+        index._centroid_sq = self._centroid_sq
+        index.list_vectors = list(self.list_vectors)
+        index.list_ids = list(self.list_ids)
+        return index
+
+    def add(self, encoding, student_id):
+        """Inserts one encoding into its nearest bucket without retraining the centroids."""
+        vector = np.asarray(encoding, dtype=np.float32).reshape(1, ENCODING_DIM)
+        c = int(_nearest_centroid(vector, self.centroids)[0])
+        self.list_vectors[c] = np.vstack([self.list_vectors[c], vector])
+        self.list_ids[c] = np.append(self.list_ids[c], np.int64(student_id))
+
+    def remove(self, student_id):
+        for c, ids in enumerate(self.list_ids):
+            keep = ids != student_id
+            if not keep.all():
+                self.list_vectors[c] = self.list_vectors[c][keep]
+                self.list_ids[c] = ids[keep]
+
+    def search(self, probe_encodings):
+        """
+        Returns (student_ids, distances) of the closest indexed face for every probe.
+        A probe whose buckets are all empty gets id -1 and distance inf.
+        """
+        probes = np.asarray(probe_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        n_probe = min(self.n_probe, len(self.centroids))
+        coarse = _squared_distances(probes, self.centroids, self._centroid_sq)
+        nearest_lists = np.argpartition(coarse, n_probe - 1, axis=1)[:, :n_probe]
+
+        best_ids = np.full(len(probes), -1, dtype=np.int64)
+        best_dist = np.full(len(probes), np.inf, dtype=np.float32)
+        for i, probe in enumerate(probes):
+            lists = nearest_lists[i]
+            candidates = np.concatenate([self.list_vectors[c] for c in lists])
+            if len(candidates) == 0:
+                continue
+            candidate_ids = np.concatenate([self.list_ids[c] for c in lists])
+            sq = _squared_distances(probe[None, :], candidates)[0]
+            j = int(np.argmin(sq))
+            best_ids[i] = candidate_ids[j]
+            best_dist[i] = np.sqrt(sq[j])
+        return best_ids, best_dist
+
+    def save(self, path):
+        ids = self.ids()
+        vectors = np.concatenate(self.list_vectors) if len(ids) else np.empty((0, ENCODING_DIM), np.float32)
+        labels = np.concatenate([np.full(len(l), c, dtype=np.int32) for c, l in enumerate(self.list_ids)])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, centroids=self.centroids, vectors=vectors, ids=ids,
+                     labels=labels, n_probe=np.int32(self.n_probe))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        index = cls(data["centroids"], n_probe=int(data["n_probe"]))
+        index._fill(data["vectors"], data["ids"], data["labels"])
+        return index
+
+
+def recall_at_1(index, gallery, gallery_ids, probes):
+    """Fraction of probes for which the index returns the same nearest face as an exact scan."""
+    gallery = np.asarray(gallery, dtype=np.float32)
+    exact = np.asarray(gallery_ids)[np.argmin(_squared_distances(np.asarray(probes, np.float32), gallery), axis=1)]
+    approx, _ = index.search(probes)
+    return float(np.mean(exact == approx))
+
+
+def _fingerprints(vectors, ids):
+    """{student_id: (template count, sum of the templates)}, to spot students whose templates changed."""
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(ids) == 0:
+        return {}
+    unique, inverse, counts = np.unique(ids, return_inverse=True, return_counts=True)
+    sums = np.zeros((len(unique), ENCODING_DIM), dtype=np.float64)
+    np.add.at(sums, inverse, np.asarray(vectors, dtype=np.float32).reshape(-1, ENCODING_DIM))
+    return {student_id: (count, total) for student_id, count, total in zip(unique.tolist(), counts.tolist(), sums)}
+
+
+def sync_index(index, encodings, ids):
+    """
+    Brings a loaded index in line with the gallery: adds new students, drops deleted
+    ones and re-adds students whose templates changed. Returns True if anything changed.
+    """
+    vectors = np.concatenate(index.list_vectors) if index.list_vectors else np.empty((0, ENCODING_DIM))
+    indexed = _fingerprints(vectors, index.ids())
+    current = _fingerprints(encodings, ids)
+    stale = {student_id for student_id, (count, total) in indexed.items()
+             if student_id not in current or current[student_id][0] != count
+             or not np.allclose(current[student_id][1], total, atol=1e-3)}
+    for student_id in stale:
+        index.remove(student_id)
+    added = 0
+    for encoding, student_id in zip(encodings, ids):
+        if student_id in stale or student_id not in indexed:
+            index.add(encoding, student_id)
+            added += 1
+    return added > 0 or bool(stale)
+
+
+def load_or_build_index(encodings, ids, db_name=DB_NAME):
+    """Loads the persisted index for db_name (building it on first use) and syncs it with the gallery."""
+    path = index_path_for(db_name)
+    if os.path.exists(path):
+        try:
+            index = IVFIndex.load(path)
+            if sync_index(index, encodings, ids):
+                index.save(path)
+            return index
+        except (OSError, ValueError, KeyError) as e:
+            print(f"INDEX: Could not load {path} ({e}), rebuilding.")
+
+    start = time.perf_counter()
+    index = IVFIndex.build(encodings, ids)
+    index.save(path)
+    print(f"INDEX: Built {len(index.centroids)} lists over {len(ids)} faces in {time.perf_counter() - start:.1f}s.")
+    return index
+
+
+def add_to_saved_index(student_id, encoding, db_name=DB_NAME):
+    """Inserts a newly enrolled student into the persisted index, if one exists."""
+    add_many_to_saved_index([student_id], [encoding], db_name)
+
+
+def add_many_to_saved_index(student_ids, encodings, db_name=DB_NAME):
+    """Like add_to_saved_index, but loads and saves the index file only once."""
+    path = index_path_for(db_name)
+    if not os.path.exists(path) or not student_ids:
+        return
+    index = IVFIndex.load(path)
+    for student_id, encoding in zip(student_ids, encodings):
+        index.add(encoding, student_id)
+    index.save(path)
+
+
+if __name__ == "__main__":
+    gallery, ids, _ = load_gallery(DB_NAME)
+    if not ids:
+        print("No students enrolled, nothing to index.")
+    else:
+        index = IVFIndex.build(gallery, ids)
+        index.save(index_path_for(DB_NAME))
+        rng = np.random.default_rng(0)
+        sample = gallery[rng.choice(len(gallery), size=min(1000, len(gallery)), replace=False)]
+        probes = sample + rng.normal(scale=0.02, size=sample.shape).astype(np.float32)
+        print(f"Index rebuilt: {len(index)} faces, {len(index.centroids)} lists, "
+              f"recall@1 = {recall_at_1(index, gallery, ids, probes):.3f} (n_probe={index.n_probe})")
@@ -0,0 +1,359 @@
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+# --- SETTINGS ---
+DB_NAME = "attendance.db"
+API_PORT = 8080
+READ_CONNECTIONS = 4     # Read-only SQLite connections (and threads) serving database queries
+EVENT_BACKLOG = 200      # Recent events replayed to a client that reconnects with Last-Event-ID
+CLIENT_QUEUE = 256       # Events buffered per /events client; a client further behind is dropped
+KEEPALIVE_SECONDS = 15   # Idle event streams get a comment this often so proxies keep them open
+IDLE_SECONDS = 30        # Keep-alive connections without a new request are closed after this long
+POLL_SECONDS = 2.0       # Standalone server: how often new check-ins are read from the database
+MAX_HEADER_BYTES = 16384
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           500: "Internal Server Error"}
+
+DAY_ATTENDANCE = """
+    SELECT a.id, a.student_id, s.first_name || ' ' || s.last_name AS name, a.status,
+           a.lesson, a.classroom, a.date, a.check_in_time
+    FROM Attendance a LEFT JOIN Students s ON s.id = a.student_id
+    WHERE a.date = ? AND (? IS NULL OR COALESCE(a.lesson, '') = ?)
+    ORDER BY a.check_in_time, a.id
+"""
+
+NEW_CHECK_INS = """
+    SELECT a.id, a.student_id, s.first_name || ' ' || s.last_name AS name,
+           a.lesson, a.classroom, a.date, a.check_in_time
+    FROM Attendance a LEFT JOIN Students s ON s.id = a.student_id
+    WHERE a.id > ? AND a.status = 'PRESENT'
+    ORDER BY a.id
+"""
+
+
+class ReadOnlyPool:
+    """
+    A fixed set of read-only SQLite connections used from a matching thread pool, so
+    dashboard queries never block the event loop and never take the write lock that
+    the attendance writer needs (the database is in WAL mode).
+    """
+
+    def __init__(self, db_name=DB_NAME, size=READ_CONNECTIONS):
+        self.uri = Path(db_name).absolute().as_uri() + "?mode=ro"
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(None)  # connections are opened on first use
+        self._executor = ThreadPoolExecutor(size, thread_name_prefix="api-db")
+
+    def _query(self, sql, params):
+        conn = self._idle.get()
+        try:
+            # Connecting inside the try, so a failed connect still hands its slot back.
+            conn = conn or sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+            cursor = conn.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor]
+        except sqlite3.Error:
+            if conn is not None:
+                conn.close()
+            conn = None
+            raise
+        finally:
+            self._idle.put(conn)
+
+    async def query(self, sql, params=()):
+        """Runs sql on a pooled connection; returns the rows as dicts."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._query, sql, params)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        while not self._idle.empty():
+            conn = self._idle.get_nowait()
+            if conn is not None:
+                conn.close()
+
+
+def _json(value):
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+class ApiServer:
+    """
+    Optional HTTP API for front-office dashboards, with its own thread and asyncio loop
+    so clients never run on the camera loop:
+
+    GET /status                 status() as JSON
+    GET /metrics                stage latencies and counters of every source, as in metrics.py
+    GET /attendance/today       today's check-ins, kept in memory (seeded from the database)
+    GET /attendance?date=YYYY-MM-DD[&lesson=...]  a day's rows, through the read-only pool
+    GET /events                 check-ins as they happen, as Server-Sent Events
+
+    Live state is only read, never locked: status() and sources() must return plain
+    snapshots. Events are encoded once and shared by every stream.
+    Embedded in a camera process, check-ins arrive through check_in(). Run on its own
+    (poll_seconds set), new check-ins are read from the database instead, once for all
+    clients rather than once per dashboard.
+    """
+
+    def __init__(self, status, sources, db_name=DB_NAME, port=API_PORT, host="0.0.0.0", poll_seconds=None):
+        self.status = status
+        self.sources = sources
+        self.host = host
+        self.port = port
+        self.pool = ReadOnlyPool(db_name)
+        self.poll_seconds = poll_seconds
+        self._loop = None
+        self._server = None
+        self._error = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="api-server", daemon=True)
+        # Only touched on the loop thread:
+        self._clients = {}  # event queue -> writer, one per /events stream
+        self._backlog = deque(maxlen=EVENT_BACKLOG)  # (event id, encoded event)
+        self._next_id = 1
+        self._today = None
+        self._checkins = {}  # (student_id, lesson) -> event, for today
+        self._today_body = None
+        self._last_row = 0
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def stop(self):
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self.pool.close()
+
+    def publish(self, event):
+        """Sends event (a JSON-able dict with a "type") to every /events client. Safe from any thread."""
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._broadcast, dict(event))
+
+    def check_in(self, student_id, name, lesson, classroom, camera=None, when=None):
+        when = when or datetime.now()
+        self.publish({"type": "check_in", "student_id": student_id, "name": name, "lesson": lesson,
+                      "classroom": classroom, "camera": camera,
+                      "date": when.strftime("%Y-%m-%d"), "check_in_time": when.strftime("%H:%M:%S")})
+
+    # --- LOOP THREAD ---
+
+    def _run(self):
+        loop = self._loop = asyncio.new_event_loop()
+        try:
+            self._server = loop.run_until_complete(asyncio.start_server(
+                self._handle, self.host, self.port, limit=MAX_HEADER_BYTES, backlog=1024))
+            self.port = self._server.sockets[0].getsockname()[1]
+            loop.run_until_complete(self._seed_today())
+            loop.create_task(self._keepalive())
+            if self.poll_seconds:
+                loop.create_task(self._poll())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            loop.close()
+            return
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            self._server.close()
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+    async def _seed_today(self):
+        self._roll_day()
+        try:
+            rows = await self.pool.query(DAY_ATTENDANCE, (self._today, None, None))
+            last = await self.pool.query("SELECT COALESCE(MAX(id), 0) AS id FROM Attendance")
+        except sqlite3.Error as e:
+            print(f"API: could not read today's attendance: {e}")
+            return
+        self._last_row = last[0]["id"]
+        for row in rows:
+            del row["id"]
+            if row.pop("status") == "PRESENT":
+                self._add_check_in(dict(row, type="check_in", camera=None))
+
+    async def _keepalive(self):
+        while True:
+            await asyncio.sleep(KEEPALIVE_SECONDS)
+            self._send_all(b": keep-alive\n\n")
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                rows = await self.pool.query(NEW_CHECK_INS, (self._last_row,))
+            except sqlite3.Error as e:
+                print(f"API: could not read new check-ins: {e}")
+                continue
+            for row in rows:
+                self._last_row = row.pop("id")
+                self._broadcast(dict(row, type="check_in", camera=None))
+
+    def _roll_day(self):
+        today = datetime.now().strftime("%Y-%m-%d")
+        if today != self._today:
+            self._today = today
+            self._checkins = {}
+            self._today_body = None
+
+    def _add_check_in(self, event):
+        self._roll_day()
+        if event["date"] == self._today:
+            # The same check-in can arrive from the seed query and as an event.
+            self._checkins.setdefault((event["student_id"], event["lesson"] or ""), event)
+            self._today_body = None
+
+    def _broadcast(self, event):
+        if event.get("type") == "check_in":
+            self._add_check_in(event)
+        event_id = self._next_id
+        self._next_id += 1
+        data = f"id: {event_id}\nevent: {event['type']}\ndata: ".encode() + _json(event) + b"\n\n"
+        self._backlog.append((event_id, data))
+        self._send_all(data)
+
+    def _send_all(self, data):
+        for client, writer in list(self._clients.items()):
+            try:
+                client.put_nowait(data)
+            except asyncio.QueueFull:
+                # Too slow to keep up (or not reading at all): drop it rather than buffer without bound.
+                del self._clients[client]
+                writer.transport.abort()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_SECONDS)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+                parts = request_line.split(" ")
+                if len(parts) != 3:
+                    self._respond(writer, 400, _json({"error": "bad request line"}), keep_alive=False)
+                    break
+                method, target, version = parts
+                headers = {}
+                for line in header_lines:
+                    key, _, value = line.partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                url = urlsplit(target)
+                if method != "GET":
+                    # A request body would have to be read; nothing here accepts one.
+                    self._respond(writer, 405, _json({"error": "only GET is supported"}), keep_alive=False)
+                    break
+                if url.path == "/events":
+                    await self._stream(writer, headers)
+                    break
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                code, body = await self._route(url.path, parse_qs(url.query))
+                self._respond(writer, code, body, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass  # cancelled: the server is stopping
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _respond(writer, code, body, keep_alive=True):
+        writer.write((f"HTTP/1.1 {code} {REASONS[code]}\r\n"
+                      "Content-Type: application/json\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      "Access-Control-Allow-Origin: *\r\n"
+                      f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + body)
+
+    async def _route(self, path, query):
+        try:
+            if path == "/status":
+                return 200, _json(self.status())
+            if path == "/metrics":
+                sources = []
+                for labels, stats in self.sources():
+                    stages, counters = stats.snapshot()
+                    sources.append({"labels": labels, "stages": stages, "counters": counters})
+                return 200, _json(sources)
+            if path == "/attendance/today":
+                self._roll_day()
+                if self._today_body is None:
+                    self._today_body = _json({"date": self._today, "check_ins": list(self._checkins.values())})
+                return 200, self._today_body
+            if path == "/attendance":
+                date_str = query.get("date", [None])[0]
+                lesson = query.get("lesson", [None])[0]
+                try:
+                    datetime.strptime(date_str or "", "%Y-%m-%d")
+                except ValueError:
+                    return 400, _json({"error": "date=YYYY-MM-DD is required"})
+                rows = await self.pool.query(DAY_ATTENDANCE, (date_str, lesson, lesson))
+                for row in rows:
+                    del row["id"]
+                return 200, _json({"date": date_str, "rows": rows})
+            return 404, _json({"error": f"no such endpoint: {path}"})
+        except Exception as e:
+            return 500, _json({"error": str(e)})
+
+    async def _stream(self, writer, headers):
+        client = asyncio.Queue(CLIENT_QUEUE)
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\n"
+                     b"Access-Control-Allow-Origin: *\r\n"
+                     b"Connection: keep-alive\r\n\r\n"
+                     b"retry: 3000\n\n")
+        last_id = headers.get("last-event-id", "")
+        if last_id.isdigit():
+            for event_id, data in self._backlog:
+                if event_id > int(last_id):
+                    writer.write(data)
+        self._clients[client] = writer
+        try:
+            while True:
+                writer.write(await client.get())
+                await writer.drain()
+        finally:
+            self._clients.pop(client, None)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the attendance API next to the camera processes, from the database.")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="Seconds between reads of new check-ins")
+    args = parser.parse_args()
+
+    server = ApiServer(lambda: {"cameras": []}, lambda: [], args.db, args.port, poll_seconds=args.poll).start()
+    print(f"API: http://0.0.0.0:{server.port}/status (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
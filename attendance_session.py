@@ -0,0 +1,57 @@
+import sqlite3
+
+# --- SETTINGS ---
+DB_NAME = "attendance.db"
+
+
+class AttendanceSession:
+    """
+    The students already checked in for one date and lesson.
+
+    Held as a bitmap indexed by student id (ids are dense AUTOINCREMENT
+    integers, so 100k students take 12.5 KB) and seeded from Attendance once,
+    so a crash, restart or lesson change never admits anyone twice and the
+    duplicate check never touches the database. New check-ins are persisted
+    by the AttendanceWriter in batches; after a crash, load() picks them up again.
+
+    Supports `in` and add(), so it can be used wherever a set of ids was.
+    """
+
+    def __init__(self, date_str, lesson=None, student_ids=()):
+        self.date = date_str
+        self.lesson = lesson
+        self._bits = bytearray()
+        self._count = 0
+        for student_id in student_ids:
+            self.add(student_id)
+
+    @classmethod
+    def load(cls, db_name, date_str, lesson=None):
+        """Seeds the session with everyone PRESENT on date_str in this lesson."""
+        conn = sqlite3.connect(db_name)
+        try:
+            rows = conn.execute("""
+                SELECT student_id FROM Attendance
+                WHERE date = ? AND status = 'PRESENT' AND COALESCE(lesson, '') = ?
+            """, (date_str, lesson or "")).fetchall()
+        finally:
+            conn.close()
+        return cls(date_str, lesson, (row[0] for row in rows))
+
+    def __contains__(self, student_id):
+        byte = student_id >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (student_id & 7)))
+
+    def add(self, student_id):
+        """Marks student_id as checked in. Returns False if they already were."""
+        if student_id in self:
+            return False
+        byte = student_id >> 3
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(max(byte + 1, 2 * len(self._bits)) - len(self._bits)))
+        self._bits[byte] |= 1 << (student_id & 7)
+        self._count += 1
+        return True
+
+    def __len__(self):
+        return self._count
@@ -0,0 +1,145 @@
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from database_setup import setup_database
+from metrics import LatencyStats
+
+# --- SETTINGS ---
+DB_NAME = "attendance.db"
+BATCH_SIZE = 64          # Check-ins written per transaction at most
+MAX_DELAY_SECONDS = 0.5  # A check-in reaches the database within this delay
+RETRY_SECONDS = 0.5      # First wait before a failed batch (e.g. "database is locked") is written again
+MAX_RETRY_SECONDS = 30.0 # The wait doubles after every failure up to this
+
+_TIMEOUT = object()
+
+
+def connect(db_name=DB_NAME, check_same_thread=True):
+    """Opens a connection in WAL mode so readers never block the writer."""
+    conn = sqlite3.connect(db_name, timeout=10, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class AttendanceWriter:
+    """
+    Background thread that owns the one writing connection.
+
+    check_in() only queues the row; the thread groups queued rows into one
+    transaction per MAX_DELAY_SECONDS (or per BATCH_SIZE rows, if sooner).
+    Duplicate PRESENT rows for the same day and lesson are ignored by the database.
+
+    A batch that fails to commit is kept and written again with a growing backoff:
+    its students are already checked in in memory and will not be admitted twice,
+    so dropping it would mark them absent. Only close() gives up on it, after one
+    last attempt. The connection is opened by the constructor, so a database that
+    cannot be opened fails the caller instead of the thread.
+    """
+
+    def __init__(self, db_name=DB_NAME, batch_size=BATCH_SIZE, max_delay=MAX_DELAY_SECONDS, stats=None):
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.stats = stats or LatencyStats()
+        self.written = 0
+        self.error = None
+        self._conn = connect(db_name, check_same_thread=False)  # used only by the thread from here on
+        try:
+            setup_database(self._conn)
+        except Exception:
+            self._conn.close()
+            raise
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def check_in(self, student_id, when=None, lesson=None, classroom=None):
+        self._check_alive()
+        when = when or datetime.now()
+        self._queue.put((student_id, when.strftime("%Y-%m-%d"), when.strftime("%H:%M:%S"), lesson, classroom))
+
+    def flush(self):
+        """Blocks until every check-in queued so far is committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        while not done.wait(timeout=1.0):
+            self._check_alive()
+
+    def _check_alive(self):
+        if not self._thread.is_alive():
+            reason = f": {self.error}" if self.error is not None else " (closed)"
+            raise RuntimeError(f"attendance writer stopped{reason}") from self.error
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _next(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return _TIMEOUT
+
+    def _run(self):
+        try:
+            batch, waiters = [], []
+            backoff, retry_at = RETRY_SECONDS, 0.0
+            running = True
+            while running:
+                # Rows left from a failed write are retried at retry_at even if nothing new arrives.
+                item = self._next(max(retry_at - time.monotonic(), 0.0) if batch else None)
+                deadline = max(time.monotonic() + self.max_delay, retry_at)
+                while item is not _TIMEOUT:
+                    if item is None:
+                        running = False
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        batch.append(item)
+                    # A close request ends the batch at once; a flush request or a full batch
+                    # end it early too, unless a failed batch is still waiting out its backoff.
+                    if not running or ((waiters or len(batch) >= self.batch_size) and time.monotonic() >= retry_at):
+                        break
+                    item = self._next(max(deadline - time.monotonic(), 0.0))
+
+                if self._write(batch):
+                    batch, backoff = [], RETRY_SECONDS
+                elif running:
+                    retry_at = time.monotonic() + backoff
+                    print(f"DB Error: {len(batch)} check-in(s) kept, retrying in {backoff:.1f}s.")
+                    backoff = min(backoff * 2, MAX_RETRY_SECONDS)
+                    continue  # flush() returns once these rows are in
+                elif batch:
+                    print(f"DB Error: {len(batch)} check-in(s) could not be saved: {batch}")
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+        except Exception as e:
+            self.error = e
+            print(f"DB Error: attendance writer stopped: {e}")
+        finally:
+            self._conn.close()
+
+    def _write(self, batch):
+        """Commits batch in one transaction; returns False if it has to be written again."""
+        if not batch:
+            return True
+        try:
+            with self.stats.timed("db_write"), self._conn:
+                cursor = self._conn.executemany("""
+                    INSERT OR IGNORE INTO Attendance (student_id, date, check_in_time, lesson, classroom, status)
+                    VALUES (?, ?, ?, ?, ?, 'PRESENT')
+                """, batch)
+            self.written += cursor.rowcount
+            self.stats.incr("attendance_rows", cursor.rowcount)
+            self.stats.incr("attendance_duplicates", len(batch) - cursor.rowcount)
+            print(f"LOG: {cursor.rowcount} attendance record(s) saved.")
+            return True
+        except sqlite3.Error as e:
+            self.stats.incr("db_errors")
+            print(f"DB Error: {e}")
+            return False
@@ -0,0 +1,497 @@
+import argparse
+import datetime
+import multiprocessing
+import os
+import pickle
+import resource
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from absence import record_absences
+from ann_index import IVFIndex, recall_at_1
+from attendance_writer import AttendanceWriter
+from database_setup import MIGRATIONS, setup_database
+from detectors import make_detector
+from encoding_store import load_gallery, migrate_pickled_encodings
+from face_matcher import ENCODING_DIM, FaceMatcher
+from face_templates import evaluate, print_evaluation
+from face_tracker import iou
+from metrics import LatencyStats
+from quantization import PRECISIONS
+from recognition import detect_faces
+from replay import open_source
+
+# --- SETTINGS ---
+GALLERY_SIZES = [1_000, 10_000, 100_000]
+FACES_PER_FRAME = 4
+REPEATS = 20
+
+
+def make_gallery(size, seed=0):
+    """Builds a synthetic gallery of unit-length encodings (real dlib encodings have norm ~1)."""
+    rng = np.random.default_rng(seed)
+    gallery = rng.normal(size=(size, ENCODING_DIM)).astype(np.float32)
+    gallery /= np.linalg.norm(gallery, axis=1, keepdims=True)
+    return gallery
+
+
+def make_probes(gallery, count, noise=0.02, seed=1):
+    """Picks gallery faces and perturbs them slightly, like a second photo of the same person."""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(gallery), size=count, replace=False)
+    probes = gallery[picks] + rng.normal(scale=noise, size=(count, ENCODING_DIM)).astype(np.float32)
+    return probes, picks
+
+
+def time_call(func, repeats=REPEATS):
+    """Returns the median wall time of func() in milliseconds."""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+# --- BENCHMARKS ---
+
+def bench_matcher(args):
+    print(f"{'gallery':>8} | {'legacy loop (ms)':>16} | {'matcher (ms)':>12} | speedup")
+    for size in args.sizes:
+        gallery = make_gallery(size)
+        probes, picks = make_probes(gallery, args.faces)
+        ids = list(range(size))
+        matcher = FaceMatcher(gallery, ids, [str(i) for i in ids])
+
+        # Same work as the old compare_faces loop: one list->array copy and norm per face.
+        known_list = [row.astype(np.float64) for row in gallery]
+
+        def legacy():
+            for probe in probes:
+                distances = np.linalg.norm(np.array(known_list) - probe, axis=1)
+                list(distances <= 0.5).index(True)
+
+        legacy_ms = time_call(legacy, repeats=max(1, args.repeats // 5))
+        matcher_ms = time_call(lambda: matcher.match(probes), repeats=args.repeats)
+
+        found = [m.student_id for m in matcher.match(probes)]
+        assert found == picks.tolist(), "matcher returned the wrong identities"
+        print(f"{size:>8} | {legacy_ms:>16.2f} | {matcher_ms:>12.2f} | {legacy_ms / matcher_ms:.1f}x")
+
+
+def bench_ann(args):
+    for size in args.sizes:
+        gallery = make_gallery(size)
+        ids = list(range(size))
+        probes, _ = make_probes(gallery, min(args.queries, size))
+        exact = FaceMatcher(gallery, ids, ids)
+
+        start = time.perf_counter()
+        index = IVFIndex.build(gallery, ids)
+        build_s = time.perf_counter() - start
+        exact_ms = time_call(lambda: exact.match(probes[:args.faces]), repeats=args.repeats)
+        print(f"gallery {size}: {len(index.centroids)} lists, built in {build_s:.1f}s, "
+              f"exact scan {exact_ms:.2f} ms/frame")
+        for n_probe in args.probes:
+            index.n_probe = n_probe
+            ann_ms = time_call(lambda: index.search(probes[:args.faces]), repeats=args.repeats)
+            recall = recall_at_1(index, gallery, ids, probes)
+            print(f"  n_probe={n_probe:<3} {ann_ms:7.2f} ms/frame  recall@1={recall:.3f}")
+
+
+def measure(label, func, repeatable=True):
+    """
+    Prints wall time and peak Python/NumPy allocations of func().
+    Timing is taken from an untraced run; one-shot funcs are timed under tracemalloc.
+    """
+    if repeatable:
+        start = time.perf_counter()
+        func()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    if not repeatable:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<28} {elapsed_ms:9.1f} ms  peak alloc {peak / 2**20:7.1f} MiB")
+    return result
+
+
+def legacy_load(db_name):
+    # The pre-migration load_known_faces: one pickle.loads and one array per student.
+    conn = sqlite3.connect(db_name)
+    rows = conn.execute("SELECT id, first_name, last_name, face_encoding FROM Students").fetchall()
+    conn.close()
+    return [pickle.loads(row[3]) for row in rows], [row[0] for row in rows], [f"{row[1]} {row[2]}" for row in rows]
+
+
+def resident_mib():
+    """
+    (resident, of which file-backed) MiB of this process. File-backed pages, such as a
+    memory-mapped sidecar, are shared and can be evicted. Without /proc (not Linux) the
+    peak resident size is returned, and None for the split.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        kib = lambda key: int(fields.get(key, "0 kB").split()[0])
+        return kib("VmRSS") / 1024, (kib("RssFile") + kib("RssShmem")) / 1024
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2**20 if peak > 2**32 else 2**10), None  # bytes on macOS, KiB elsewhere
+
+
+STARTUP_LOADERS = {
+    "pickle": legacy_load,
+    "blob": lambda db_name: load_gallery(db_name, use_sidecar=False),
+    "sidecar": load_gallery,
+}
+
+
+def _resident_startup(loader, db_name):
+    # Runs in a fresh interpreter, so memory freed by an earlier variant cannot be reused.
+    before, before_file = resident_mib()
+    start = time.perf_counter()
+    gallery, ids, names = STARTUP_LOADERS[loader](db_name)
+    matcher = FaceMatcher(gallery, ids, names)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    after, after_file = resident_mib()
+    file_mib = None if before_file is None else after_file - before_file
+    return elapsed_ms, after - before, file_mib, len(matcher.ids)
+
+
+def measure_resident(label, loader, db_name):
+    """Prints load time and resident memory growth of loading the gallery into a FaceMatcher."""
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        elapsed_ms, rss, file_mib, _ = pool.submit(_resident_startup, loader, db_name).result()
+    split = "" if file_mib is None else f" ({file_mib:6.1f} MiB file-backed)"
+    print(f"  {label:<28} {elapsed_ms:9.1f} ms  resident +{rss:7.1f} MiB{split}")
+
+
+def bench_startup(args):
+    for size in args.sizes:
+        print(f"gallery {size}:")
+        with tempfile.TemporaryDirectory() as tmp:
+            db_name = os.path.join(tmp, "attendance.db")
+            conn = sqlite3.connect(db_name)
+            setup_database(conn)
+            gallery = make_gallery(size).astype(np.float64)
+            conn.executemany(
+                "INSERT INTO Students (first_name, last_name, face_encoding) VALUES (?, ?, ?)",
+                ((f"First{i}", f"Last{i}", pickle.dumps(row)) for i, row in enumerate(gallery)))
+            conn.commit()
+            conn.close()
+
+            measure_resident("before: pickled rows", "pickle", db_name)
+            measure("one-shot migration", lambda: migrate_pickled_encodings(db_name), repeatable=False)
+            measure_resident("after: BLOB frombuffer", "blob", db_name)
+            load_gallery(db_name)  # writes the sidecar
+            measure_resident("after: mmap sidecar", "sidecar", db_name)
+
+
+def bench_attendance(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "attendance.db")
+        conn = sqlite3.connect(db_name)
+        setup_database(conn)
+        conn.close()
+
+        # Before: the old mark_attendance, one connection and commit per check-in.
+        start = time.perf_counter()
+        for student_id in range(args.checkins):
+            conn = sqlite3.connect(db_name)
+            conn.execute("INSERT INTO Attendance (student_id, date, check_in_time, status) "
+                         "VALUES (?, '2000-01-01', '08:00:00', 'PRESENT')", (student_id,))
+            conn.commit()
+            conn.close()
+        legacy_rate = args.checkins / (time.perf_counter() - start)
+
+        writer = AttendanceWriter(db_name)
+        when = datetime.datetime(2000, 1, 2, 8, 0)
+        start = time.perf_counter()
+        for student_id in range(args.checkins):
+            writer.check_in(student_id, when)
+        writer.flush()
+        writer_rate = args.checkins / (time.perf_counter() - start)
+        writer.close()
+        print(f"check-ins/sec: per-row connect+commit {legacy_rate:9.0f} | batched WAL writer {writer_rate:9.0f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "attendance.db")
+        conn = sqlite3.connect(db_name)
+        conn.execute("CREATE TABLE Attendance (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER NOT NULL, "
+                      "date TEXT NOT NULL, check_in_time TEXT, status TEXT NOT NULL)")
+        first_day = datetime.date(2000, 1, 1)
+        days = [(first_day + datetime.timedelta(days=d)).isoformat() for d in range(args.days)]
+        rng = np.random.default_rng(0)
+        for day in days:
+            present = rng.random(args.students) < 0.9
+            conn.executemany(
+                "INSERT INTO Attendance (student_id, date, check_in_time, status) VALUES (?, ?, ?, ?)",
+                ((s, day, "08:00:00" if p else None, "PRESENT" if p else "ABSENT")
+                 for s, p in enumerate(present.tolist())))
+        conn.commit()
+        print(f"history: {args.days} days x {args.students} students = {args.days * args.students} rows")
+
+        report_day = days[len(days) // 2]
+        queries = {
+            "present ids": ("SELECT student_id FROM Attendance WHERE date = ? AND status = 'PRESENT'", (report_day,)),
+            "absent count": ("SELECT count(*) FROM Attendance WHERE date = ? AND status = 'ABSENT'", (report_day,)),
+            "student on day": ("SELECT 1 FROM Attendance WHERE date = ? AND student_id = ?", (report_day, 7)),
+        }
+        before = {name: time_call(lambda: conn.execute(*q).fetchall(), repeats=5) for name, q in queries.items()}
+        MIGRATIONS[0](conn.cursor())  # the attendance indexes; the other steps need the full schema
+        conn.commit()
+        for name, q in queries.items():
+            after = time_call(lambda: conn.execute(*q).fetchall(), repeats=5)
+            print(f"  {name:<16} no index {before[name]:8.2f} ms | indexed {after:7.3f} ms")
+        conn.close()
+
+
+def bench_absence(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "attendance.db")
+        conn = sqlite3.connect(db_name)
+        setup_database(conn)
+        blob = b"\0" * 520
+        conn.executemany(
+            "INSERT INTO Students (first_name, last_name, guardian_email, face_encoding) VALUES (?, ?, ?, ?)",
+            ((f"First{i}", f"Last{i}", f"guardian{i}@example.com", blob) for i in range(args.students)))
+        rng = np.random.default_rng(0)
+        present = np.flatnonzero(rng.random(args.students) < 1 - args.absent_rate) + 1
+        for day in ("2000-01-01", "2000-01-02"):
+            conn.executemany("INSERT INTO Attendance (student_id, date, check_in_time, status) "
+                             "VALUES (?, ?, '08:00:00', 'PRESENT')", ((int(s), day) for s in present))
+        conn.commit()
+
+        # Before: end_of_day_report's loop, Python set membership and one execute per absentee.
+        start = time.perf_counter()
+        cursor = conn.cursor()
+        students = cursor.execute("SELECT id, first_name, last_name, guardian_email FROM Students").fetchall()
+        present_ids = {row[0] for row in cursor.execute(
+            "SELECT student_id FROM Attendance WHERE date = ? AND status = 'PRESENT'", ("2000-01-01",))}
+        legacy = 0
+        for s_id, _, _, _ in students:
+            if s_id not in present_ids:
+                cursor.execute("INSERT INTO Attendance (student_id, date, status) VALUES (?, ?, 'ABSENT')",
+                               (s_id, "2000-01-01"))
+                legacy += 1
+        conn.commit()
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        absentees = record_absences(conn, "2000-01-02")
+        set_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        again = record_absences(conn, "2000-01-02")
+        rerun_ms = (time.perf_counter() - start) * 1000
+        conn.close()
+
+        assert len(absentees) == legacy and not again
+        print(f"{args.students} students, {len(absentees)} absent: python loop {legacy_ms:.1f} ms | "
+              f"INSERT ... SELECT {set_ms:.1f} ms | rerun (no-op) {rerun_ms:.1f} ms")
+
+
+def read_frames(path, limit):
+    """Decodes up to `limit` frames of a recorded clip (or frame folder) as RGB."""
+    source, _ = open_source(path)
+    frames = []
+    try:
+        while len(frames) < limit:
+            ret, frame = source.read()
+            if not ret:
+                break
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    finally:
+        source.release()
+    return frames
+
+
+def bench_detect(args):
+    frames = read_frames(args.source, args.frames)
+    if not frames:
+        print(f"No frames in {args.source}.")
+        return
+    # Recall is measured against the slowest, most sensitive setting on the same frames.
+    reference = [detect_faces(rgb, (args.reference,)) for rgb in frames]
+    total = sum(len(boxes) for boxes in reference)
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames at {width}x{height}, {total} faces at scale {args.reference}")
+
+    for setting in args.settings:
+        scales = tuple(float(s) for s in setting.split(","))
+        stats = LatencyStats()
+        start = time.perf_counter()
+        found = [detect_faces(rgb, scales, stats=stats) for rgb in frames]
+        elapsed = time.perf_counter() - start
+        hits = sum(1 for ref, got in zip(reference, found) for box in ref
+                   if any(iou(box, other) >= 0.5 for other in got))
+        recall = hits / total if total else 1.0
+        escalations = stats.counters.get("detect_escalations", 0)
+        print(f"  scales {setting:<12} {elapsed / len(frames) * 1000:7.1f} ms/frame "
+              f"({len(frames) / elapsed:5.1f} fps)  recall={recall:.3f}  escalations={escalations}")
+
+
+def bench_detectors(args):
+    frames = read_frames(args.source, args.frames)
+    if not frames:
+        print(f"No frames in {args.source}.")
+        return
+    frames = [cv2.resize(rgb, (0, 0), fx=args.scale, fy=args.scale) for rgb in frames]
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames detected at {width}x{height}")
+
+    for name in args.backends:
+        detector = make_detector(name)
+        try:
+            detector.detect(frames[0])  # loads the model outside the timed runs
+        except (ValueError, RuntimeError, cv2.error) as e:
+            print(f"  {name:<5} skipped: {e}")
+            continue
+        start = time.perf_counter()
+        found = [detector.detect(rgb) for rgb in frames]
+        single_ms = (time.perf_counter() - start) / len(frames) * 1000
+        start = time.perf_counter()
+        for first in range(0, len(frames), args.batch):
+            detector.detect_batch(frames[first:first + args.batch])
+        batch_ms = (time.perf_counter() - start) / len(frames) * 1000
+        rate = sum(1 for boxes in found if boxes) / len(frames)
+        faces = sum(len(boxes) for boxes in found) / len(frames)
+        print(f"  {name:<5} {single_ms:7.1f} ms/frame | batch of {args.batch}: {batch_ms:7.1f} ms/frame | "
+              f"frames with a face {rate:.1%} | faces/frame {faces:.2f}")
+
+
+def make_people(people, samples, seed=0):
+    """
+    Synthetic evaluation set shaped like dlib encodings: different people are about
+    0.65 apart, photos of one person about 0.4, and every person has a few pose
+    "modes" that a single template cannot cover equally well.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(scale=0.65 / np.sqrt(2 * ENCODING_DIM), size=(people, ENCODING_DIM))
+    spread = rng.uniform(0.6, 1.4, size=people)  # some people vary much more than others
+    modes = centres[:, None, :] + rng.normal(scale=0.3 / np.sqrt(2 * ENCODING_DIM), size=(people, 3, ENCODING_DIM)) * spread[:, None, None]
+    pick = rng.integers(0, 3, size=(people, samples))
+    encodings = modes[np.arange(people)[:, None], pick] + \
+        rng.normal(scale=0.3 / np.sqrt(2 * ENCODING_DIM), size=(people, samples, ENCODING_DIM)) * spread[:, None, None]
+    return encodings.reshape(-1, ENCODING_DIM).astype(np.float32), np.repeat(np.arange(people), samples)
+
+
+def bench_templates(args):
+    encodings, labels = make_people(args.people, args.samples)
+    print_evaluation(*evaluate(encodings, labels, tuple(args.templates)))
+
+
+def bench_precision(args):
+    """
+    Accuracy at the 0.5 threshold, memory and speed of every gallery precision.
+    Half of the probes are second photos of enrolled people, half are people who
+    are not enrolled; "changed" counts probes whose outcome differs from float32.
+    """
+    queries = args.queries // 2
+    for size in args.sizes:
+        encodings, _ = make_people(size + queries, 2)
+        gallery = encodings[0::2][:size]
+        ids = list(range(size))
+        rng = np.random.default_rng(1)
+        known = rng.choice(size, size=min(queries, size), replace=False)
+        probes = np.concatenate([encodings[1::2][known], encodings[1::2][size:]])
+        truth = known.tolist() + [None] * queries
+
+        print(f"gallery {size}, {len(known)} enrolled + {queries} unknown probes, tolerance 0.5")
+        print(f"  {'precision':<9} | {'memory (MiB)':>12} | {'build (s)':>9} | {'matches/s':>9} | "
+              f"{'accepted':>8} | {'false acc.':>10} | changed")
+        reference = None
+        for precision in args.precisions:
+            start = time.perf_counter()
+            matcher = FaceMatcher(gallery, ids, ids, tolerance=0.5, precision=precision)
+            build_s = time.perf_counter() - start
+            found = [m.student_id for m in matcher.match(probes)]
+            if reference is None:
+                reference = found
+            frame_ms = time_call(lambda: matcher.match(probes[:args.faces]), repeats=args.repeats)
+            accepted = np.mean([f == t for f, t in zip(found[:len(known)], truth)])
+            false_accept = np.mean([f is not None for f in found[len(known):]])
+            changed = np.mean([f != r for f, r in zip(found, reference)])
+            print(f"  {precision:<9} | {matcher.store.nbytes / 2**20:>12.2f} | {build_s:>9.2f} | "
+                  f"{args.faces * 1000 / frame_ms:>9.0f} | {accepted:>8.1%} | {false_accept:>10.2%} | {changed:.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the attendance system.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    matcher_cmd = commands.add_parser("matcher", help="Per-frame face matching cost vs gallery size.")
+    matcher_cmd.add_argument("--sizes", type=int, nargs="+", default=GALLERY_SIZES)
+    matcher_cmd.add_argument("--faces", type=int, default=FACES_PER_FRAME)
+    matcher_cmd.add_argument("--repeats", type=int, default=REPEATS)
+    matcher_cmd.set_defaults(func=bench_matcher)
+
+    ann_cmd = commands.add_parser("ann", help="IVF index latency and recall@1 against exact search.")
+    ann_cmd.add_argument("--sizes", type=int, nargs="+", default=GALLERY_SIZES)
+    ann_cmd.add_argument("--probes", type=int, nargs="+", default=[1, 4, 8, 16])
+    ann_cmd.add_argument("--queries", type=int, default=500)
+    ann_cmd.add_argument("--faces", type=int, default=FACES_PER_FRAME)
+    ann_cmd.add_argument("--repeats", type=int, default=REPEATS)
+    ann_cmd.set_defaults(func=bench_ann)
+
+    startup_cmd = commands.add_parser("startup", help="Gallery load time and resident memory (RSS), pickle vs binary storage.")
+    startup_cmd.add_argument("--sizes", type=int, nargs="+", default=GALLERY_SIZES)
+    startup_cmd.set_defaults(func=bench_startup)
+
+    attendance_cmd = commands.add_parser("attendance", help="Check-in write rate and report queries over a year of history.")
+    attendance_cmd.add_argument("--checkins", type=int, default=2000)
+    attendance_cmd.add_argument("--students", type=int, default=2000)
+    attendance_cmd.add_argument("--days", type=int, default=365)
+    attendance_cmd.set_defaults(func=bench_attendance)
+
+    absence_cmd = commands.add_parser("absence", help="End-of-day absence computation for a large school.")
+    absence_cmd.add_argument("--students", type=int, default=50_000)
+    absence_cmd.add_argument("--absent-rate", type=float, default=0.1)
+    absence_cmd.set_defaults(func=bench_absence)
+
+    detect_cmd = commands.add_parser("detect", help="Detection cost and recall of scale settings on a recorded clip.")
+    detect_cmd.add_argument("source", help="Video file or folder of frames")
+    detect_cmd.add_argument("--settings", nargs="+", default=["0.25", "0.5", "0.25,0.5", "0.25,0.5,1"],
+                            help="Comma-separated scale pyramids to compare")
+    detect_cmd.add_argument("--reference", type=float, default=1.0, help="Scale whose detections count as ground truth")
+    detect_cmd.add_argument("--frames", type=int, default=200)
+    detect_cmd.set_defaults(func=bench_detect)
+
+    detectors_cmd = commands.add_parser("detectors", help="Latency and detection rate of each detector backend on a recorded clip.")
+    detectors_cmd.add_argument("source", help="Video file or folder of frames")
+    detectors_cmd.add_argument("--backends", nargs="+", default=["hog", "cnn", "haar", "dnn"])
+    detectors_cmd.add_argument("--scale", type=float, default=0.5, help="Frames are downscaled by this before detection")
+    detectors_cmd.add_argument("--batch", type=int, default=8)
+    detectors_cmd.add_argument("--frames", type=int, default=100)
+    detectors_cmd.set_defaults(func=bench_detectors)
+
+    templates_cmd = commands.add_parser("templates", help="FAR/FRR and matching cost vs templates per student (synthetic).")
+    templates_cmd.add_argument("--people", type=int, default=1000)
+    templates_cmd.add_argument("--samples", type=int, default=8, help="Encodings per person")
+    templates_cmd.add_argument("--templates", type=int, nargs="+", default=[1, 2, 3, 5])
+    templates_cmd.set_defaults(func=bench_templates)
+
+    precision_cmd = commands.add_parser("precision", help="Accuracy, memory and matches/sec of each gallery precision (synthetic).")
+    precision_cmd.add_argument("--sizes", type=int, nargs="+", default=GALLERY_SIZES)
+    precision_cmd.add_argument("--precisions", nargs="+", choices=PRECISIONS, default=list(PRECISIONS),
+                               help="The first one is the reference for the changed column")
+    precision_cmd.add_argument("--queries", type=int, default=2000)
+    precision_cmd.add_argument("--faces", type=int, default=FACES_PER_FRAME)
+    precision_cmd.add_argument("--repeats", type=int, default=REPEATS)
+    precision_cmd.set_defaults(func=bench_precision)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
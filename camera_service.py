@@ -0,0 +1,281 @@
+import argparse
+import json
+import sqlite3
+import time
+from datetime import datetime
+from functools import partial
+
+import cv2
+
+from actuators import GPIO_PIN_SERVO, LCD_I2C_ADDRESS, SOUND_FOLDER, make_actuators
+from api_server import ApiServer
+from attendance_session import AttendanceSession
+from attendance_writer import AttendanceWriter
+from database_setup import setup_database
+from detectors import DEFAULT_DETECTOR, make_detector
+from encoding_store import load_gallery, load_thresholds
+from face_matcher import AGGREGATIONS, FaceMatcher
+from face_tracker import FaceTracker
+from gallery_sync import GallerySync, latest_change
+from metrics import LatencyStats, MetricsServer
+from motion_gate import MotionGate
+from pipeline import ActionWorker, FairRecognitionPool, FrameGrabber
+from quantization import PRECISIONS
+from recognition import DELAY_SECONDS, recognize_frame, update_attendance
+from replay import open_source
+
+# --- SETTINGS ---
+DB_NAME = "attendance.db"
+RECOGNITION_WORKERS = 2
+REPORT_SECONDS = 60
+WELCOME_SECONDS = 3.0    # How long a door's LCD shows "Welcome" before returning to its lesson
+
+
+class Camera:
+    """
+    One door: its capture source, classroom/lesson context, tracker, motion gate,
+    dwell timers, action thread, door/LCD/audio (see actuators.py) and metrics.
+    Cameras never share per-face state; they only share the gallery and the
+    recognition workers.
+    """
+
+    def __init__(self, name, source, classroom="Unknown Room", lesson="", roi=None, detector=DEFAULT_DETECTOR,
+                 servo_pin=GPIO_PIN_SERVO, lcd_address=LCD_I2C_ADDRESS, sound_folder=SOUND_FOLDER, simulate=False):
+        self.name = name
+        self.source = source
+        self.classroom = classroom
+        self.lesson = lesson
+        self.roi = roi
+        self.detector = make_detector(detector)
+        self.hardware_settings = {"servo_pin": servo_pin, "lcd_address": lcd_address,
+                                  "sound_folder": sound_folder, "simulate": simulate}
+        self.hardware = None
+        self.stats = LatencyStats()
+        self.tracker = FaceTracker()
+        self.gate = MotionGate(roi=roi, stats=self.stats)
+        self.actions = ActionWorker(stats=self.stats)
+        self.todays_attendance_ids = AttendanceSession(datetime.now().strftime("%Y-%m-%d"), lesson)
+        self.detection_timers = {}
+        self.faces = []
+        self.admitted = []
+        self.capture = None
+        self.grabber = None
+        self.fps = None  # set for recorded sources, which run on video time
+        self.last_seq = 0
+
+    def open(self):
+        self.hardware = make_actuators(**self.hardware_settings)
+        self.hardware.lcd.write(self.lesson or self.classroom, "Scanning...")
+        if isinstance(self.source, int):
+            self.capture = cv2.VideoCapture(self.source)
+            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        else:
+            self.capture, self.fps = open_source(self.source)
+        self.grabber = FrameGrabber(self.capture, stats=self.stats, drop=self.fps is None).start()
+        return self
+
+    def clock(self, seq):
+        """
+        The time of frame seq: wall-clock time for a live camera, video time from the
+        frame index for a file or frame folder (as in replay.py), so dwell times on a
+        recording do not depend on how fast this machine decodes it.
+        """
+        return time.time() if self.fps is None else (seq - 1) / self.fps
+
+    def close(self):
+        self.grabber.stop()
+        self.actions.stop()
+        self.capture.release()
+        self.hardware.close()
+
+    def welcome(self, name):
+        """Greets an admitted student at this door. Runs on the camera's action thread, but only queues work."""
+        self.hardware.lcd.flash("Welcome:", name, WELCOME_SECONDS)
+        self.hardware.audio.play(name)
+        self.hardware.door.open()
+
+    def status(self):
+        """Live state for the API: plain values only, read from another thread."""
+        return {"classroom": self.classroom, "lesson": self.lesson, "frames": self.last_seq,
+                "faces": len(self.faces), "checked_in": len(self.todays_attendance_ids),
+                "admitted": len(self.admitted)}
+
+    def report(self, elapsed):
+        stages, counters = self.stats.snapshot()
+        processed = stages.get("recognize", {}).get("count", 0)
+        return {
+            "classroom": self.classroom,
+            "lesson": self.lesson,
+            "frames": self.last_seq,
+            "processed_frames": processed,
+            "fps": round(self.last_seq / elapsed, 2) if elapsed > 0 else 0.0,
+            "recognized_fps": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+            "stages": {stage: {k: round(v, 3) for k, v in s.items()} for stage, s in stages.items()},
+            "counters": counters,
+            "admitted": self.admitted,
+        }
+
+
+def load_cameras(path):
+    """
+    Reads the camera list from JSON:
+    [{"name": "door-a", "source": 0, "classroom": "B101", "lesson": "Physics", "roi": [0.25, 0, 0.75, 1],
+      "servo_pin": 17, "lcd_address": 39}, ...]
+    A source is a camera index, a video file or a folder of frames. An optional
+    "detector" picks the backend per camera (default hog). Every door drives its own
+    servo, LCD and sounds ("sound_folder"); "simulate": true prints them instead.
+    """
+    with open(path) as f:
+        entries = json.load(f)
+    return [Camera(entry["name"], entry["source"], entry.get("classroom", "Unknown Room"),
+                   entry.get("lesson", ""), entry.get("roi"), entry.get("detector", DEFAULT_DETECTOR),
+                   entry.get("servo_pin", GPIO_PIN_SERVO), entry.get("lcd_address", LCD_I2C_ADDRESS),
+                   entry.get("sound_folder", SOUND_FOLDER), entry.get("simulate", False))
+            for entry in entries]
+
+
+def run_service(cameras, matcher, admit, workers=RECOGNITION_WORKERS, duration=None,
+                delay=DELAY_SECONDS, report_every=REPORT_SECONDS):
+    """
+    Drives every camera from one thread: new frames go through the camera's motion
+    gate into the shared FairRecognitionPool, and finished results go through the
+    dwell-time rule. admit(camera, student_id, name) runs on the camera's own action
+    thread, so a slow door never holds up another one.
+    Recorded sources are not sampled like live ones: every frame is recognized, in
+    order and on video time, so their admissions are the same on any machine.
+    Runs until every source has ended (or for `duration` seconds) and returns a
+    per-camera report.
+    """
+    pool = FairRecognitionPool(workers)
+    for camera in cameras:
+        pool.add_camera(camera.name, partial(recognize_frame, matcher=matcher, tracker=camera.tracker,
+                                             stats=camera.stats, roi=camera.roi, detector=camera.detector),
+                        camera.stats)
+        camera.open()
+
+    start = last_report = time.perf_counter()
+    active = list(cameras)
+    try:
+        while active and (duration is None or time.perf_counter() - start < duration):
+            got_frame = False
+            for camera in list(active):
+                seq, frame = camera.last_seq, None
+                # A recorded source waits for its previous frame, so none is skipped.
+                if camera.fps is None or not pool.busy(camera.name):
+                    seq, frame = camera.grabber.next_frame(camera.last_seq, timeout=0)
+                if frame is not None:
+                    got_frame = True
+                    camera.last_seq = seq
+                    if camera.gate.check(frame, camera.clock(seq), tracking=bool(camera.faces)):
+                        pool.submit(camera.name, seq, frame, now=camera.clock(seq))
+                elif camera.grabber.ended and not pool.busy(camera.name):
+                    active.remove(camera)
+
+                for result_seq, faces in pool.results(camera.name):
+                    camera.faces = faces
+                    today = datetime.now().strftime("%Y-%m-%d")
+                    if camera.todays_attendance_ids.date != today:
+                        camera.todays_attendance_ids = AttendanceSession(today, camera.lesson)
+                    now = camera.clock(result_seq)
+                    _, _, admitted = update_attendance(
+                        faces, camera.todays_attendance_ids, camera.detection_timers, now=now, delay=delay,
+                        live_tracks=camera.tracker.live_track_ids())
+                    for student_id, name in admitted:
+                        seconds = time.perf_counter() - start if camera.fps is None else now
+                        camera.admitted.append({"student_id": student_id, "name": name, "time": round(seconds, 3)})
+                        camera.actions.submit(admit, camera, student_id, name)
+
+            if not got_frame:
+                time.sleep(0.005)
+            if time.perf_counter() - last_report > report_every:
+                last_report = time.perf_counter()
+                for camera in cameras:
+                    print(f"STATS [{camera.name}]:\n{camera.stats.summary()}")
+    finally:
+        pool.stop()
+        for camera in cameras:
+            camera.close()
+
+    elapsed = time.perf_counter() - start
+    return {camera.name: camera.report(elapsed) for camera in cameras}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several cameras/doors in one process on one shared gallery.")
+    parser.add_argument("config", help="JSON camera list (see load_cameras)")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--workers", type=int, default=RECOGNITION_WORKERS, help="Recognition threads shared by all cameras")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Do not write attendance or move any door, only report admissions")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--aggregation", choices=AGGREGATIONS, default="min",
+                        help="Score students by their nearest template or the mean over all of them")
+    parser.add_argument("--precision", choices=PRECISIONS, default="float32",
+                        help="Gallery storage: float32, or float16/int8/pq to save memory")
+    parser.add_argument("--metrics-port", type=int, help="Serve per-camera Prometheus metrics on this port")
+    parser.add_argument("--api-port", type=int, help="Serve status, attendance and live check-ins (api_server.py) on this port")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    setup_database(conn)
+    conn.close()
+
+    # One memory-mapped gallery for every camera, kept current while the service runs.
+    change_seq = latest_change(args.db)
+    gallery, ids, names = load_gallery(args.db)
+    matcher = GallerySync(FaceMatcher(gallery, ids, names, tolerance=0.5, thresholds=load_thresholds(args.db),
+                                      aggregation=args.aggregation, precision=args.precision), args.db, since=change_seq).start()
+    print(f"Database: {len(ids)} faces loaded.")
+
+    writer = None if args.dry_run else AttendanceWriter(args.db)
+
+    api = None
+
+    def admit(camera, student_id, name):
+        print(f"[{camera.name}] ENTER: {name} ({camera.classroom} {camera.lesson})")
+        camera.welcome(name)
+        if writer is not None:
+            writer.check_in(student_id, lesson=camera.lesson, classroom=camera.classroom)
+        if api is not None:
+            api.check_in(student_id, name, camera.lesson, camera.classroom, camera=camera.name)
+
+    cameras = load_cameras(args.config)
+    if args.dry_run:
+        for camera in cameras:
+            camera.hardware_settings["simulate"] = True
+    today = datetime.now().strftime("%Y-%m-%d")
+    for camera in cameras:
+        camera.todays_attendance_ids = AttendanceSession.load(args.db, today, camera.lesson)
+
+    def sources():
+        return [({"camera": camera.name}, camera.stats) for camera in cameras]
+
+    server = None
+    if args.metrics_port:
+        server = MetricsServer.try_start(sources, args.metrics_port)
+    if args.api_port:
+        api = ApiServer(lambda: {"cameras": {camera.name: camera.status() for camera in cameras}},
+                        sources, args.db, args.api_port).start()
+    try:
+        report = run_service(cameras, matcher, admit, workers=args.workers, duration=args.duration)
+    finally:
+        if server is not None:
+            server.stop()
+        if api is not None:
+            api.stop()
+        matcher.stop()
+        if writer is not None:
+            writer.close()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,32 +2,241 @@ import sqlite3
 
 DB_NAME = "attendance.db"
 
-conn = sqlite3.connect(DB_NAME)
-cursor = conn.cursor()
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS Students (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    first_name TEXT NOT NULL,
-    last_name TEXT NOT NULL,
-    guardian_phone TEXT,
-    guardian_email TEXT,
-    face_encoding BLOB NOT NULL
-);
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS Attendance (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    student_id INTEGER NOT NULL,
-    date TEXT NOT NULL,
-    check_in_time TEXT,
-    status TEXT NOT NULL,
-    FOREIGN KEY (student_id) REFERENCES Students (id)
-);
-''')
-
-print("Database and tables were created successfully!")
-
-conn.commit()
-conn.close()
\ No newline at end of file
+def setup_database(conn):
+    """Creates all tables and triggers. Safe to run on an existing database."""
+    cursor = conn.cursor()
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        guardian_phone TEXT,
+        guardian_email TEXT,
+        face_encoding BLOB NOT NULL
+    );
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Attendance (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        check_in_time TEXT,
+        status TEXT NOT NULL,
+        FOREIGN KEY (student_id) REFERENCES Students (id)
+    );
+    ''')
+
+    # Bumped on every change to Students so cached galleries know when they are stale.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS GalleryVersion (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    );
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO GalleryVersion (id, version) VALUES (1, 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS students_{event.lower()}_version AFTER {event} ON Students
+        BEGIN
+            UPDATE GalleryVersion SET version = version + 1 WHERE id = 1;
+        END;
+        ''')
+
+    conn.commit()
+    migrate(conn)
+
+# --- MIGRATIONS ---
+# Each step runs once, in order; PRAGMA user_version records how many have been applied.
+
+def _attendance_indexes(cursor):
+    # The unique index below would fail on old duplicates: keep the earliest PRESENT row.
+    cursor.execute('''
+    DELETE FROM Attendance
+    WHERE status = 'PRESENT' AND id NOT IN (
+        SELECT MIN(id) FROM Attendance WHERE status = 'PRESENT' GROUP BY date, student_id
+    );
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_date_student ON Attendance (date, student_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_date_status ON Attendance (date, status)")
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_present
+    ON Attendance (date, student_id) WHERE status = 'PRESENT';
+    ''')
+
+def _notification_outbox(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS NotificationOutbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dedupe_key TEXT NOT NULL UNIQUE,
+        recipient TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        body TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'PENDING',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL DEFAULT 0,
+        last_error TEXT,
+        message_id TEXT,
+        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        sent_at TEXT
+    );
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON NotificationOutbox (status, next_attempt_at)")
+
+def _student_changes(cursor):
+    # Append-only log of which students changed, so a running app can reload just those rows.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS StudentChanges (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER NOT NULL
+    );
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS students_insert_change AFTER INSERT ON Students
+    BEGIN
+        INSERT INTO StudentChanges (student_id) VALUES (NEW.id);
+    END;
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS students_update_change
+    AFTER UPDATE OF id, first_name, last_name, face_encoding ON Students
+    BEGIN
+        INSERT INTO StudentChanges (student_id) VALUES (NEW.id);
+        INSERT INTO StudentChanges (student_id) SELECT OLD.id WHERE OLD.id != NEW.id;
+    END;
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS students_delete_change AFTER DELETE ON Students
+    BEGIN
+        INSERT INTO StudentChanges (student_id) VALUES (OLD.id);
+    END;
+    ''')
+
+def _attendance_lessons(cursor):
+    # Attendance is kept per lesson: a student may be PRESENT once per (date, lesson).
+    cursor.execute("ALTER TABLE Attendance ADD COLUMN lesson TEXT")
+    cursor.execute("ALTER TABLE Attendance ADD COLUMN classroom TEXT")
+    cursor.execute("DROP INDEX IF EXISTS uq_attendance_present")
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_present_lesson
+    ON Attendance (date, student_id, COALESCE(lesson, '')) WHERE status = 'PRESENT';
+    ''')
+
+def _analytics_tables(cursor):
+    # Aggregates maintained by analytics.refresh_day; see analytics.py.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_student_date ON Attendance (student_id, date)")
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS DailySummary (
+        date TEXT PRIMARY KEY,
+        weekday INTEGER NOT NULL,
+        present INTEGER NOT NULL,
+        absent INTEGER NOT NULL,
+        late INTEGER NOT NULL
+    );
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS LessonDaily (
+        date TEXT NOT NULL,
+        lesson TEXT NOT NULL,
+        classroom TEXT NOT NULL,
+        present INTEGER NOT NULL,
+        late INTEGER NOT NULL,
+        mean_check_in_seconds REAL,
+        PRIMARY KEY (date, lesson, classroom)
+    );
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_lesson_daily_lesson ON LessonDaily (lesson, date)")
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS StudentMonthly (
+        student_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        present_days INTEGER NOT NULL,
+        absent_days INTEGER NOT NULL,
+        late_days INTEGER NOT NULL,
+        lessons INTEGER NOT NULL,
+        PRIMARY KEY (student_id, month)
+    );
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS AnalyticsDays (
+        date TEXT PRIMARY KEY,
+        refreshed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    ''')
+
+def _job_runs(cursor):
+    # Last day each scheduled job (see jobs.py) completed, so missed runs can be made up after a restart.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS JobRuns (
+        name TEXT PRIMARY KEY,
+        last_date TEXT,
+        finished_at TEXT,
+        last_error TEXT
+    );
+    ''')
+
+def _face_templates(cursor):
+    # Extra encodings per student (see face_templates.py); Students.face_encoding stays the enrolled one.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS FaceTemplates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER NOT NULL,
+        encoding BLOB NOT NULL,
+        source TEXT NOT NULL DEFAULT 'enroll',
+        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (student_id) REFERENCES Students (id)
+    );
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_face_templates_student ON FaceTemplates (student_id)")
+    # Per-student match threshold; NULL means the global tolerance.
+    cursor.execute("ALTER TABLE Students ADD COLUMN match_threshold REAL")
+    cursor.execute("DROP TRIGGER IF EXISTS students_update_change")
+    cursor.execute('''
+    CREATE TRIGGER students_update_change
+    AFTER UPDATE OF id, first_name, last_name, face_encoding, match_threshold ON Students
+    BEGIN
+        INSERT INTO StudentChanges (student_id) VALUES (NEW.id);
+        INSERT INTO StudentChanges (student_id) SELECT OLD.id WHERE OLD.id != NEW.id;
+    END;
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS students_delete_templates AFTER DELETE ON Students
+    BEGIN
+        DELETE FROM FaceTemplates WHERE student_id = OLD.id;
+    END;
+    ''')
+    for event, student in (("INSERT", "NEW"), ("DELETE", "OLD")):
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS face_templates_{event.lower()}_change AFTER {event} ON FaceTemplates
+        BEGIN
+            INSERT INTO StudentChanges (student_id) VALUES ({student}.student_id);
+            UPDATE GalleryVersion SET version = version + 1 WHERE id = 1;
+        END;
+        ''')
+
+MIGRATIONS = [
+    _attendance_indexes,
+    _notification_outbox,
+    _student_changes,
+    _attendance_lessons,
+    _analytics_tables,
+    _job_runs,
+    _face_templates,
+]
+
+def migrate(conn):
+    """Applies any migrations the database has not seen yet."""
+    cursor = conn.cursor()
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        step(cursor)
+        cursor.execute(f"PRAGMA user_version = {number}")
+        conn.commit()
+        print(f"MIGRATION: database schema is now version {number}.")
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(DB_NAME)
+    setup_database(conn)
+    conn.close()
+    print("Database and tables were created successfully!")
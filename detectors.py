@@ -0,0 +1,147 @@
+import os
+import threading
+
+import cv2
+
+from lazy_modules import face_recognition
+
+# --- SETTINGS ---
+DEFAULT_DETECTOR = "hog"
+CNN_BATCH_SIZE = 8
+HAAR_CASCADE = "haarcascade_frontalface_default.xml"
+DNN_PROTOTXT = os.path.join("models", "deploy.prototxt")
+DNN_MODEL = os.path.join("models", "res10_300x300_ssd_iter_140000.caffemodel")
+DNN_CONFIDENCE = 0.5
+
+# Every detector takes RGB images and returns (top, right, bottom, left) boxes in
+# that image's pixels, the same convention as face_recognition.face_locations.
+
+
+class HogDetector:
+    """dlib HOG, the face_recognition default. CPU only, no model files."""
+
+    name = "hog"
+
+    def detect(self, rgb_image):
+        return face_recognition.face_locations(rgb_image, model="hog")
+
+    def detect_batch(self, rgb_images):
+        return [self.detect(image) for image in rgb_images]
+
+
+class CnnDetector:
+    """
+    dlib CNN (MMOD). Much more accurate on angled and small faces, but slow per
+    image on a CPU; detect_batch runs equally sized frames through the network together.
+    Batches are used where frames are already collected: enrollment bursts, bulk photo
+    folders and the benchmark. Live recognition detects one frame at a time, because
+    waiting for a batch to fill would hold back every admission by the whole batch.
+    """
+
+    name = "cnn"
+
+    def __init__(self, batch_size=CNN_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def detect(self, rgb_image):
+        return face_recognition.face_locations(rgb_image, model="cnn")
+
+    def detect_batch(self, rgb_images):
+        if len({image.shape for image in rgb_images}) > 1:
+            return [self.detect(image) for image in rgb_images]
+        return face_recognition.batch_face_locations(list(rgb_images), batch_size=self.batch_size)
+
+
+class _PerThreadModel:
+    """OpenCV models are not safe to share between threads, so each thread loads its own."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _model(self):
+        model = getattr(self._local, "model", None)
+        if model is None:
+            model = self._local.model = self._load()
+        return model
+
+    def detect_batch(self, rgb_images):
+        return [self.detect(image) for image in rgb_images]
+
+
+class HaarDetector(_PerThreadModel):
+    """OpenCV Haar cascade. The fastest option, frontal faces only, more false positives."""
+
+    name = "haar"
+
+    def __init__(self, cascade=HAAR_CASCADE, min_size=40):
+        super().__init__()
+        self.cascade = cascade if os.path.exists(cascade) else os.path.join(cv2.data.haarcascades, cascade)
+        self.min_size = min_size
+
+    def _load(self):
+        if not hasattr(cv2, "CascadeClassifier"):
+            raise ValueError("This OpenCV build has no Haar cascades (they left the main package in OpenCV 5)")
+        classifier = cv2.CascadeClassifier(self.cascade)
+        if classifier.empty():
+            raise ValueError(f"Cannot load Haar cascade: {self.cascade}")
+        return classifier
+
+    def detect(self, rgb_image):
+        gray = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
+        faces = self._model().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5,
+                                               minSize=(self.min_size, self.min_size))
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in faces]
+
+
+class DnnDetector(_PerThreadModel):
+    """
+    OpenCV DNN with the ResNet-10 SSD face model (models/deploy.prototxt and
+    models/res10_300x300_ssd_iter_140000.caffemodel from the OpenCV samples).
+    Good accuracy at a fixed 300x300 input cost, independent of frame size.
+    """
+
+    name = "dnn"
+
+    def __init__(self, prototxt=DNN_PROTOTXT, model=DNN_MODEL, confidence=DNN_CONFIDENCE):
+        super().__init__()
+        self.prototxt = prototxt
+        self.model = model
+        self.confidence = confidence
+
+    def _load(self):
+        if not (os.path.exists(self.prototxt) and os.path.exists(self.model)):
+            raise ValueError(f"DNN face model not found: {self.prototxt}, {self.model}")
+        return cv2.dnn.readNetFromCaffe(self.prototxt, self.model)
+
+    def detect(self, rgb_image):
+        height, width = rgb_image.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(rgb_image, (300, 300)), 1.0, (300, 300),
+                                     (104.0, 177.0, 123.0), swapRB=True)
+        net = self._model()
+        net.setInput(blob)
+        detections = net.forward()[0, 0]
+        boxes = []
+        for _, _, confidence, x1, y1, x2, y2 in detections:
+            if confidence < self.confidence:
+                continue
+            top, bottom = max(0, int(y1 * height)), min(height, int(y2 * height))
+            left, right = max(0, int(x1 * width)), min(width, int(x2 * width))
+            if bottom > top and right > left:
+                boxes.append((top, right, bottom, left))
+        return boxes
+
+
+DETECTORS = {
+    "hog": HogDetector,
+    "cnn": CnnDetector,
+    "haar": HaarDetector,
+    "dnn": DnnDetector,
+}
+
+
+def make_detector(name=DEFAULT_DETECTOR):
+    """Returns the detector backend registered under name (hog, cnn, haar or dnn)."""
+    try:
+        return DETECTORS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown detector '{name}', choose from: {', '.join(DETECTORS)}") from None
@@ -0,0 +1,160 @@
+import os
+import pickle
+import sqlite3
+import struct
+
+import numpy as np
+
+from database_setup import setup_database
+from face_matcher import ENCODING_DIM
+
+# --- SETTINGS ---
+DB_NAME = "attendance.db"
+
+# BLOB layout: 8 byte header, then `dim` little-endian floats.
+#   magic "FENC" | version u8 | dtype code u8 | dim u16
+MAGIC = b"FENC"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBH")
+DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2")}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+
+def encode_encoding(encoding, dtype="float32"):
+    """Serializes a face encoding to the compact BLOB format."""
+    dtype = np.dtype(dtype).newbyteorder("<")
+    values = np.asarray(encoding, dtype=dtype).reshape(-1)
+    return HEADER.pack(MAGIC, FORMAT_VERSION, DTYPE_CODES[dtype], len(values)) + values.tobytes()
+
+
+def _view(blob):
+    magic, version, code, dim = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != FORMAT_VERSION or code not in DTYPES:
+        raise ValueError("Not a face encoding BLOB (run: python encoding_store.py to migrate)")
+    return np.frombuffer(blob, dtype=DTYPES[code], count=dim, offset=HEADER.size)
+
+
+def decode_encoding(blob):
+    """Reads a BLOB written by encode_encoding back into a float32 vector."""
+    return _view(blob).astype(np.float32)
+
+
+# --- MIGRATION ---
+
+def migrate_pickled_encodings(db_name=DB_NAME, dtype="float32"):
+    """
+    One-shot conversion of legacy pickled encodings to the binary format.
+    Rows that are already converted are left alone, so it is safe to run repeatedly.
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        setup_database(conn)
+        rows = conn.execute(
+            "SELECT id, face_encoding FROM Students WHERE substr(face_encoding, 1, 4) != ?",
+            (MAGIC,)).fetchall()
+        converted = [(encode_encoding(pickle.loads(blob), dtype), student_id) for student_id, blob in rows]
+        conn.executemany("UPDATE Students SET face_encoding = ? WHERE id = ?", converted)
+        conn.commit()
+    finally:
+        conn.close()
+    if converted:
+        print(f"MIGRATION: {len(converted)} pickled encodings converted.")
+    return len(converted)
+
+
+# --- GALLERY LOADING ---
+
+# One row per template: the enrolled encoding in Students plus any extra ones in FaceTemplates.
+TEMPLATE_ROWS = """
+    SELECT id AS student_id, first_name, last_name, face_encoding AS encoding FROM Students
+    UNION ALL
+    SELECT t.student_id, s.first_name, s.last_name, t.encoding
+    FROM FaceTemplates t JOIN Students s ON s.id = t.student_id
+"""
+
+def sidecar_paths(db_name):
+    """attendance.db -> (attendance.gallery.npy, attendance.gallery.meta.npz)"""
+    base = os.path.splitext(db_name)[0]
+    return base + ".gallery.npy", base + ".gallery.meta.npz"
+
+
+def gallery_version(conn):
+    row = conn.execute("SELECT version FROM GalleryVersion WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def write_sidecar(db_name, gallery, ids, version):
+    matrix_path, meta_path = sidecar_paths(db_name)
+    np.save(matrix_path + ".tmp.npy", np.ascontiguousarray(gallery, dtype=np.float32))
+    with open(meta_path + ".tmp", "wb") as f:
+        np.savez(f, ids=np.asarray(ids, dtype=np.int64), version=np.int64(version))
+    # Matrix first: a reader only trusts the matrix once the matching meta file is in place.
+    os.replace(matrix_path + ".tmp.npy", matrix_path)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def read_sidecar(db_name, version):
+    """Memory-maps the sidecar gallery if it matches the database version, else returns None."""
+    matrix_path, meta_path = sidecar_paths(db_name)
+    if not (os.path.exists(matrix_path) and os.path.exists(meta_path)):
+        return None
+    try:
+        with np.load(meta_path) as meta:
+            if int(meta["version"]) != version:
+                return None
+            ids = meta["ids"].tolist()
+        gallery = np.load(matrix_path, mmap_mode="r")
+    except (OSError, ValueError, KeyError):
+        return None
+    if gallery.shape != (len(ids), ENCODING_DIM):
+        return None
+    return gallery, ids
+
+
+def load_gallery(db_name=DB_NAME, use_sidecar=True):
+    """
+    Returns (gallery, ids, names) with one row per template, grouped by student.
+    The gallery is memory-mapped from the sidecar file when it is up to date,
+    otherwise it is built from the BLOBs and the sidecar is rewritten.
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        conn.execute("BEGIN")  # version and rows must come from the same snapshot
+        version = gallery_version(conn)
+        cached = read_sidecar(db_name, version) if use_sidecar else None
+        if cached is not None:
+            gallery, ids = cached
+            names_by_id = {row[0]: f"{row[1]} {row[2]}" for row in
+                           conn.execute("SELECT id, first_name, last_name FROM Students")}
+            return gallery, ids, [names_by_id[student_id] for student_id in ids]
+
+        # Stream rows straight into a preallocated matrix instead of holding every BLOB at once.
+        count = conn.execute("SELECT (SELECT count(*) FROM Students) + (SELECT count(*) FROM FaceTemplates)").fetchone()[0]
+        gallery = np.empty((count, ENCODING_DIM), dtype=np.float32)
+        ids, names = [], []
+        cursor = conn.execute(f"SELECT * FROM ({TEMPLATE_ROWS}) ORDER BY student_id")
+        for row, (student_id, first_name, last_name, blob) in enumerate(cursor):
+            gallery[row] = _view(blob)
+            ids.append(student_id)
+            names.append(f"{first_name} {last_name}")
+    finally:
+        conn.close()
+
+    if use_sidecar:
+        write_sidecar(db_name, gallery, ids, version)
+    return gallery, ids, names
+
+
+def load_thresholds(db_name=DB_NAME):
+    """{student_id: match threshold} for the students that have their own (see face_templates.calibrate)."""
+    conn = sqlite3.connect(db_name)
+    try:
+        return dict(conn.execute("SELECT id, match_threshold FROM Students WHERE match_threshold IS NOT NULL"))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    count = migrate_pickled_encodings(DB_NAME)
+    gallery, ids, names = load_gallery(DB_NAME)
+    print(f"{count} rows migrated, {len(ids)} encodings in {sidecar_paths(DB_NAME)[0]}.")
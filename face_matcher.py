@@ -0,0 +1,155 @@
+from collections import namedtuple
+
+import numpy as np
+
+from quantization import PRECISIONS, make_store
+
+ENCODING_DIM = 128
+DEFAULT_TOLERANCE = 0.5
+AGGREGATIONS = ("min", "mean")
+
+Match = namedtuple("Match", ["student_id", "name", "distance"])
+
+
+class FaceMatcher:
+    """
+    Nearest-neighbour matcher over all known faces.
+
+    The gallery is held as one (N, 128) matrix so that a whole frame's faces are
+    scored against every student in a single call. precision picks how it is
+    stored: exact float32, or float16, int8 or product-quantized codes for
+    devices short on memory (see quantization.py).
+    A student may have several rows (templates). With aggregation "min" a probe
+    is scored by its nearest template; with "mean" by the mean distance to all
+    of the student's templates. thresholds maps student ids to their own match
+    threshold; everyone else uses tolerance.
+    If an approximate index (see ann_index.IVFIndex) is given, it is searched
+    instead of scanning the full matrix (always nearest template); the index
+    keeps its own float32 copy whatever the precision.
+    """
+
+    def __init__(self, encodings, ids, names, tolerance=DEFAULT_TOLERANCE, index=None,
+                 thresholds=None, aggregation="min", precision="float32"):
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{aggregation}', choose from: {', '.join(AGGREGATIONS)}")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', choose from: {', '.join(PRECISIONS)}")
+        self.store = make_store(precision, np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM))
+        self.ids = list(ids)
+        self.names = list(names)
+        self.tolerance = tolerance
+        self.index = index
+        self.aggregation = aggregation
+        self.thresholds = dict(thresholds or {})
+        self._row_of = {student_id: row for row, student_id in enumerate(self.ids)}
+        self._row_tolerance = self._tolerances(self.ids)
+        self._groups = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def gallery(self):
+        """The (N, 128) float32 gallery as stored (decoded for quantized precisions)."""
+        return self.store.decode()
+
+    @property
+    def precision(self):
+        return self.store.precision
+
+    def _tolerances(self, ids):
+        return np.fromiter((self.thresholds.get(student_id, self.tolerance) for student_id in ids),
+                           dtype=np.float32, count=len(ids))
+
+    def with_changes(self, encodings, ids, names, removed_ids=(), thresholds=None):
+        """
+        Returns a new matcher with the given students added or replaced and removed_ids dropped.
+        Every template of a changed student must be passed, as one row each; thresholds
+        gives the changed students' own thresholds. New rows are encoded with the
+        existing quantizer (it is not retrained).
+        This matcher is left untouched, so threads still matching against it are unaffected.
+        """
+        ids = list(ids)
+        changed = set(ids) | set(removed_ids)
+        keep = np.fromiter((student_id not in changed for student_id in self.ids), dtype=bool, count=len(self.ids))
+        new_rows = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+
+        matcher = FaceMatcher.__new__(FaceMatcher)
+        matcher.store = self.store.take(keep).extend(new_rows)
+        matcher.ids = [student_id for student_id, k in zip(self.ids, keep) if k] + ids
+        matcher.names = [name for name, k in zip(self.names, keep) if k] + list(names)
+        matcher.tolerance = self.tolerance
+        matcher.aggregation = self.aggregation
+        matcher.thresholds = {student_id: t for student_id, t in self.thresholds.items() if student_id not in changed}
+        matcher.thresholds.update(thresholds or {})
+        matcher._row_tolerance = np.concatenate([self._row_tolerance[keep], matcher._tolerances(ids)])
+        matcher._groups = None
+        matcher.index = None
+        if self.index is not None:
+            matcher.index = self.index.copy()
+            for student_id in changed:
+                matcher.index.remove(student_id)
+            for encoding, student_id in zip(new_rows, ids):
+                matcher.index.add(encoding, student_id)
+        matcher._row_of = {student_id: row for row, student_id in enumerate(matcher.ids)}
+        return matcher
+
+    def distances(self, probe_encodings):
+        """Returns the (M, N) euclidean distance matrix between probes and the gallery."""
+        probes = np.asarray(probe_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        return self.store.distances(probes)
+
+    def _student_groups(self):
+        """(row order grouping each student's templates, group starts, template counts, one row per student)."""
+        if self._groups is None:
+            _, inverse, counts = np.unique(np.asarray(self.ids, dtype=np.int64), return_inverse=True, return_counts=True)
+            order = np.argsort(inverse, kind="stable")
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            self._groups = (order, starts, counts.astype(np.float32), order[starts])
+        return self._groups
+
+    def student_scores(self, probe_encodings, distances=None):
+        """
+        Returns ((M, S) per-student scores under self.aggregation, (S,) gallery row of each student).
+        Each student's templates are reduced with one reduceat over the distance matrix.
+        """
+        dist = self.distances(probe_encodings) if distances is None else distances
+        order, starts, counts, rows = self._student_groups()
+        dist = dist[:, order]
+        if self.aggregation == "mean":
+            return np.add.reduceat(dist, starts, axis=1) / counts, rows
+        return np.minimum.reduceat(dist, starts, axis=1), rows
+
+    def match(self, probe_encodings):
+        """
+        Finds the closest student for every probe encoding.
+        Returns one Match per probe; unmatched faces get student_id None and name "Unknown".
+        """
+        if len(probe_encodings) == 0:
+            return []
+        if len(self) == 0:
+            return [Match(None, "Unknown", float("inf")) for _ in probe_encodings]
+
+        if self.index is not None:
+            found_ids, best_dist = self.index.search(probe_encodings)
+            best = [self._row_of.get(student_id, -1) for student_id in found_ids.tolist()]
+            best_dist = best_dist.tolist()
+        elif self.aggregation == "min":
+            # The nearest template is the nearest row: no grouping needed.
+            dist = self.distances(probe_encodings)
+            best = np.argmin(dist, axis=1)
+            best_dist = dist[np.arange(len(best)), best].tolist()
+            best = best.tolist()
+        else:
+            scores, rows = self.student_scores(probe_encodings)
+            best = np.argmin(scores, axis=1)
+            best_dist = scores[np.arange(len(best)), best].tolist()
+            best = rows[best].tolist()
+
+        results = []
+        for row, distance in zip(best, best_dist):
+            if row >= 0 and distance <= self._row_tolerance[row]:
+                results.append(Match(self.ids[row], self.names[row], distance))
+            else:
+                results.append(Match(None, "Unknown", distance))
+        return results
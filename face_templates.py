@@ -0,0 +1,335 @@
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from database_setup import setup_database
+from encoding_store import encode_encoding, load_gallery
+from face_matcher import AGGREGATIONS, DEFAULT_TOLERANCE, ENCODING_DIM, FaceMatcher
+
+# --- SETTINGS ---
+DB_NAME = "attendance.db"
+MAX_ONLINE_TEMPLATES = 5     # Learned templates kept per student; enrolled ones are never replaced
+UPDATE_DISTANCE = 0.35       # Only recognitions at least this close become templates...
+MIN_NOVELTY = 0.15           # ...and only if they are not a near copy of an existing one
+UPDATE_INTERVAL_HOURS = 24   # At most one learned template per student per interval
+MIN_THRESHOLD = 0.35         # Calibrated thresholds are clipped to this range
+MAX_THRESHOLD = 0.6
+GENUINE_QUANTILE = 95        # Per student: this percentile of genuine distances...
+IMPOSTOR_MARGIN = 0.02       # ...and at least this far below the closest impostor
+CALIBRATION_CHUNK = 256      # Templates scored per block while calibrating
+EVAL_TEMPLATE_COUNTS = (1, 2, 3, 5)
+UNKNOWN_FRACTION = 0.2       # Identities held out of the gallery as impostors in evaluate()
+
+
+def add_templates(conn, student_id, encodings, source="enroll"):
+    """Stores extra templates for a student. Does not commit."""
+    conn.executemany("INSERT INTO FaceTemplates (student_id, encoding, source) VALUES (?, ?, ?)",
+                     [(student_id, encode_encoding(encoding), source) for encoding in encodings])
+
+
+def add_online_template(conn, student_id, encoding, max_online=MAX_ONLINE_TEMPLATES,
+                        interval_hours=UPDATE_INTERVAL_HOURS):
+    """
+    Stores one learned template unless the student got one within interval_hours,
+    then drops the student's oldest learned templates beyond max_online.
+    Returns True if a template was added.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        allowed = conn.execute("""
+            SELECT 1 FROM Students WHERE id = ? AND NOT EXISTS (
+                SELECT 1 FROM FaceTemplates
+                WHERE student_id = ? AND source = 'online' AND created_at > datetime('now', ?))
+        """, (student_id, student_id, f"-{interval_hours} hours")).fetchone()
+        if allowed:
+            add_templates(conn, student_id, [encoding], source="online")
+            conn.execute("""
+                DELETE FROM FaceTemplates WHERE id IN (
+                    SELECT id FROM FaceTemplates WHERE student_id = ? AND source = 'online'
+                    ORDER BY id DESC LIMIT -1 OFFSET ?)
+            """, (student_id, max_online))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return bool(allowed)
+
+
+class TemplateUpdater:
+    """
+    Matcher wrapper that learns from confident recognitions.
+
+    A probe matched well inside the threshold (distance <= update_distance) that
+    is not a near copy of the template it matched (distance >= min_novelty) is
+    stored as an "online" template, at most once per UPDATE_INTERVAL_HOURS per
+    student and MAX_ONLINE_TEMPLATES per student in total. The database write
+    happens on a background thread; GallerySync then applies the new template
+    like any other change. Pass it wherever a matcher is expected.
+    """
+
+    def __init__(self, matcher, db_name=DB_NAME, update_distance=UPDATE_DISTANCE, min_novelty=MIN_NOVELTY):
+        self.matcher = matcher
+        self.db_name = db_name
+        self.update_distance = update_distance
+        self.min_novelty = min_novelty
+        self.added = 0
+        self._last_offer = {}  # student_id -> time.time() of the last template offered
+        self._queue = queue.Queue(maxsize=64)
+        self._thread = threading.Thread(target=self._run, name="template-updater", daemon=True)
+
+    def __len__(self):
+        return len(self.matcher)
+
+    def match(self, probe_encodings):
+        matches = self.matcher.match(probe_encodings)
+        now = time.time()
+        for encoding, match in zip(probe_encodings, matches):
+            if (match.student_id is not None and self.min_novelty <= match.distance <= self.update_distance
+                    and now - self._last_offer.get(match.student_id, 0.0) >= UPDATE_INTERVAL_HOURS * 3600):
+                self._last_offer[match.student_id] = now
+                try:
+                    self._queue.put_nowait((match.student_id, np.array(encoding, dtype=np.float32)))
+                except queue.Full:
+                    pass
+        return matches
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_name, timeout=10)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                try:
+                    if add_online_template(conn, *item):
+                        self.added += 1
+                        print(f"GALLERY: Learned a new template for student {item[0]}.")
+                except sqlite3.Error as e:
+                    print(f"GALLERY: Could not store template ({e}).")
+        finally:
+            conn.close()
+
+
+# --- CALIBRATION ---
+
+def calibrate(encodings, ids, aggregation="min", tolerance=DEFAULT_TOLERANCE, chunk=CALIBRATION_CHUNK):
+    """
+    Per-identity thresholds from the gallery itself.
+
+    Every template is scored, like a probe, against its own student with itself
+    left out (genuine) and against every other student (impostor), under the same
+    aggregation the matcher will use. A student's threshold sits midway between
+    the GENUINE_QUANTILE of its genuine scores and its closest impostor, at least
+    IMPOSTOR_MARGIN below that impostor, clipped to [MIN_THRESHOLD, MAX_THRESHOLD].
+    Students with a single template have no genuine scores and are left out, so
+    they keep the global tolerance. Returns {student_id: threshold}.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    matcher = FaceMatcher(encodings, ids.tolist(), [""] * len(ids), tolerance, aggregation=aggregation)
+    students, column, counts = np.unique(ids, return_inverse=True, return_counts=True)
+    genuine = np.full(len(ids), np.nan)
+    impostor = np.full(len(ids), np.inf)
+    for start in range(0, len(ids), chunk):
+        rows = np.arange(start, min(start + chunk, len(ids)))
+        probes = np.arange(len(rows))
+        dist = matcher.distances(matcher.gallery[rows])
+        # Leave the template out of its own student's score: inf for min, 0 (then rescaled) for mean.
+        dist[probes, rows] = np.inf if aggregation == "min" else 0.0
+        scores, _ = matcher.student_scores(None, distances=dist)
+        own = column[rows]
+        own_scores = scores[probes, own]
+        if aggregation == "mean":
+            own_scores = own_scores * counts[own] / np.maximum(counts[own] - 1, 1)
+        genuine[rows] = np.where(counts[own] > 1, own_scores, np.nan)
+        scores[probes, own] = np.inf
+        impostor[rows] = scores.min(axis=1)
+
+    order = np.argsort(column, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    thresholds = {}
+    for student_id, first, count in zip(students.tolist(), starts.tolist(), counts.tolist()):
+        if count < 2:
+            continue
+        rows = order[first:first + count]
+        closest_impostor = impostor[rows].min()
+        threshold = min((np.percentile(genuine[rows], GENUINE_QUANTILE) + closest_impostor) / 2,
+                        closest_impostor - IMPOSTOR_MARGIN)
+        thresholds[student_id] = float(np.clip(threshold, MIN_THRESHOLD, MAX_THRESHOLD))
+    return thresholds
+
+
+def save_thresholds(db_name, thresholds):
+    """Replaces every student's match_threshold: the given ones are set, the rest cleared."""
+    conn = sqlite3.connect(db_name)
+    try:
+        with conn:
+            conn.execute("UPDATE Students SET match_threshold = NULL WHERE match_threshold IS NOT NULL")
+            conn.executemany("UPDATE Students SET match_threshold = ? WHERE id = ?",
+                             [(threshold, student_id) for student_id, threshold in thresholds.items()])
+    finally:
+        conn.close()
+
+
+# --- EVALUATION ---
+
+def evaluate(encodings, labels, template_counts=EVAL_TEMPLATE_COUNTS, aggregations=AGGREGATIONS,
+             tolerance=DEFAULT_TOLERANCE, unknown_fraction=UNKNOWN_FRACTION, faces_per_call=4, seed=0):
+    """
+    FAR/FRR and matching cost as the number of templates per student grows.
+
+    encodings/labels are several encodings per person. A share of the people
+    (unknown_fraction, plus anyone with too few encodings) is never enrolled and
+    only used as impostors. Everyone else is enrolled with their first k
+    encodings, for every k in template_counts, and probed with the rest.
+    FRR counts genuine probes that are rejected or given to someone else, FAR
+    impostor probes accepted as anyone. Each setting is run with the global
+    tolerance and with thresholds calibrated on the gallery (k >= 2).
+    Returns (rows, summary) where rows is a list of dicts.
+    """
+    rng = np.random.default_rng(seed)
+    encodings = np.asarray(encodings, dtype=np.float32)
+    labels = np.asarray(labels)
+    max_k = max(template_counts)
+    people = {}
+    for row, label in enumerate(labels.tolist()):
+        people.setdefault(label, []).append(row)
+    for rows in people.values():
+        rng.shuffle(rows)
+    usable = sorted(label for label, rows in people.items() if len(rows) > max_k)
+    rng.shuffle(usable)
+    held_out = int(len(usable) * unknown_fraction)
+    known = usable[held_out:]
+    unknown = set(people) - set(known)
+    if not known or not unknown:
+        raise ValueError(f"Need people with more than {max_k} encodings to enroll, and some left over as impostors")
+
+    genuine_rows = [row for label in known for row in people[label][max_k:]]
+    position = {label: i for i, label in enumerate(known)}
+    genuine_truth = np.array([position[labels[row]] for row in genuine_rows])
+    genuine = encodings[genuine_rows]
+    impostors = encodings[[row for label in unknown for row in people[label]]]
+    summary = {"enrolled": len(known), "impostor_people": len(unknown),
+               "genuine_probes": len(genuine), "impostor_probes": len(impostors)}
+
+    results = []
+    for k in template_counts:
+        gallery_rows = [row for label in known for row in people[label][:k]]
+        gallery_ids = [i for i, label in enumerate(known) for _ in range(k)]
+        for aggregation in aggregations:
+            settings = [("global", None)]
+            if k >= 2:
+                settings.append(("per-identity", calibrate(encodings[gallery_rows], gallery_ids, aggregation, tolerance)))
+            for threshold_name, thresholds in settings:
+                matcher = FaceMatcher(encodings[gallery_rows], gallery_ids, [""] * len(gallery_ids), tolerance,
+                                      thresholds=thresholds, aggregation=aggregation)
+                found = np.array([-1 if m.student_id is None else m.student_id for m in matcher.match(genuine)])
+                accepted = sum(m.student_id is not None for m in matcher.match(impostors))
+
+                start = time.perf_counter()
+                for first in range(0, len(genuine), faces_per_call):
+                    matcher.match(genuine[first:first + faces_per_call])
+                per_face = (time.perf_counter() - start) / len(genuine)
+                results.append({
+                    "templates": k,
+                    "aggregation": aggregation,
+                    "thresholds": threshold_name,
+                    "gallery_rows": len(gallery_ids),
+                    "frr": float(np.mean(found != genuine_truth)),
+                    "far": accepted / len(impostors),
+                    "us_per_face": per_face * 1e6,
+                    "faces_per_second": 1 / per_face if per_face > 0 else float("inf"),
+                })
+    return results, summary
+
+
+def print_evaluation(results, summary):
+    print(f"{summary['enrolled']} people enrolled ({summary['genuine_probes']} genuine probes), "
+          f"{summary['impostor_people']} impostors ({summary['impostor_probes']} probes)")
+    print(f"{'templates':>9} | {'aggregation':>11} | {'thresholds':>12} | {'rows':>7} | {'FRR':>7} | {'FAR':>7} | "
+          f"{'us/face':>8} | faces/s")
+    for r in results:
+        print(f"{r['templates']:>9} | {r['aggregation']:>11} | {r['thresholds']:>12} | {r['gallery_rows']:>7} | "
+              f"{r['frr']:>7.2%} | {r['far']:>7.2%} | {r['us_per_face']:>8.1f} | {r['faces_per_second']:,.0f}")
+
+
+def encode_photos(root, detector_name=None):
+    """
+    Encodings and labels for an evaluation set: one folder of photos per person
+    (like register_person --bulk). Photos without exactly one face are skipped.
+    """
+    from lazy_modules import face_recognition
+    from register_person import DETECT_SCALE, DETECTOR, IMAGE_EXTENSIONS, detect_faces
+    from detectors import make_detector
+
+    detector = make_detector(detector_name or DETECTOR)
+    encodings, labels = [], []
+    for person in sorted(os.listdir(root)):
+        folder = os.path.join(root, person)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            image = face_recognition.load_image_file(os.path.join(folder, name))
+            locations = detect_faces(image, DETECT_SCALE, detector)
+            if len(locations) == 1:
+                encodings.extend(face_recognition.face_encodings(image, locations))
+                labels.append(person)
+    return np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM), np.asarray(labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-template gallery tools: thresholds and offline evaluation.")
+    parser.add_argument("--db", default=DB_NAME)
+    commands = parser.add_subparsers(dest="command", required=True)
+    calibrate_cmd = commands.add_parser("calibrate", help="Set per-student thresholds from the enrolled templates.")
+    calibrate_cmd.add_argument("--aggregation", choices=AGGREGATIONS, default="min")
+    calibrate_cmd.add_argument("--dry-run", action="store_true", help="Only print the thresholds")
+    encode_cmd = commands.add_parser("encode", help="Encode a folder of photos per person into an evaluation set.")
+    encode_cmd.add_argument("photos")
+    encode_cmd.add_argument("output", help=".npz file with encodings and labels")
+    encode_cmd.add_argument("--detector")
+    evaluate_cmd = commands.add_parser("evaluate", help="FAR/FRR and cost vs templates per person.")
+    evaluate_cmd.add_argument("dataset", help=".npz file written by encode")
+    evaluate_cmd.add_argument("--templates", type=int, nargs="+", default=EVAL_TEMPLATE_COUNTS)
+    evaluate_cmd.add_argument("--unknown", type=float, default=UNKNOWN_FRACTION)
+    evaluate_cmd.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    if args.command == "calibrate":
+        conn = sqlite3.connect(args.db)
+        setup_database(conn)
+        conn.close()
+        gallery, ids, names = load_gallery(args.db)
+        thresholds = calibrate(gallery, ids, args.aggregation)
+        values = np.array(list(thresholds.values()))
+        print(f"{len(thresholds)} of {len(set(ids))} students have 2+ templates and get their own threshold"
+              + (f" (min {values.min():.3f}, median {np.median(values):.3f}, max {values.max():.3f})." if len(values) else "."))
+        if not args.dry_run:
+            save_thresholds(args.db, thresholds)
+    elif args.command == "encode":
+        encodings, labels = encode_photos(args.photos, args.detector)
+        np.savez(args.output, encodings=encodings, labels=labels)
+        print(f"{len(labels)} encodings of {len(set(labels.tolist()))} people written to {args.output}.")
+    else:
+        with np.load(args.dataset) as data:
+            encodings, labels = data["encodings"], data["labels"]
+        print_evaluation(*evaluate(encodings, labels, tuple(args.templates), tolerance=args.tolerance,
+                                   unknown_fraction=args.unknown))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import itertools
+import threading
+import time
+from collections import namedtuple
+
+# --- SETTINGS ---
+IOU_THRESHOLD = 0.3     # Minimum box overlap to treat two detections as the same face
+MAX_MISSED = 3          # Detections a track may miss before it is dropped
+CONFIRM_HITS = 2        # Consecutive matches to the same student before a track is trusted
+REVERIFY_SECONDS = 2.0  # Confirmed tracks are re-encoded this often
+
+TrackedFace = namedtuple("TrackedFace", ["track_id", "location", "student_id", "name", "confirmed"])
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    def __init__(self, track_id, location):
+        self.track_id = track_id
+        self.location = location
+        self.student_id = None
+        self.name = "Unknown"
+        self.hits = 0
+        self.missed = 0
+        self.last_verified = 0.0
+
+    @property
+    def confirmed(self):
+        return self.student_id is not None and self.hits >= CONFIRM_HITS
+
+
+class FaceTracker:
+    """
+    Links face boxes across frames by IoU so a face only has to be encoded
+    until its identity is confirmed, plus a periodic re-verification.
+    Frames must be applied one at a time and in order: update() and the assign()
+    for the same frame are separate calls, so a tracker may have at most one frame
+    in flight (FairRecognitionPool guarantees this). The lock only makes snapshots
+    safe to take from another thread.
+    """
+
+    def __init__(self, iou_threshold=IOU_THRESHOLD, max_missed=MAX_MISSED, reverify_seconds=REVERIFY_SECONDS):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.reverify_seconds = reverify_seconds
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def update(self, locations, now=None):
+        """
+        Associates this frame's boxes with existing tracks.
+        Returns (tracks aligned with locations, indices of the boxes that need encoding).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            pairs = sorted(
+                ((iou(track.location, box), t, b)
+                 for t, track in enumerate(self.tracks) for b, box in enumerate(locations)),
+                reverse=True)
+            track_for_box = {}
+            used_tracks = set()
+            for overlap, t, b in pairs:
+                if overlap < self.iou_threshold:
+                    break
+                if t in used_tracks or b in track_for_box:
+                    continue
+                used_tracks.add(t)
+                track_for_box[b] = self.tracks[t]
+
+            for t, track in enumerate(self.tracks):
+                if t not in used_tracks:
+                    track.missed += 1
+            self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+            assigned, to_encode = [], []
+            for b, box in enumerate(locations):
+                track = track_for_box.get(b)
+                if track is None:
+                    track = Track(next(self._ids), box)
+                    self.tracks.append(track)
+                track.location = box
+                track.missed = 0
+                if not track.confirmed or now - track.last_verified >= self.reverify_seconds:
+                    to_encode.append(b)
+                assigned.append(track)
+            return assigned, to_encode
+
+    def assign(self, tracks, matches, now=None):
+        """Records the match results for the tracks that were just encoded."""
+        now = time.time() if now is None else now
+        with self._lock:
+            for track, match in zip(tracks, matches):
+                track.last_verified = now
+                if match.student_id is not None and match.student_id == track.student_id:
+                    track.hits += 1
+                else:
+                    # New identity, or a confirmed track no longer matches: start over.
+                    track.student_id = match.student_id
+                    track.name = match.name
+                    track.hits = 1 if match.student_id is not None else 0
+
+    def live_track_ids(self):
+        """Ids of the tracks still alive, including ones that missed a few detections."""
+        with self._lock:
+            return {track.track_id for track in self.tracks}
+
+    def snapshot(self, tracks):
+        with self._lock:
+            return [TrackedFace(t.track_id, t.location, t.student_id, t.name, t.confirmed) for t in tracks]
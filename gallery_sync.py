@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+
+from encoding_store import TEMPLATE_ROWS, decode_encoding
+
+# --- SETTINGS ---
+DB_NAME = "attendance.db"
+POLL_SECONDS = 2.0
+
+
+def latest_change(db_name=DB_NAME):
+    """
+    The newest StudentChanges sequence number. Read it *before* loading the gallery:
+    changes made in between are then applied again, which is harmless.
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM StudentChanges").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class GallerySync:
+    """
+    Keeps a FaceMatcher up to date with the Students table while the app runs.
+
+    A background thread checks PRAGMA data_version, which changes only when
+    another connection commits, so an idle database costs one pragma per poll.
+    When it changes, only the students listed in StudentChanges since the last
+    poll are read, and a new matcher with just that delta applied replaces the
+    old one in a single assignment. Recognition keeps running on the old matcher
+    until the swap and never waits for a reload.
+
+    It can be passed wherever a matcher is expected: match() always uses the
+    newest matcher.
+    """
+
+    def __init__(self, matcher, db_name=DB_NAME, since=0, interval=POLL_SECONDS):
+        self.matcher = matcher
+        self.db_name = db_name
+        self.interval = interval
+        self._last_seq = since
+        self._data_version = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __len__(self):
+        return len(self.matcher)
+
+    def match(self, probe_encodings):
+        return self.matcher.match(probe_encodings)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_name, timeout=10)
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    self.poll(conn)
+                except sqlite3.Error as e:
+                    print(f"GALLERY: Reload failed ({e}), will retry.")
+        finally:
+            conn.close()
+
+    def poll(self, conn):
+        """Applies any Students changes committed since the last call. Returns the number of students changed."""
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return 0
+        self._data_version = data_version
+
+        conn.execute("BEGIN")  # the change log and the rows must come from the same snapshot
+        try:
+            last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM StudentChanges").fetchone()[0]
+            if last_seq <= self._last_seq:
+                return 0
+            changed = {row[0] for row in conn.execute(
+                "SELECT DISTINCT student_id FROM StudentChanges WHERE seq > ?", (self._last_seq,))}
+            rows = conn.execute(f"""
+                SELECT * FROM ({TEMPLATE_ROWS})
+                WHERE student_id IN (SELECT student_id FROM StudentChanges WHERE seq > ?)
+                ORDER BY student_id
+            """, (self._last_seq,)).fetchall()
+            thresholds = dict(conn.execute("""
+                SELECT id, match_threshold FROM Students
+                WHERE match_threshold IS NOT NULL AND id IN (SELECT student_id FROM StudentChanges WHERE seq > ?)
+            """, (self._last_seq,)))
+        finally:
+            conn.rollback()
+
+        ids = [row[0] for row in rows]
+        removed = changed - set(ids)
+        self.matcher = self.matcher.with_changes(
+            [decode_encoding(row[3]) for row in rows], ids, [f"{row[1]} {row[2]}" for row in rows], removed, thresholds)
+        self._last_seq = last_seq
+        print(f"GALLERY: {len(set(ids))} student(s) added or updated, {len(removed)} removed; "
+              f"{len(self.matcher)} faces loaded.")
+        return len(changed)
@@ -0,0 +1,136 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+# --- SETTINGS ---
+DB_NAME = "attendance.db"
+CATCH_UP_DAYS = 3       # After downtime, runs missed on at most this many past days are made up
+RETRY_SECONDS = 300     # A failed run is retried after this long
+MAX_SLEEP_SECONDS = 60  # Re-read the clock at least this often (clock adjustments, suspend)
+ALL_DAYS = tuple(range(7))  # datetime.weekday() numbers, Monday is 0
+
+
+class Job:
+    """
+    Runs func(date_str) once per day at "HH:MM" on the given weekdays.
+    A day counts as done only when func returns without raising.
+    """
+
+    def __init__(self, name, at, func, weekdays=ALL_DAYS, catch_up_days=CATCH_UP_DAYS):
+        self.name = name
+        self.at = datetime.strptime(at, "%H:%M").time()
+        self.func = func
+        self.weekdays = tuple(weekdays)
+        self.catch_up_days = catch_up_days
+        self.retry_at = 0.0  # monotonic; set after a failure
+
+    def due_dates(self, now, last_date):
+        """
+        Days (oldest first) whose run time has passed but that have not run yet.
+        A job that has never run only starts with today, so a new install does not
+        run it for days before it existed.
+        """
+        first = 0 if last_date is None else self.catch_up_days
+        dates = []
+        for back in range(first, -1, -1):
+            day = now.date() - timedelta(days=back)
+            if day.weekday() not in self.weekdays or datetime.combine(day, self.at) > now:
+                continue
+            if last_date is None or day.isoformat() > last_date:
+                dates.append(day.isoformat())
+        return dates
+
+    def next_run(self, now):
+        for ahead in range(8):
+            day = now.date() + timedelta(days=ahead)
+            when = datetime.combine(day, self.at)
+            if day.weekday() in self.weekdays and when > now:
+                return when
+        return None
+
+
+class JobScheduler:
+    """
+    Runs daily jobs on one background thread, never on the camera loop.
+
+    The last completed day of every job is kept in the JobRuns table, so a run that
+    was missed while the program was stopped, stuck in a menu or busy is made up as
+    soon as possible (for up to catch_up_days past days), and a restart never runs
+    a job twice for the same day. Jobs run one at a time, oldest day first.
+    """
+
+    def __init__(self, jobs, db_name=DB_NAME):
+        self.jobs = list(jobs)
+        self.db_name = db_name
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="job-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                # The database itself failed (locked, missing, disk full); the jobs run next time.
+                print(f"JOB ERROR: could not check the job schedule: {e}")
+            self._stop.wait(self._sleep_seconds(datetime.now()))
+
+    def _sleep_seconds(self, now):
+        wake = MAX_SLEEP_SECONDS
+        for job in self.jobs:
+            when = job.next_run(now)
+            if when is not None:
+                wake = min(wake, (when - now).total_seconds())
+            if job.retry_at:
+                wake = min(wake, job.retry_at - time.monotonic())
+        return max(1.0, wake)
+
+    def run_pending(self, now=None):
+        """Runs every due job now; returns [(job name, date, error or None)] for the runs attempted."""
+        now = now or datetime.now()
+        results = []
+        conn = sqlite3.connect(self.db_name)
+        try:
+            last_dates = dict(conn.execute("SELECT name, last_date FROM JobRuns"))
+            for job in self.jobs:
+                if time.monotonic() < job.retry_at:
+                    continue
+                for date_str in job.due_dates(now, last_dates.get(job.name)):
+                    if self._stop.is_set():
+                        return results
+                    print(f"JOB: {job.name} for {date_str}...")
+                    try:
+                        job.func(date_str)
+                    except Exception as e:
+                        print(f"JOB ERROR: {job.name} for {date_str}: {e}")
+                        job.retry_at = time.monotonic() + RETRY_SECONDS
+                        self._record(conn, job.name, None, str(e))
+                        results.append((job.name, date_str, e))
+                        break
+                    job.retry_at = 0.0
+                    self._record(conn, job.name, date_str, None)
+                    results.append((job.name, date_str, None))
+        finally:
+            conn.close()
+        return results
+
+    @staticmethod
+    def _record(conn, name, date_str, error):
+        conn.execute("""
+            INSERT INTO JobRuns (name, last_date, finished_at, last_error) VALUES (?, ?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET
+                last_date = COALESCE(excluded.last_date, last_date),
+                finished_at = COALESCE(excluded.finished_at, finished_at),
+                last_error = excluded.last_error
+        """, (name, date_str, None if error else datetime.now().isoformat(timespec="seconds"), error))
+        conn.commit()
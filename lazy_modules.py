@@ -0,0 +1,42 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    Stands in for a module that is slow to import. The real import happens on the
+    first attribute access, or ahead of time on a background thread with preload(),
+    so start-up and --help never pay for it and importing our modules does not
+    require the library to be installed.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def preload(self):
+        """Starts the import on a daemon thread; an import error is raised again on first use."""
+        threading.Thread(target=self._preload, name=f"preload-{self._name}", daemon=True).start()
+        return self
+
+    def _preload(self):
+        try:
+            self.load()
+        except ImportError:
+            pass
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+# Importing face_recognition loads every dlib model (detectors, landmarks, the ResNet
+# encoder): seconds on a Raspberry Pi, before the first frame could be recognized.
+face_recognition = LazyModule("face_recognition")
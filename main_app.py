@@ -1,33 +1,55 @@
 import cv2
-import face_recognition
 import sqlite3
-import pickle
 import numpy as np
 from datetime import datetime
 import time
-import threading 
 import os
-import pygame
-import base64
-from email.message import EmailMessage
-
-# --- HARDWARE LIBRARIES ---
-#from RPLCD.i2c import CharLCD
-#import RPi.GPIO as GPIO
-
-# --- GOOGLE OAUTH LIBRARIES ---
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from functools import partial
+
+from absence import record_absences
+from actuators import make_actuators
+from analytics import refresh_day
+from ann_index import load_or_build_index
+from attendance_session import AttendanceSession
+from attendance_writer import AttendanceWriter
+from database_setup import setup_database
+from detectors import make_detector
+from encoding_store import load_gallery, load_thresholds, migrate_pickled_encodings
+from face_matcher import FaceMatcher
+from face_templates import TemplateUpdater
+from face_tracker import FaceTracker
+from gallery_sync import GallerySync, latest_change
+from jobs import Job, JobScheduler
+from lazy_modules import face_recognition
+from metrics import JsonMetricsLog, LatencyStats, MetricsServer, SamplingProfiler
+from motion_gate import MotionGate
+from notifications import GmailTransport, dispatch_in_background, enqueue_absence_notices
+from pipeline import ActionWorker, FairRecognitionPool, FrameGrabber
+from recognition import recognize_frame, update_attendance
 
 # --- SETTINGS ---
 DB_NAME = "attendance.db"
 DELAY_SECONDS = 1.0
 SOUND_FOLDER = "sounds" 
+SIMULATE_HARDWARE = False # True: print door/LCD/audio actions instead of driving the Pi hardware
+WELCOME_SECONDS = 3.0    # How long the LCD shows "Welcome" before returning to the lesson
+METRICS_PORT = 9108      # Prometheus text at http://127.0.0.1:9108/metrics (see METRICS_HOST in metrics.py); None disables
+API_PORT = None          # e.g. 8080: JSON status, today's attendance and live check-ins for dashboards (see api_server.py)
+METRICS_LOG = None       # e.g. "metrics.jsonl": one JSON snapshot per STATS_SECONDS
+STATS_SECONDS = 60
+PROFILE_SECONDS = 0      # >0: sample every thread for this long after start-up ...
+PROFILE_FILE = "profile.folded"  # ... and write collapsed stacks here (flamegraph.pl / speedscope)
 CLASS_FILE = "class.txt" 
 REPORT_HOUR = "17:00"    
-SCOPES = ["https://www.googleapis.com/auth/gmail.send"]
+REPORT_WEEKDAYS = (0, 1, 2, 3, 4) # Monday to Friday; the report marks everyone not seen as absent
+LESSON_CUTOFFS = []      # e.g. [("08:45", "Mathematics")]: log each lesson's check-ins at its cutoff
+ANN_MIN_GALLERY = 20000 # Use the approximate index above this many templates
+GALLERY_PRECISION = "float32" # float16, int8 or pq shrink the gallery 2x, 4x or 32x (see benchmark.py precision)
+MATCH_AGGREGATION = "min" # Score a student by the nearest of their templates ("min") or all of them ("mean")
+LEARN_TEMPLATES = False  # True: keep confident recognitions as extra templates (see face_templates.py)
+DETECTION_ROI = None     # Doorway area as (left, top, right, bottom) fractions, e.g. (0.25, 0.0, 0.75, 1.0)
+DETECT_SCALES = (0.25, 0.5) # Detection scale pyramid, coarse first (1.0 or more for distant faces)
+DETECTOR = "hog"         # Face detector backend: hog, cnn, haar or dnn (see detectors.py)
 
 # --- LESSON LIST ---
 LESSON_LIST = [
@@ -41,36 +63,20 @@ LESSON_LIST = [
     "Chemistry"
 ]
 
-# --- AUDIO SETTINGS ---
-pygame.mixer.init()
+# --- HARDWARE (door servo, LCD and audio; see actuators.py) ---
+hardware = None
 
-# --- HARDWARE SETUP ---
-GPIO_PIN_SERVO = 17
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(GPIO_PIN_SERVO, GPIO.OUT)
-pwm_servo = GPIO.PWM(GPIO_PIN_SERVO, 50)
-pwm_servo.start(0)
+attendance_writer = None
 
-LCD_I2C_ADDRESS = 0x27 
-lcd = None
+api_server = None
 
-report_sent_today = False
+email_transport = GmailTransport()
 
-# --- DATABASE CHECK (ORIGINAL SIMPLE VERSION) ---
+# --- DATABASE CHECK ---
 def check_database():
-    """Creates the simple table without extra columns."""
+    """Creates any missing tables and triggers."""
     conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Attendance (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER NOT NULL,
-            date TEXT NOT NULL,
-            check_in_time TEXT,
-            status TEXT NOT NULL
-        );
-    ''')
-    conn.commit()
+    setup_database(conn)
     conn.close()
 
 # --- SELECTION FUNCTIONS ---
@@ -116,289 +122,266 @@ def get_lesson_choice(current_classroom):
 # --- HARDWARE FUNCTIONS ---
 
 def setup_hardware():
-    global lcd
-    try:
-        lcd = CharLCD('PCF8574', LCD_I2C_ADDRESS, auto_linebreaks=True)
-        lcd.backlight_enabled = True
-        lcd.clear()
-        lcd.write_string("System Loading...")
-    except:
-        lcd = None
-
-def play_audio(name):
-    clean_name = name.lower().replace(" ", "")
-    filename = f"{clean_name}.mp3"
-    
-    def worker(fname):
-        path = os.path.join(SOUND_FOLDER, fname)
-        if not os.path.exists(path):
-            path = os.path.join(SOUND_FOLDER, "default.mp3")
-        
-        if os.path.exists(path):
-            try:
-                pygame.mixer.music.load(path)
-                pygame.mixer.music.play()
-                while pygame.mixer.music.get_busy():
-                    time.sleep(0.1)
-            except: pass
-    t = threading.Thread(target=worker, args=(filename,))
-    t.start()
-
-def open_door():
-    print("DOOR: Opening...")
-    pwm_servo.ChangeDutyCycle(7) # 90 Deg
-    time.sleep(0.5)
-    pwm_servo.ChangeDutyCycle(0)
-    
-    time.sleep(5) 
-    
-    print("DOOR: Closing...")
-    pwm_servo.ChangeDutyCycle(2) # 0 Deg
-    time.sleep(0.5)
-    pwm_servo.ChangeDutyCycle(0)
-
-def write_to_screen(line1, line2):
-    if lcd is None: return
-    lcd.clear()
-    lcd.cursor_pos = (0, 0)
-    lcd.write_string(line1[:16]) 
-    lcd.cursor_pos = (1, 0)
-    lcd.write_string(line2[:16])
+    global hardware
+    hardware = make_actuators(simulate=SIMULATE_HARDWARE, sound_folder=SOUND_FOLDER)
+    hardware.lcd.write("System Loading...")
 
 def draw_overlay(frame, name, location, status_text):
+    """location is a full-resolution (top, right, bottom, left) box, as returned by recognize_frame."""
+    width = frame.shape[1]
     if location is None: 
-        cv2.rectangle(frame, (0, 0), (640, 40), (0, 0, 0), -1)
+        cv2.rectangle(frame, (0, 0), (width, 40), (0, 0, 0), -1)
         cv2.putText(frame, f"STATUS: {status_text}", (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         return
 
     top, right, bottom, left = location
-    top *= 4; right *= 4; bottom *= 4; left *= 4
     cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
     cv2.rectangle(frame, (left, bottom - 35), (right, bottom), (0, 255, 0), cv2.FILLED)
     cv2.putText(frame, name, (left + 6, bottom - 6), cv2.FONT_HERSHEY_DUPLEX, 0.8, (255, 255, 255), 1)
     
-    cv2.rectangle(frame, (0, 0), (640, 40), (0, 0, 0), -1)
+    cv2.rectangle(frame, (0, 0), (width, 40), (0, 0, 0), -1)
     cv2.putText(frame, f"STATUS: {status_text}", (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
 
 # --- DATABASE OPERATIONS ---
 
+def migrate_known_faces():
+    """Converts legacy pickled rows to binary BLOBs; a no-op once done."""
+    try:
+        migrate_pickled_encodings(DB_NAME)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"DB Error: {e}")
+
 def load_known_faces():
-    known_encodings, known_ids, known_names = [], [], []
+    """Returns (gallery matrix, ids, names)."""
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, first_name, last_name, face_encoding FROM Students")
-        rows = cursor.fetchall()
-        conn.close()
-        for row in rows:
-            encoding = pickle.loads(row[3])
-            known_ids.append(row[0])
-            known_names.append(f"{row[1]} {row[2]}")
-            known_encodings.append(encoding)
-    except: return [], [], []
+        known_encodings, known_ids, known_names = load_gallery(DB_NAME)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"DB Error: {e}")
+        return [], [], []
     print(f"Database: {len(known_ids)} faces loaded.")
     return known_encodings, known_ids, known_names
 
-def mark_attendance(student_id):
-    """Saves ONLY ID, Date, Time, Status."""
-    today_str = datetime.now().strftime("%Y-%m-%d")
-    now_str = datetime.now().strftime("%H:%M:%S")
+def mark_attendance(student_id, lesson, classroom):
+    """Queues ID, Date, Time, Lesson, Classroom, Status; the attendance writer commits it in the next batch."""
+    attendance_writer.check_in(student_id, lesson=lesson, classroom=classroom)
+
+# --- SCHEDULED JOBS (end-of-day report, lesson cutoffs) ---
+
+def run_end_of_day_report(date_str):
+    """
+    Scheduled at REPORT_HOUR on the job thread. A missed day made up later is skipped
+    if nobody checked in at all (holiday, system off), so no one is wrongly marked absent.
+    Raises on failure, so the scheduler retries.
+    """
+    conn = sqlite3.connect(DB_NAME)
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO Attendance (student_id, date, check_in_time, status)
-            VALUES (?, ?, ?, 'PRESENT')
-        """, (student_id, today_str, now_str))
-        conn.commit()
-        print(f"LOG: Attendance saved.")
-    except sqlite3.Error as e:
-        print(f"DB Error: {e}")
+        if date_str != datetime.now().strftime("%Y-%m-%d") and not conn.execute(
+                "SELECT 1 FROM Attendance WHERE date = ? AND status = 'PRESENT' LIMIT 1", (date_str,)).fetchone():
+            print(f"REPORT: No check-ins on {date_str}, skipped.")
+            return
+        print(f"REPORT: Generating end of day report for {date_str}...")
+        absentees = record_absences(conn, date_str, enqueue=enqueue_absence_notices)
+        refresh_day(conn, date_str)
     finally:
-        if conn: conn.close()
+        conn.close()
 
-# --- EMAIL REPORTING ---
-
-def send_email_via_gmail(student_name, guardian_email, date_str):
-    if not guardian_email: return
-    
-    creds = None
-    if os.path.exists("token.json"):
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file("credentials.json", SCOPES)
-            creds = flow.run_local_server(port=0)
-        with open("token.json", "w") as token:
-            token.write(creds.to_json())
+    for s_id, full_name, email in absentees:
+        print(f"ABSENT: {full_name}")
+    # One background thread drains the outbox with a bounded, rate-limited worker pool.
+    dispatch_in_background(email_transport, DB_NAME)
+    print("REPORT: Completed.")
 
+def log_lesson_cutoff(lesson, date_str):
+    conn = sqlite3.connect(DB_NAME)
     try:
-        service = build("gmail", "v1", credentials=creds)
-        message = EmailMessage()
-        message.set_content(f"Dear Guardian,\n\nStudent {student_name} was marked ABSENT on {date_str}.\n\nRegards,\nUniversity Center Management")
-        message["To"] = guardian_email
-        message["From"] = "me"
-        message["Subject"] = f"Absence Alert: {student_name}"
-
-        encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-        create_message = {"raw": encoded_message}
-        service.users().messages().send(userId="me", body=create_message).execute()
-        print(f"EMAIL SENT: {guardian_email}")
-    except: pass
-
-def check_and_run_end_of_day_report():
-    global report_sent_today
-    now = datetime.now()
-    current_time_str = now.strftime("%H:%M")
+        present = conn.execute(
+            "SELECT COUNT(*) FROM Attendance WHERE date = ? AND lesson = ? AND status = 'PRESENT'",
+            (date_str, lesson)).fetchone()[0]
+    finally:
+        conn.close()
+    print(f"CUTOFF: {lesson} on {date_str}: {present} checked in.")
+
+def make_jobs():
+    jobs = [Job("end_of_day_report", REPORT_HOUR, run_end_of_day_report, weekdays=REPORT_WEEKDAYS)]
+    for at, lesson in LESSON_CUTOFFS:
+        jobs.append(Job(f"cutoff:{lesson}:{at}", at, partial(log_lesson_cutoff, lesson),
+                        weekdays=REPORT_WEEKDAYS, catch_up_days=0))
+    return jobs
+
+# --- ACTIONS ---
+
+def admit_student(student_id, name, lesson, classroom):
+    """
+    Door, LCD, audio and DB work for one admitted student. Runs on the action thread,
+    but only queues work: the actuator scheduler and the attendance writer do the rest.
+    """
+    hardware.lcd.flash("Welcome:", name, WELCOME_SECONDS)
+    hardware.audio.play(name)
+    hardware.door.open()
     
-    if current_time_str == "00:00": report_sent_today = False
-
-    if current_time_str == REPORT_HOUR and not report_sent_today:
-        print("REPORT: Generating end of day report...")
-        try:
-            conn = sqlite3.connect(DB_NAME)
-            cursor = conn.cursor()
-            today_str = now.strftime("%Y-%m-%d")
-            
-            cursor.execute("SELECT id, first_name, last_name, guardian_email FROM Students")
-            all_students = cursor.fetchall()
-            
-            cursor.execute("SELECT student_id FROM Attendance WHERE date = ?", (today_str,))
-            present_ids = [row[0] for row in cursor.fetchall()]
-            
-            for stu in all_students:
-                s_id, f_name, l_name, email = stu
-                if s_id not in present_ids:
-                    full_name = f"{f_name} {l_name}"
-                    print(f"ABSENT: {full_name}")
-                    cursor.execute("INSERT INTO Attendance (student_id, date, status) VALUES (?, ?, 'ABSENT')", (s_id, today_str))
-                    t = threading.Thread(target=send_email_via_gmail, args=(full_name, email, today_str))
-                    t.start()
-            conn.commit()
-            conn.close()
-            report_sent_today = True
-            print("REPORT: Completed.")
-        except: pass
+    # SAVE: ID Only
+    mark_attendance(student_id, lesson, classroom)
+    if api_server is not None:
+        api_server.check_in(student_id, name, lesson, classroom)
 
 # --- MAIN LOOP ---
 def main_loop():
+    global attendance_writer, api_server
+    # dlib loads its models while the database, gallery and lesson menu are set up.
+    face_recognition.preload()
     check_database()
+    stats = LatencyStats()
+    if PROFILE_SECONDS:
+        SamplingProfiler().start().save_after(PROFILE_SECONDS, PROFILE_FILE)
+    def metrics_sources():
+        return [({}, stats)]
+    if METRICS_PORT:
+        MetricsServer.try_start(metrics_sources, METRICS_PORT)
+    if METRICS_LOG:
+        JsonMetricsLog(metrics_sources, METRICS_LOG, STATS_SECONDS).start()
+    attendance_writer = AttendanceWriter(DB_NAME, stats=stats)
     setup_hardware()
     
     current_classroom = get_classroom_from_file()
+    # Read by the API thread as a snapshot; only plain values are ever assigned.
+    live_status = {"classroom": current_classroom, "lesson": None, "status": "SELECT LESSON",
+                   "checked_in": 0, "faces": 0, "started_at": datetime.now().isoformat(timespec="seconds")}
+    if API_PORT:
+        # Imported here: asyncio is only worth loading when the API is enabled.
+        from api_server import ApiServer
+        api_server = ApiServer(lambda: dict(live_status), metrics_sources, DB_NAME, API_PORT).start()
     
+    # Migrate first: rewriting pickled rows logs a change per student, which the sync
+    # would otherwise replay as a full reload on its first poll.
+    migrate_known_faces()
+    # Read before loading, so an enrollment that lands in between is picked up by the sync.
+    change_seq = latest_change(DB_NAME)
     known_encodings, known_ids, known_names = load_known_faces()
-    last_report_check = time.time()
+    index = None
+    if len(known_ids) >= ANN_MIN_GALLERY:
+        index = load_or_build_index(known_encodings, known_ids, DB_NAME)
+    matcher = FaceMatcher(known_encodings, known_ids, known_names, tolerance=0.5, index=index,
+                          thresholds=load_thresholds(DB_NAME), aggregation=MATCH_AGGREGATION,
+                          precision=GALLERY_PRECISION)
+    # New, changed and deleted students are applied to the running matcher without a restart.
+    gallery = GallerySync(matcher, DB_NAME, since=change_seq).start()
+    learner = TemplateUpdater(gallery, DB_NAME).start() if LEARN_TEMPLATES else None
+    last_stats = time.time()
+    # The end-of-day report and lesson cutoffs run on their own thread, also while
+    # the lesson menu is open; runs missed while the program was down are made up.
+    scheduler = JobScheduler(make_jobs(), DB_NAME).start()
+    
+    actions = ActionWorker(stats=stats)
+    detector = make_detector(DETECTOR)
     
     while True:
         # Ask for lesson (Just for Display)
-        if lcd: 
-            lcd.clear()
-            lcd.write_string("Select Lesson...")
+        hardware.lcd.write("Select Lesson...")
             
         current_lesson = get_lesson_choice(current_classroom)
         
         # Setup Camera
+        lesson_started = time.perf_counter()
         video_capture = cv2.VideoCapture(0)
         video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         video_capture.set(cv2.CAP_PROP_FPS, 30)
         
-        todays_attendance_ids = set()
+        grabber = FrameGrabber(video_capture, stats=stats).start()
+        tracker = FaceTracker()
+        # One frame in flight: the tracker has to see frames in order, so frames that
+        # arrive while it is busy are skipped and only the newest one waits.
+        recognizer = FairRecognitionPool(workers=1)
+        recognizer.add_camera("camera", partial(recognize_frame, matcher=learner or gallery, tracker=tracker,
+                                                stats=stats, roi=DETECTION_ROI, scales=DETECT_SCALES,
+                                                detector=detector), stats)
+        # Static doorway: detect only now and then instead of on every frame.
+        gate = MotionGate(roi=DETECTION_ROI, stats=stats)
+        
+        # Everyone already checked in to this lesson today, so a restart never admits anyone twice.
+        todays_attendance_ids = AttendanceSession.load(DB_NAME, datetime.now().strftime("%Y-%m-%d"), current_lesson)
         detection_timers = {}
         current_status = "SCANNING..."
-        process_this_frame = True 
+        face_locations, face_names = [], []
+        last_seq = 0
         
         # Show on LCD
-        if lcd:
-            lcd.clear()
-            lcd.write_string(current_lesson[:16])
-            lcd.cursor_pos = (1, 0)
-            lcd.write_string("Scanning...")
+        hardware.lcd.write(current_lesson, "Scanning...")
 
-        print(f"--- LESSON STARTED: {current_lesson} ---")
+        live_status.update(lesson=current_lesson, status=current_status, checked_in=len(todays_attendance_ids))
+        print(f"--- LESSON STARTED: {current_lesson} ({len(todays_attendance_ids)} already checked in) ---")
         print("Press 'q' to end this lesson.")
 
         while True:
-            if time.time() - last_report_check > 60:
-                check_and_run_end_of_day_report()
-                last_report_check = time.time()
-
-            ret, frame = video_capture.read()
-            if not ret: break
-
-            if process_this_frame:
-                small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-                rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-                
-                face_locations = face_recognition.face_locations(rgb_small_frame)
-                face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-                
-                face_names = []
-                current_status = "SCANNING..."
-
-                for face_encoding in face_encodings:
-                    matches = face_recognition.compare_faces(known_encodings, face_encoding, tolerance=0.5)
-                    name = "Unknown"
-                    student_id = None
-                    
-                    if True in matches:
-                        first_match_index = matches.index(True)
-                        student_id = known_ids[first_match_index]
-                        name = known_names[first_match_index]
-                        
-                        if student_id not in todays_attendance_ids:
-                            if student_id not in detection_timers:
-                                detection_timers[student_id] = time.time()
-                                current_status = f"FOUND: {name}"
-                            else:
-                                elapsed = time.time() - detection_timers[student_id]
-                                if elapsed >= DELAY_SECONDS:
-                                    current_status = f"ENTER: {name}"
-                                    draw_overlay(frame, name, face_locations[0], current_status)
-                                    cv2.imshow('Attendance System', frame)
-                                    cv2.waitKey(1)
-                                    
-                                    # --- ACTIONS ---
-                                    write_to_screen("Welcome:", name)
-                                    play_audio(name)
-                                    open_door()
-                                    
-                                    # SAVE: ID Only
-                                    mark_attendance(student_id)
-                                    
-                                    todays_attendance_ids.add(student_id)
-                                    del detection_timers[student_id]
-                                    
-                                    if lcd: 
-                                        lcd.clear()
-                                        lcd.write_string(current_lesson[:16])
-                                        lcd.cursor_pos = (1, 0)
-                                        lcd.write_string("Scanning...")
-                    
-                    face_names.append(name)
-
-            process_this_frame = not process_this_frame
-
-            if face_locations:
-                for (top, right, bottom, left), name in zip(face_locations, face_names):
-                    draw_overlay(frame, name, (top, right, bottom, left), current_status)
-            else:
-                 draw_overlay(frame, "", None, current_status)
-
-            cv2.imshow('Attendance System', frame)
+            if time.time() - last_stats > STATS_SECONDS:
+                last_stats = time.time()
+                print(f"STATS:\n{stats.summary()}")
+
+            seq, frame = grabber.next_frame(last_seq)
+            if frame is None:
+                if grabber.ended: break
+                continue
+            last_seq = seq
+
+            with stats.timed("motion"):
+                detect = gate.check(frame, time.time(), tracking=bool(face_locations))
+
+            # The worker owns the submitted frame; draw on a copy so they never share pixels.
+            if detect:
+                recognizer.submit("camera", seq, frame)
+                frame = frame.copy()
+
+            for _, faces in recognizer.results("camera"):
+                if lesson_started is not None:
+                    # Camera start to first result: includes the dlib load if preloading has not finished.
+                    startup = time.perf_counter() - lesson_started
+                    stats.record("first_recognition", startup)
+                    print(f"STARTUP: first frame recognized {startup:.2f} s after camera start.")
+                    lesson_started = None
+                stats.incr("frames_recognized")
+                stats.incr("faces", len(faces))
+                stats.incr("unknown_faces", sum(1 for face in faces if face.student_id is None))
+                face_locations = [face.location for face in faces]
+                today = datetime.now().strftime("%Y-%m-%d")
+                if todays_attendance_ids.date != today:
+                    todays_attendance_ids = AttendanceSession(today, current_lesson)
+                face_names, current_status, admitted = update_attendance(
+                    faces, todays_attendance_ids, detection_timers, delay=DELAY_SECONDS,
+                    live_tracks=tracker.live_track_ids())
+                live_status.update(status=current_status, checked_in=len(todays_attendance_ids), faces=len(faces))
+
+                # --- ACTIONS (door, LCD, audio, DB run on the action thread) ---
+                for student_id, name in admitted:
+                    actions.submit(admit_student, student_id, name, current_lesson, current_classroom)
+
+            with stats.timed("display"):
+                if face_locations:
+                    for (top, right, bottom, left), name in zip(face_locations, face_names):
+                        draw_overlay(frame, name, (top, right, bottom, left), current_status)
+                else:
+                     draw_overlay(frame, "", None, current_status)
+
+                cv2.imshow('Attendance System', frame)
             
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
         
+        grabber.stop()
+        recognizer.stop()
         video_capture.release()
         cv2.destroyAllWindows()
-
-    pwm_servo.stop()
-    GPIO.cleanup()
-    if lcd: lcd.clear()
+        live_status.update(lesson=None, status="SELECT LESSON", faces=0)
+        print(f"--- LESSON ENDED: {current_lesson} ---\n{stats.summary()}")
+
+    scheduler.stop()
+    if api_server is not None:
+        api_server.stop()
+    if learner is not None:
+        learner.stop()
+    gallery.stop()
+    actions.stop()
+    attendance_writer.close()
+    hardware.close()
 
 if __name__ == "__main__":
     main_loop()
\ No newline at end of file
@@ -0,0 +1,250 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# --- SETTINGS ---
+SAMPLE_WINDOW = 1000  # Latest samples per stage kept for percentiles
+METRIC_PREFIX = "attendance"
+QUANTILES = (50, 95, 99)
+METRICS_HOST = "127.0.0.1"  # Local only; "0.0.0.0" lets a Prometheus server elsewhere scrape it
+
+
+def percentile(sorted_samples, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, min(len(sorted_samples) - 1, int(round(q / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[rank]
+
+
+class LatencyStats:
+    """Thread-safe per-stage latency and event counters."""
+
+    def __init__(self, window=SAMPLE_WINDOW):
+        self._lock = threading.Lock()
+        self._window = window
+        self._stages = {}  # stage -> [count, total seconds, max seconds, recent samples]
+        self.counters = {}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = [0, 0.0, 0.0, deque(maxlen=self._window)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3].append(seconds)
+
+    @contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self):
+        """
+        Returns ({stage: {"count", "mean_ms", "max_ms", "p50_ms", "p95_ms", "p99_ms"}}, counters).
+        Percentiles cover the latest SAMPLE_WINDOW samples of each stage.
+        """
+        with self._lock:
+            stages = {}
+            for stage, (count, total, worst, samples) in self._stages.items():
+                recent = sorted(samples)
+                stages[stage] = {
+                    "count": count,
+                    "mean_ms": total / count * 1000,
+                    "max_ms": worst * 1000,
+                    "p50_ms": percentile(recent, 50) * 1000,
+                    "p95_ms": percentile(recent, 95) * 1000,
+                    "p99_ms": percentile(recent, 99) * 1000,
+                }
+            return stages, dict(self.counters)
+
+    def summary(self):
+        stages, counters = self.snapshot()
+        lines = [f"  {stage:<20} n={s['count']:<6} p50={s['p50_ms']:7.1f} p95={s['p95_ms']:7.1f} "
+                 f"p99={s['p99_ms']:7.1f} max={s['max_ms']:7.1f} ms"
+                 for stage, s in sorted(stages.items())]
+        lines += [f"  {name:<20} {value}" for name, value in sorted(counters.items())]
+        return "\n".join(lines)
+
+
+# --- EXPORT ---
+
+def _labels(pairs):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def prometheus_text(sources, prefix=METRIC_PREFIX):
+    """
+    Renders [(labels dict, LatencyStats)] in the Prometheus text format: one summary
+    (p50/p95/p99 over the recent window, plus lifetime _sum and _count) per stage,
+    and one counter per event.
+    """
+    snapshots = [(sorted(labels.items()), stats.snapshot()) for labels, stats in sources]
+    lines = [f"# HELP {prefix}_stage_seconds Time spent per pipeline stage.",
+             f"# TYPE {prefix}_stage_seconds summary"]
+    for labels, (stages, _) in snapshots:
+        for stage, s in sorted(stages.items()):
+            pairs = labels + [("stage", stage)]
+            for q in QUANTILES:
+                lines.append(f"{prefix}_stage_seconds{_labels(pairs + [('quantile', q / 100)])} {s[f'p{q}_ms'] / 1000:.6f}")
+            lines.append(f"{prefix}_stage_seconds_sum{_labels(pairs)} {s['mean_ms'] * s['count'] / 1000:.6f}")
+            lines.append(f"{prefix}_stage_seconds_count{_labels(pairs)} {s['count']}")
+    lines += [f"# HELP {prefix}_events_total Pipeline event counters.",
+              f"# TYPE {prefix}_events_total counter"]
+    for labels, (_, counters) in snapshots:
+        for name, value in sorted(counters.items()):
+            lines.append(f"{prefix}_events_total{_labels(labels + [('event', name)])} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves prometheus_text(sources()) at http://host:port/metrics from a daemon thread."""
+
+    def __init__(self, sources, port, host=METRICS_HOST):
+        # Imported here: http.server pulls in the email and html packages, which
+        # nothing else on the recognition path needs.
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = prometheus_text(sources()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @classmethod
+    def try_start(cls, sources, port, host=METRICS_HOST):
+        """Starts the server, or logs why it could not (e.g. port in use) and returns None."""
+        try:
+            return cls(sources, port, host).start()
+        except OSError as e:
+            print(f"METRICS: cannot serve on {host}:{port} ({e}), continuing without the endpoint.")
+            return None
+
+
+class JsonMetricsLog:
+    """Appends one JSON line with every source's snapshot to path every interval seconds."""
+
+    def __init__(self, sources, path, interval=60.0):
+        self.sources = sources
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+        self.write()
+
+    def write(self):
+        entries = []
+        for labels, stats in self.sources():
+            stages, counters = stats.snapshot()
+            entries.append({"labels": labels, "stages": stages, "counters": counters})
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"time": time.time(), "sources": entries}) + "\n")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"METRICS: Could not write {self.path} ({e})")
+
+
+# --- PROFILING ---
+
+class SamplingProfiler:
+    """
+    Opt-in, low-overhead profiler for on-site use.
+
+    Samples the stack of every thread (capture, recognition workers, writer...)
+    every interval seconds, which cProfile cannot do since it only sees the
+    thread it runs on. save() writes collapsed stacks ("a;b;c count" per line),
+    the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                    frame = frame.f_back
+                self.samples[";".join([names.get(thread_id, str(thread_id))] + stack[::-1])] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+
+    def save_after(self, seconds, path):
+        """Stops sampling after `seconds` and writes the profile, without blocking the caller."""
+        def finish():
+            self.stop()
+            self.save(path)
+        timer = threading.Timer(seconds, finish)
+        timer.daemon = True
+        timer.start()
+        return self
+
+    def save(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"PROFILE: {sum(self.samples.values())} samples written to {path}")
@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+
+# --- SETTINGS ---
+MOTION_SCALE = 0.125        # 640x480 -> 80x60 for the frame difference
+MOTION_THRESHOLD = 25       # Grey-level change that counts as a moving pixel
+MIN_MOTION_AREA = 0.01      # Fraction of the ROI that must move to wake detection up
+BACKGROUND_RATE = 0.05      # How fast the background model absorbs slow changes (lighting)
+ACTIVE_HOLD_SECONDS = 2.0   # Keep detecting every frame this long after the last motion
+IDLE_DETECT_SECONDS = 2.0   # Detection interval on a static scene, catches anyone who slipped past
+
+
+def roi_box(roi, frame_shape):
+    """
+    Converts an ROI given as (left, top, right, bottom) fractions of the frame into a
+    pixel box (top, right, bottom, left). roi=None means the whole frame.
+    """
+    height, width = frame_shape[:2]
+    if roi is None:
+        return 0, width, height, 0
+    left, top, right, bottom = roi
+    return int(top * height), int(right * width), int(bottom * height), int(left * width)
+
+
+class MotionGate:
+    """
+    Cheap motion check that decides whether a frame is worth running face detection on.
+
+    The ROI is downscaled, greyed and compared against a running-average background.
+    While there is motion (or faces are still being tracked) every frame is detected;
+    once the scene has been static for ACTIVE_HOLD_SECONDS detection drops to one
+    frame per IDLE_DETECT_SECONDS.
+    """
+
+    def __init__(self, roi=None, threshold=MOTION_THRESHOLD, min_area=MIN_MOTION_AREA,
+                 hold=ACTIVE_HOLD_SECONDS, idle_interval=IDLE_DETECT_SECONDS, stats=None):
+        self.roi = roi
+        self.threshold = threshold
+        self.min_area = min_area
+        self.hold = hold
+        self.idle_interval = idle_interval
+        self.stats = stats
+        self.busy = True
+        self._background = None
+        self._last_motion = None
+        self._last_detect = None
+
+    def moving_fraction(self, frame):
+        """Fraction of ROI pixels that differ from the background; 1.0 for the first frame."""
+        top, right, bottom, left = roi_box(self.roi, frame.shape)
+        small = cv2.resize(frame[top:bottom, left:right], (0, 0), fx=MOTION_SCALE, fy=MOTION_SCALE,
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype(np.float32)
+            return 1.0
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(gray, self._background, BACKGROUND_RATE)
+        return np.count_nonzero(diff > self.threshold) / diff.size
+
+    def check(self, frame, now, tracking=False):
+        """Returns True if face detection should run on this frame."""
+        if self.moving_fraction(frame) >= self.min_area:
+            self._last_motion = now
+        self.busy = tracking or (self._last_motion is not None and now - self._last_motion < self.hold)
+        if self.stats is not None:
+            self.stats.incr("frames_busy" if self.busy else "frames_idle")
+
+        if self.busy or self._last_detect is None or now - self._last_detect >= self.idle_interval:
+            self._last_detect = now
+            return True
+        if self.stats is not None:
+            self.stats.incr("detect_skipped_idle")
+        return False
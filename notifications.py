@@ -0,0 +1,255 @@
+import argparse
+import base64
+import os
+import smtplib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+from database_setup import setup_database
+
+# --- SETTINGS ---
+DB_NAME = "attendance.db"
+SCOPES = ["https://www.googleapis.com/auth/gmail.send"]
+SEND_WORKERS = 4
+SEND_RATE_PER_SECOND = 2.0  # Sustained send rate shared by all workers
+SEND_BURST = 5
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30        # Doubled after every failed attempt
+STALE_SENDING_SECONDS = 600 # Claims older than this are assumed lost in a crash
+
+
+def absence_message(student_name, date_str):
+    subject = f"Absence Notification: {student_name}"
+    body = (
+        f"Dear Parent/Guardian,\n\n"
+        f"This is to inform you that your student, {student_name}, was absent from school on {date_str}.\n\n"
+        f"Sincerely,\n"
+        f"School Administration"
+    )
+    return subject, body
+
+
+def enqueue_absence_notices(conn, absentees, date_str):
+    """
+    Adds one outbox row per absentee with a guardian email. Does not commit, so it
+    can run inside record_absences' transaction. The dedupe key makes re-runs harmless.
+    """
+    rows = []
+    for student_id, student_name, guardian_email in absentees:
+        if not guardian_email:
+            print(f"Skipping email for {student_name}: no guardian email found.")
+            continue
+        subject, body = absence_message(student_name, date_str)
+        rows.append((f"absence:{date_str}:{student_id}", guardian_email, subject, body))
+    conn.executemany("""
+        INSERT OR IGNORE INTO NotificationOutbox (dedupe_key, recipient, subject, body)
+        VALUES (?, ?, ?, ?)
+    """, rows)
+
+
+# --- TRANSPORTS ---
+# A transport has one method, send(EmailMessage) -> message id, and raises on failure.
+
+class GmailTransport:
+    """
+    Gmail API transport. Credentials are loaded/refreshed once and shared by every
+    worker; each worker thread keeps its own service client because the underlying
+    httplib2 connection is not thread-safe.
+    """
+
+    def __init__(self, token_file="token.json", credentials_file="credentials.json"):
+        self.token_file = token_file
+        self.credentials_file = credentials_file
+        self._creds = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _credentials(self):
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        with self._lock:
+            if self._creds is None and os.path.exists(self.token_file):
+                self._creds = Credentials.from_authorized_user_file(self.token_file, SCOPES)
+            if not self._creds or not self._creds.valid:
+                if self._creds and self._creds.expired and self._creds.refresh_token:
+                    self._creds.refresh(Request())
+                else:
+                    flow = InstalledAppFlow.from_client_secrets_file(self.credentials_file, SCOPES)
+                    self._creds = flow.run_local_server(port=0)
+                with open(self.token_file, "w") as token:
+                    token.write(self._creds.to_json())
+            return self._creds
+
+    def send(self, message):
+        from googleapiclient.discovery import build
+
+        creds = self._credentials()
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self._local.service = build("gmail", "v1", credentials=creds, cache_discovery=False)
+        message["From"] = "me"
+        raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
+        return service.users().messages().send(userId="me", body={"raw": raw}).execute()["id"]
+
+
+class SmtpTransport:
+    """Plain SMTP transport; also what tests point at a local fake SMTP server."""
+
+    def __init__(self, host="localhost", port=25, sender="attendance@localhost",
+                 username=None, password=None, use_tls=False):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+
+    def send(self, message):
+        message["From"] = self.sender
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+        return message.get("Message-ID", "")
+
+
+# --- DISPATCH ---
+
+class TokenBucket:
+    """Blocking token-bucket rate limiter shared by the send workers."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class NotificationDispatcher:
+    """
+    Delivers NotificationOutbox rows through a transport with a bounded worker pool.
+
+    Only this object's thread touches the database: it claims due rows
+    (PENDING -> SENDING), hands them to the workers, and records SENT or
+    schedules a retry with exponential backoff. Rows that fail MAX_ATTEMPTS
+    times are marked FAILED.
+    """
+
+    def __init__(self, transport, db_name=DB_NAME, workers=SEND_WORKERS,
+                 rate=SEND_RATE_PER_SECOND, burst=SEND_BURST,
+                 max_attempts=MAX_ATTEMPTS, backoff=BACKOFF_SECONDS):
+        self.transport = transport
+        self.db_name = db_name
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.bucket = TokenBucket(rate, burst)
+
+    def _send(self, recipient, subject, body):
+        message = EmailMessage()
+        message.set_content(body)
+        message["To"] = recipient
+        message["Subject"] = subject
+        self.bucket.acquire()
+        return self.transport.send(message)
+
+    def run_once(self, pool, conn):
+        """Sends every row that is due now. Returns the number of rows attempted."""
+        now = time.time()
+        # Claim under a write lock so two dispatchers never pick up the same row.
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute("""
+            SELECT id, recipient, subject, body, attempts FROM NotificationOutbox
+            WHERE status = 'PENDING' AND next_attempt_at <= ? ORDER BY id
+        """, (now,)).fetchall()
+        conn.executemany("UPDATE NotificationOutbox SET status = 'SENDING', next_attempt_at = ? WHERE id = ?",
+                         [(now, row[0]) for row in rows])
+        conn.commit()
+
+        futures = [(row, pool.submit(self._send, row[1], row[2], row[3])) for row in rows]
+        for (row_id, recipient, _, _, attempts), future in futures:
+            try:
+                message_id = future.result()
+            except Exception as e:
+                attempts += 1
+                status = "FAILED" if attempts >= self.max_attempts else "PENDING"
+                retry_at = time.time() + self.backoff * 2 ** (attempts - 1)
+                with conn:
+                    conn.execute("""
+                        UPDATE NotificationOutbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?
+                        WHERE id = ?
+                    """, (status, attempts, retry_at, str(e), row_id))
+                print(f"EMAIL {status}: {recipient} (attempt {attempts}): {e}")
+                continue
+            with conn:
+                conn.execute("""
+                    UPDATE NotificationOutbox
+                    SET status = 'SENT', attempts = attempts + 1, message_id = ?, sent_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (message_id, row_id))
+            print(f"EMAIL SENT: {recipient}")
+        return len(rows)
+
+    def run_until_empty(self):
+        """Delivers everything pending, sleeping for scheduled retries, until nothing is left."""
+        conn = sqlite3.connect(self.db_name, timeout=10)
+        setup_database(conn)
+        try:
+            with conn:
+                # A SENDING row this old was claimed by a process that died mid-send.
+                conn.execute("UPDATE NotificationOutbox SET status = 'PENDING' WHERE status = 'SENDING' AND next_attempt_at < ?",
+                             (time.time() - STALE_SENDING_SECONDS,))
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                while True:
+                    self.run_once(pool, conn)
+                    row = conn.execute("SELECT MIN(next_attempt_at) FROM NotificationOutbox WHERE status = 'PENDING'").fetchone()
+                    if row[0] is None:
+                        return
+                    time.sleep(max(0.0, row[0] - time.time()))
+        finally:
+            conn.close()
+
+
+def dispatch_in_background(transport, db_name=DB_NAME):
+    """Starts one daemon thread that drains the outbox."""
+    dispatcher = NotificationDispatcher(transport, db_name)
+    thread = threading.Thread(target=dispatcher.run_until_empty, daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver every pending e-mail in the outbox, then exit.")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--smtp", metavar="HOST:PORT", help="Send through this SMTP server instead of Gmail")
+    args = parser.parse_args()
+
+    transport = GmailTransport()
+    if args.smtp:
+        host, _, port = args.smtp.partition(":")
+        transport = SmtpTransport(host, int(port or 25))
+    NotificationDispatcher(transport, args.db).run_until_empty()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import queue
+import threading
+import time
+
+from metrics import LatencyStats
+
+
+class FrameGrabber:
+    """
+    Capture thread that keeps only the newest frame.
+
+    Drop policy: latest wins. A frame that is overwritten before anyone
+    asked for it is counted as "capture_dropped" and discarded, so slow
+    consumers never make the camera buffer back up.
+    With drop=False (recorded sources) the thread waits for each frame to be
+    taken instead, so every frame of the file is delivered.
+    """
+
+    def __init__(self, video_capture, stats=None, drop=True):
+        self.video_capture = video_capture
+        self.stats = stats or LatencyStats()
+        self.drop = drop
+        self.ended = False
+        self._seq = 0
+        self._frame = None
+        self._consumed = True
+        self._running = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._running = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout=2)
+
+    def _run(self):
+        while self._running:
+            start = time.perf_counter()
+            ret, frame = self.video_capture.read()
+            self.stats.record("capture", time.perf_counter() - start)
+            with self._cond:
+                if not ret:
+                    self.ended = True
+                    self._cond.notify_all()
+                    return
+                if not self.drop:
+                    self._cond.wait_for(lambda: self._consumed or not self._running)
+                    if not self._running:
+                        return
+                if not self._consumed:
+                    self.stats.incr("capture_dropped")
+                self._seq += 1
+                self._frame = frame
+                self._consumed = False
+                self._cond.notify_all()
+
+    def next_frame(self, last_seq, timeout=1.0):
+        """
+        Waits for a frame newer than last_seq.
+        Returns (seq, frame), or (last_seq, None) on timeout or once the source has ended.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > last_seq or self.ended, timeout=timeout)
+            if self._seq <= last_seq:
+                return last_seq, None
+            self._consumed = True
+            if not self.drop:
+                self._cond.notify_all()  # the capture thread is waiting to deliver the next frame
+            return self._seq, self._frame
+
+
+class FairRecognitionPool:
+    """
+    Recognition threads shared by one or more cameras.
+
+    Every camera has a one-frame slot (newest frame wins, the replaced one is
+    counted as "recognition_skipped") and at most one frame in flight, which
+    keeps each camera's tracker single-threaded. Workers serve the cameras
+    round-robin, so a busy camera cannot starve the quiet ones.
+    """
+
+    def __init__(self, workers=2):
+        self._cond = threading.Condition()
+        self._cameras = {}   # key -> (recognize, stats)
+        self._order = []     # round-robin order, the next camera to serve first
+        self._pending = {}   # key -> (seq, frame, frame time, queued at)
+        self._busy = set()
+        self._results = {}
+        self._running = True
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def add_camera(self, key, recognize, stats=None):
+        with self._cond:
+            self._cameras[key] = (recognize, stats or LatencyStats())
+            self._order.append(key)
+            self._results[key] = queue.Queue()
+
+    def submit(self, key, seq, frame, now=None):
+        """
+        Puts a frame in the camera's slot. The pool owns the frame from now on.
+        A frame time (e.g. video time of a recorded source) is passed on to recognize as now.
+        """
+        with self._cond:
+            if key in self._pending:
+                self._cameras[key][1].incr("recognition_skipped")
+            self._pending[key] = (seq, frame, now, time.perf_counter())
+            self._cond.notify()
+
+    def busy(self, key):
+        """True while the camera has a frame waiting or being recognized."""
+        with self._cond:
+            return key in self._pending or key in self._busy
+
+    def _next_job(self):
+        for i, key in enumerate(self._order):
+            if key in self._pending and key not in self._busy:
+                self._order.append(self._order.pop(i))
+                self._busy.add(key)
+                return key, self._pending.pop(key)
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                job = None
+                while self._running and job is None:
+                    job = self._next_job()
+                    if job is None:
+                        self._cond.wait()
+                if job is None:
+                    return
+                key, (seq, frame, now, queued_at) = job
+                recognize, stats = self._cameras[key]
+            stats.record("queue_wait", time.perf_counter() - queued_at)
+            try:
+                with stats.timed("recognize"):
+                    result = recognize(frame) if now is None else recognize(frame, now=now)
+                    self._results[key].put((seq, result))
+            except Exception as e:
+                print(f"RECOGNITION ERROR ({key}): {e}")
+                stats.incr("recognition_errors")
+            finally:
+                with self._cond:
+                    self._busy.discard(key)
+                    self._cond.notify()
+
+    def results(self, key):
+        """Returns every finished (seq, result) of one camera without waiting, oldest first."""
+        finished = []
+        while True:
+            try:
+                finished.append(self._results[key].get_nowait())
+            except queue.Empty:
+                return sorted(finished, key=lambda item: item[0])
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._pending.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+
+class ActionWorker:
+    """
+    Single thread that runs slow side effects (door, LCD, audio, DB) in order.
+
+    The queue is bounded; when it is full submit() waits rather than dropping,
+    because every queued action is an admission that must be recorded.
+    """
+
+    def __init__(self, max_pending=64, stats=None):
+        self.stats = stats or LatencyStats()
+        self._actions = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args):
+        self._actions.put((func, args))
+
+    def _run(self):
+        while True:
+            action = self._actions.get()
+            if action is None:
+                return
+            func, args = action
+            try:
+                with self.stats.timed("action"):
+                    func(*args)
+            except Exception as e:
+                print(f"ACTION ERROR: {e}")
+                self.stats.incr("action_errors")
+
+    def stop(self):
+        """Finishes every pending action, then stops the thread."""
+        self._actions.put(None)
+        self._thread.join()
@@ -0,0 +1,251 @@
+import numpy as np
+
+# --- SETTINGS ---
+DECODE_ROWS = 4096       # float16/int8 rows are widened to float32 this many at a time while matching
+INT8_MARGIN = 0.05       # int8 range is widened by this fraction so students enrolled later still fit
+PQ_SUBSPACES = 16        # 128-d encodings are split into 16 slices of 8 dims, one byte per slice
+PQ_CENTROIDS = 256
+PQ_TRAIN_SAMPLES = 20000 # Codebooks are trained on at most this many gallery rows
+PQ_ENCODE_ROWS = 512     # Rows assigned to centroids at once (bounds the distance tables)
+
+
+def _sq_norms(vectors):
+    return np.einsum("ij,ij->i", vectors, vectors)
+
+
+def _to_distances(sq):
+    np.maximum(sq, 0.0, out=sq)
+    return np.sqrt(sq, out=sq)
+
+
+class Float32Store:
+    """The exact gallery: one contiguous (N, 128) float32 matrix, 512 bytes per face."""
+
+    precision = "float32"
+
+    def __init__(self, vectors):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.sq_norms = _sq_norms(self.vectors)
+
+    @classmethod
+    def train(cls, vectors):
+        return cls(vectors)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes + self.sq_norms.nbytes
+
+    def decode(self):
+        return self.vectors
+
+    def distances(self, probes):
+        """(M, N) euclidean distances; probes is an (M, 128) float32 array."""
+        return _to_distances(_sq_norms(probes)[:, None] + self.sq_norms[None, :] - 2.0 * (probes @ self.vectors.T))
+
+    def take(self, keep):
+        store = Float32Store.__new__(Float32Store)
+        store.vectors = self.vectors[keep]
+        store.sq_norms = self.sq_norms[keep]
+        return store
+
+    def extend(self, vectors):
+        store = Float32Store.__new__(Float32Store)
+        store.vectors = np.concatenate([self.vectors, vectors])
+        store.sq_norms = np.concatenate([self.sq_norms, _sq_norms(vectors)])
+        return store
+
+
+class _DecodedStore:
+    """
+    Base for stores kept compressed in memory and widened to float32 DECODE_ROWS rows
+    at a time for the matrix product, so the float32 gallery never exists as a whole.
+    Subclasses hold self.codes, rows of self.sq_norms, and implement encode/_decode_rows.
+    """
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.sq_norms.nbytes
+
+    def decode(self):
+        return self._decode_rows(self.codes)
+
+    def distances(self, probes):
+        dots = np.empty((len(probes), len(self)), dtype=np.float32)
+        for start in range(0, len(self), DECODE_ROWS):
+            rows = self._decode_rows(self.codes[start:start + DECODE_ROWS])
+            dots[:, start:start + len(rows)] = probes @ rows.T
+        return _to_distances(_sq_norms(probes)[:, None] + self.sq_norms[None, :] - 2.0 * dots)
+
+    def _with(self, codes, sq_norms):
+        store = self.__class__.__new__(self.__class__)
+        store.__dict__.update(self.__dict__)
+        store.codes = codes
+        store.sq_norms = sq_norms
+        return store
+
+    def take(self, keep):
+        return self._with(self.codes[keep], self.sq_norms[keep])
+
+    def extend(self, vectors):
+        if len(self) == 0:
+            return self.train(vectors)  # nothing was trained on an empty gallery
+        codes = self.encode(vectors)
+        return self._with(np.concatenate([self.codes, codes]),
+                          np.concatenate([self.sq_norms, _sq_norms(self._decode_rows(codes))]))
+
+
+class Float16Store(_DecodedStore):
+    """Half precision storage, 256 bytes per face; distances are still computed in float32."""
+
+    precision = "float16"
+
+    def __init__(self, vectors):
+        self.codes = self.encode(vectors)
+        self.sq_norms = _sq_norms(self._decode_rows(self.codes))
+
+    @classmethod
+    def train(cls, vectors):
+        return cls(vectors)
+
+    def encode(self, vectors):
+        return np.ascontiguousarray(vectors, dtype=np.float16)
+
+    def _decode_rows(self, codes):
+        return codes.astype(np.float32)
+
+
+class Int8Store(_DecodedStore):
+    """
+    Scalar quantization, 128 bytes per face: every dimension is mapped linearly from the
+    gallery's own value range onto 0..255. Values outside the trained range are clipped.
+    Norms are taken from the decoded rows, so the distance is exact for the stored values.
+    """
+
+    precision = "int8"
+
+    def __init__(self, low, scale, vectors):
+        self.low = np.asarray(low, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.codes = self.encode(vectors)
+        self.sq_norms = _sq_norms(self._decode_rows(self.codes))
+
+    @classmethod
+    def train(cls, vectors):
+        if len(vectors) == 0:
+            low, high = np.full(vectors.shape[1], -1.0), np.full(vectors.shape[1], 1.0)
+        else:
+            low, high = vectors.min(axis=0), vectors.max(axis=0)
+        margin = (high - low) * INT8_MARGIN
+        low, high = low - margin, high + margin
+        return cls(low, np.maximum((high - low) / 255.0, 1e-6), vectors)
+
+    def encode(self, vectors):
+        codes = np.rint((np.asarray(vectors, dtype=np.float32) - self.low) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def _decode_rows(self, codes):
+        return codes * self.scale + self.low
+
+    def distances(self, probes):
+        # p . (code * scale + low) = (p * scale) . code + p . low: the scale moves onto the
+        # probes, so the gallery chunks only need a cast, not a multiply-add per value.
+        scaled = probes * self.scale
+        dots = np.empty((len(probes), len(self)), dtype=np.float32)
+        for start in range(0, len(self), DECODE_ROWS):
+            chunk = self.codes[start:start + DECODE_ROWS]
+            dots[:, start:start + len(chunk)] = scaled @ chunk.astype(np.float32).T
+        dots += (probes @ self.low)[:, None]
+        return _to_distances(_sq_norms(probes)[:, None] + self.sq_norms[None, :] - 2.0 * dots)
+
+
+class PQStore(_DecodedStore):
+    """
+    Product quantization, PQ_SUBSPACES bytes per face (16 instead of 512): each 8-d slice
+    of an encoding is replaced by the index of its nearest of 256 trained centroids.
+    Distances are asymmetric: the probe stays exact and is compared with the centroids
+    once per frame; every gallery row then costs one table lookup per slice.
+    """
+
+    precision = "pq"
+
+    def __init__(self, codebooks, vectors):
+        self.codebooks = np.ascontiguousarray(codebooks, dtype=np.float32)  # (subspaces, centroids, width)
+        self.codes = self.encode(vectors)
+        self.sq_norms = np.empty(0, dtype=np.float32)  # unused: nothing is decoded to match
+
+    @classmethod
+    def train(cls, vectors, subspaces=PQ_SUBSPACES, centroids=PQ_CENTROIDS, seed=0):
+        from ann_index import kmeans  # ann_index imports face_matcher, which imports us
+
+        if vectors.shape[1] % subspaces:
+            raise ValueError(f"{vectors.shape[1]} dimensions do not split into {subspaces} subspaces")
+        width = vectors.shape[1] // subspaces
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if len(vectors) > PQ_TRAIN_SAMPLES:
+            sample = vectors[np.sort(rng.choice(len(vectors), size=PQ_TRAIN_SAMPLES, replace=False))]
+        if len(sample) == 0:
+            sample = np.zeros((1, vectors.shape[1]), dtype=np.float32)
+        k = min(centroids, len(sample))
+        codebooks = np.zeros((subspaces, centroids, width), dtype=np.float32)
+        for s in range(subspaces):
+            codebooks[s, :k] = kmeans(np.ascontiguousarray(sample[:, s * width:(s + 1) * width]), k, seed=seed)
+        # Unused centroids (tiny galleries) repeat the first one, so they are never strictly nearer.
+        codebooks[:, k:] = codebooks[:, :1]
+        return cls(codebooks, vectors)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.codebooks.nbytes
+
+    def _tables(self, vectors):
+        """(M, subspaces, centroids) squared distances from every slice of every vector to the centroids."""
+        subspaces, _, width = self.codebooks.shape
+        slices = vectors.reshape(len(vectors), subspaces, width)
+        sq = (np.einsum("msw,msw->ms", slices, slices)[:, :, None]
+              + np.einsum("scw,scw->sc", self.codebooks, self.codebooks)[None, :, :]
+              - 2.0 * np.einsum("msw,scw->msc", slices, self.codebooks))
+        return np.maximum(sq, 0.0, out=sq)
+
+    def encode(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((len(vectors), len(self.codebooks)), dtype=np.uint8)
+        for start in range(0, len(vectors), PQ_ENCODE_ROWS):
+            codes[start:start + PQ_ENCODE_ROWS] = np.argmin(self._tables(vectors[start:start + PQ_ENCODE_ROWS]), axis=2)
+        return codes
+
+    def _decode_rows(self, codes):
+        subspaces = len(self.codebooks)
+        return self.codebooks[np.arange(subspaces), codes].reshape(len(codes), -1)
+
+    def distances(self, probes):
+        tables = self._tables(probes)
+        sq = np.zeros((len(probes), len(self)), dtype=np.float32)
+        for s in range(len(self.codebooks)):
+            sq += np.take(tables[:, s], self.codes[:, s], axis=1)
+        return np.sqrt(sq, out=sq)
+
+    def take(self, keep):
+        return self._with(self.codes[keep], self.sq_norms)
+
+    def extend(self, vectors):
+        if len(self) == 0:
+            return self.train(vectors)
+        return self._with(np.concatenate([self.codes, self.encode(vectors)]), self.sq_norms)
+
+
+STORES = {store.precision: store for store in (Float32Store, Float16Store, Int8Store, PQStore)}
+PRECISIONS = tuple(STORES)
+
+
+def make_store(precision, vectors):
+    """Trains the store for precision on vectors (N, 128 float32) and encodes them."""
+    if precision not in STORES:
+        raise ValueError(f"Unknown precision '{precision}', choose from: {', '.join(PRECISIONS)}")
+    return STORES[precision].train(np.asarray(vectors, dtype=np.float32))
@@ -0,0 +1,107 @@
+import time
+from contextlib import nullcontext
+
+import cv2
+
+from detectors import HogDetector
+from lazy_modules import face_recognition
+from motion_gate import roi_box
+
+# --- SETTINGS ---
+DELAY_SECONDS = 1.0
+DETECT_SCALES = (0.25, 0.5)  # Coarse first; the next scale is only tried when needed
+MIN_DETECTED_FACE = 80       # Faces shorter than this in the full frame are re-checked finer (the enrollment floor)
+
+
+def detect_faces(rgb_frame, scales=DETECT_SCALES, roi=None, stats=None, detector=None):
+    """
+    Scale-pyramid face detection on an RGB frame with any detectors backend (HOG by default).
+
+    Each scale is tried in order (a scale above 1 upsamples); the search stops at
+    the first scale that finds faces that are all at least MIN_DETECTED_FACE tall
+    in the full frame.
+    So close faces cost one cheap coarse pass, and only an empty or far-away
+    doorway pays for the finer ones. Boxes are returned in full-frame pixels.
+    With stats, the resizing is also timed on its own as the "resize" stage.
+    """
+    detector = detector or HogDetector()
+    top, right, bottom, left = roi_box(roi, rgb_frame.shape)
+    crop = rgb_frame[top:bottom, left:right]
+    locations, used_scale = [], scales[-1]
+    for i, scale in enumerate(scales):
+        if i > 0 and stats is not None:
+            stats.incr("detect_escalations")
+        with stats.timed("resize") if stats is not None else nullcontext():
+            small = crop if scale == 1 else cv2.resize(crop, (0, 0), fx=scale, fy=scale)
+        found = detector.detect(small)
+        if found:
+            locations, used_scale = found, scale
+            if min(b - t for t, _, b, _ in found) / scale >= MIN_DETECTED_FACE:
+                break
+    return [(int(t / used_scale) + top, int(r / used_scale) + left, int(b / used_scale) + top, int(l / used_scale) + left)
+            for t, r, b, l in locations]
+
+
+def recognize_frame(frame, matcher, tracker, stats, now=None, roi=None, scales=DETECT_SCALES, detector=None):
+    """
+    Detects the faces in a BGR frame and returns one TrackedFace per face.
+    Only faces the tracker has not confirmed yet (or is re-verifying) are encoded,
+    from the full-resolution frame. Locations are full-frame pixel boxes.
+    With an roi (see motion_gate.roi_box) only that part of the frame is searched.
+    """
+    with stats.timed("convert"):
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    with stats.timed("detect"):
+        face_locations = detect_faces(rgb_frame, scales, roi, stats, detector)
+
+    tracks, to_encode = tracker.update(face_locations, now)
+    stats.incr("encodes_skipped", len(face_locations) - len(to_encode))
+    if to_encode:
+        with stats.timed("encode"):
+            face_encodings = face_recognition.face_encodings(
+                rgb_frame, [face_locations[i] for i in to_encode])
+        with stats.timed("match"):
+            matches = matcher.match(face_encodings)
+        tracker.assign([tracks[i] for i in to_encode], matches, now)
+    return tracker.snapshot(tracks)
+
+
+def update_attendance(faces, todays_attendance_ids, detection_timers, now=None, delay=DELAY_SECONDS,
+                      live_tracks=None):
+    """
+    Dwell-time admission logic for one frame's tracked faces.
+
+    detection_timers maps track id -> (student_id, first seen) and is updated in place;
+    admitted students are added to todays_attendance_ids. A timer is only dropped with
+    its track: pass the tracker's live_track_ids() as live_tracks, so a face the detector
+    missed for a frame or two keeps its dwell time.
+    Returns (face_names, status_text, admitted) where admitted is a list of (student_id, name).
+    """
+    now = time.time() if now is None else now
+    face_names = []
+    current_status = "SCANNING..."
+    admitted = []
+
+    for face in faces:
+        name = face.name
+        student_id = face.student_id
+
+        if student_id is not None and student_id not in todays_attendance_ids:
+            timer = detection_timers.get(face.track_id)
+            if timer is None or timer[0] != student_id:
+                detection_timers[face.track_id] = (student_id, now)
+                current_status = f"FOUND: {name}"
+            elif now - timer[1] >= delay and face.confirmed:
+                current_status = f"ENTER: {name}"
+                todays_attendance_ids.add(student_id)
+                del detection_timers[face.track_id]
+                admitted.append((student_id, name))
+
+        face_names.append(name)
+
+    live_tracks = {face.track_id for face in faces} | set(live_tracks or ())
+    for track_id in list(detection_timers):
+        if track_id not in live_tracks:
+            del detection_timers[track_id]
+
+    return face_names, current_status, admitted
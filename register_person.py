@@ -1,44 +1,177 @@
-import cv2
-import face_recognition
+import argparse
+import os
 import sqlite3
-import pickle
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import cv2
+import numpy as np
+
+from ann_index import add_many_to_saved_index
+from database_setup import setup_database
+from detectors import DEFAULT_DETECTOR, DETECTORS, make_detector
+from encoding_store import encode_encoding
+from face_templates import add_templates
+from lazy_modules import face_recognition
 
 DB_NAME = "attendance.db"
 
-def save_encoding_to_db(first_name, last_name, encoding):
+# --- ENROLLMENT SETTINGS ---
+PREVIEW_SCALE = 0.25     # Live preview boxes are detected on a downscaled frame
+DETECT_SCALE = 0.5       # Burst frames and photos are detected at this scale, encoded at full size
+BURST_FRAMES = 15        # Frames captured when 's' is pressed
+BEST_K = 5               # Best-scoring faces averaged into the template
+MIN_FACE_PIXELS = 80     # Faces smaller than this (full-resolution height) are rejected
+SHARPNESS_TARGET = 150.0 # Laplacian variance treated as "fully sharp"
+MIN_QUALITY = 0.2
+ENROLL_TEMPLATES = 3     # Templates stored per student: the averaged one plus the best single faces
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+DETECTOR = DEFAULT_DETECTOR  # hog, cnn, haar or dnn (see detectors.py)
+
+def save_encoding_to_db(first_name, last_name, encoding, extra_templates=()):
     """
-    Saves the person's name and face encoding to the database.
+    Saves the person's name and face encoding to the database, plus any extra templates.
     """
+    conn = None
     try:
-        pickled_encoding = pickle.dumps(encoding)
+        encoded = encode_encoding(encoding)
         conn = sqlite3.connect(DB_NAME)
+        setup_database(conn)  # FaceTemplates and the change triggers may not exist yet
         cursor = conn.cursor()
 
         cursor.execute("""
             INSERT INTO Students (first_name, last_name, face_encoding)
             VALUES (?, ?, ?)
-        """, (first_name, last_name, pickled_encoding))
+        """, (first_name, last_name, encoded))
+        student_id = cursor.lastrowid
+        add_templates(conn, student_id, extra_templates)
 
         conn.commit()
         print(f"SUCCESS: {first_name} {last_name} has been registered to the database.")
+        add_many_to_saved_index([student_id] * (1 + len(extra_templates)), [encoding, *extra_templates], DB_NAME)
 
     except sqlite3.Error as e:
         print(f"DATABASE ERROR: {e}")
     finally:
         if conn:
-            conn.close()    
+            conn.close()
+
+# --- QUALITY SCORING ---
+
+def detect_faces_batch(rgb_images, scale, detector):
+    """Detects faces on downscaled copies in one detector call and returns boxes in full-resolution coordinates."""
+    small = [cv2.resize(image, (0, 0), fx=scale, fy=scale) if scale != 1 else image for image in rgb_images]
+    return [[tuple(int(round(v / scale)) for v in box) for box in boxes] for boxes in detector.detect_batch(small)]
+
+def detect_faces(rgb_image, scale, detector):
+    return detect_faces_batch([rgb_image], scale, detector)[0]
+
+def face_quality(rgb_image, location):
+    """
+    Scores one face from 0 to 1 on sharpness, size and how frontal the pose is.
+    Returns 0 for faces too small to make a reliable template.
+    """
+    top, right, bottom, left = location
+    height = bottom - top
+    if height < MIN_FACE_PIXELS:
+        return 0.0
+
+    gray = cv2.cvtColor(rgb_image[max(top, 0):bottom, max(left, 0):right], cv2.COLOR_RGB2GRAY)
+    sharpness = min(1.0, cv2.Laplacian(gray, cv2.CV_64F).var() / SHARPNESS_TARGET)
+    size = min(1.0, height / (2 * MIN_FACE_PIXELS))
+
+    # Frontal faces have the nose tip about equally far from both eyes.
+    frontal = 0.5
+    landmarks = face_recognition.face_landmarks(rgb_image, [location], model="small")
+    if landmarks:
+        points = landmarks[0]
+        nose = np.mean(points["nose_tip"], axis=0)
+        left_gap = np.linalg.norm(nose - np.mean(points["left_eye"], axis=0))
+        right_gap = np.linalg.norm(nose - np.mean(points["right_eye"], axis=0))
+        if left_gap + right_gap > 0:
+            frontal = 1.0 - abs(left_gap - right_gap) / (left_gap + right_gap)
+
+    return sharpness * size * frontal
+
+def build_template(candidates, best_k=BEST_K):
+    """
+    candidates: [(score, rgb_image, location)] with exactly one face each.
+    Encodes only the best_k highest scoring faces and returns (mean encoding, their
+    encodings best first), or (None, []) if none is good enough.
+    """
+    good = sorted((c for c in candidates if c[0] >= MIN_QUALITY), key=lambda c: c[0], reverse=True)[:best_k]
+    encodings = []
+    for _, rgb_image, location in good:
+        encodings.extend(face_recognition.face_encodings(rgb_image, [location]))
+    if not encodings:
+        return None, []
+    return np.mean(encodings, axis=0), encodings
+
+def extra_templates(encodings):
+    """The best single faces kept next to the averaged template; none if only one face was used."""
+    return encodings[:ENROLL_TEMPLATES - 1] if len(encodings) > 1 else []
+
+# --- CAMERA ENROLLMENT ---
+
+def capture_burst(video_capture, detector, count=BURST_FRAMES):
+    """
+    Grabs `count` frames, detects faces on all of them in one batch (the CNN
+    detector runs them through the network together), and returns the scored
+    single-face ones as build_template candidates.
+    """
+    frames = []
+    for _ in range(count):
+        ret, frame = video_capture.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
 
-def register_new_person():
+    candidates = []
+    for rgb_frame, locations in zip(frames, detect_faces_batch(frames, DETECT_SCALE, detector)):
+        if len(locations) == 1:
+            candidates.append((face_quality(rgb_frame, locations[0]), rgb_frame, locations[0]))
+    return candidates
+
+def add_templates_to_student(student_id, encodings):
+    """Stores more templates for an enrolled student instead of re-enrolling them."""
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        setup_database(conn)
+        with conn:
+            add_templates(conn, student_id, encodings)
+    finally:
+        conn.close()
+    add_many_to_saved_index([student_id] * len(encodings), encodings, DB_NAME)
+    print(f"SUCCESS: {len(encodings)} template(s) added to student {student_id}.")
+
+def student_name(student_id):
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        row = conn.execute("SELECT first_name, last_name FROM Students WHERE id = ?", (student_id,)).fetchone()
+    finally:
+        conn.close()
+    return None if row is None else f"{row[0]} {row[1]}"
+
+def register_new_person(detector_name=DETECTOR, student_id=None):
     """
     Opens the camera to capture and register a new person's face.
+    With student_id, the capture is added as another template of that student instead.
     """
-    first_name = input("Enter the person's first name: ")
-    last_name = input("Enter the person's last name: ")
+    if student_id is not None:
+        name = student_name(student_id)
+        if name is None:
+            print(f"Error: No student with id {student_id}.")
+            return
+        print(f"Adding a template for {name}.")
+    else:
+        first_name = input("Enter the person's first name: ")
+        last_name = input("Enter the person's last name: ")
 
-    if not first_name or not last_name:
-        print("Error: First name and last name cannot be empty.")
-        return
+        if not first_name or not last_name:
+            print("Error: First name and last name cannot be empty.")
+            return
 
+    detector = make_detector(detector_name)
     video_capture = cv2.VideoCapture(0)
 
     print("\nCamera is opening...")
@@ -50,10 +183,10 @@ def register_new_person():
         if not ret:
             print("Failed to grab frame from camera. Exiting.")
             break
-        
+
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb_frame)
-        
+        face_locations = detect_faces(rgb_frame, PREVIEW_SCALE, detector)
+
         for (top, right, bottom, left) in face_locations:
             cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
 
@@ -67,22 +200,111 @@ def register_new_person():
             print("Registration cancelled.")
             break
         elif key == ord('s'):
-            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+            print(f"Capturing {BURST_FRAMES} frames, hold still...")
+            candidates = capture_burst(video_capture, detector)
 
-            if len(face_encodings) == 0:
-                print("WARNING: No face detected! Please try again.")
+            if len(candidates) == 0:
+                print("WARNING: No single face detected! Please ensure only one person is in the frame.")
                 continue
-            elif len(face_encodings) > 1:
-                print("WARNING: Multiple faces detected! Please ensure only one person is in the frame.")
+
+            template, encodings = build_template(candidates)
+            if template is None:
+                print("WARNING: Face too small, blurry or turned away! Please try again.")
                 continue
-            
-            print("Face detected successfully! Saving to database...")
-            new_encoding = face_encodings[0]
-            save_encoding_to_db(first_name, last_name, new_encoding)
+
+            print(f"Face captured successfully ({len(encodings)} of {len(candidates)} frames used)! Saving to database...")
+            if student_id is not None:
+                add_templates_to_student(student_id, [template])
+            else:
+                save_encoding_to_db(first_name, last_name, template, extra_templates(encodings))
             break
 
     video_capture.release()
     cv2.destroyAllWindows()
 
+# --- BULK ENROLLMENT ---
+
+def parse_folder_name(folder):
+    """'Ada_Lovelace' or 'Mary Ann Smith' -> (first name, last name), or None."""
+    parts = folder.replace("_", " ").split()
+    if len(parts) < 2:
+        return None
+    return " ".join(parts[:-1]), parts[-1]
+
+def enroll_folder(path, detector_name=DETECTOR):
+    """
+    Builds the template for one student's photo folder. Runs in a worker process.
+    Photos of the same size are detected in one batch, like a camera burst.
+    """
+    detector = make_detector(detector_name)
+    by_shape = {}
+    for name in sorted(os.listdir(path)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            image = face_recognition.load_image_file(os.path.join(path, name))
+            by_shape.setdefault(image.shape, []).append(image)
+    candidates = []
+    for images in by_shape.values():
+        for image, locations in zip(images, detect_faces_batch(images, DETECT_SCALE, detector)):
+            if len(locations) == 1:
+                candidates.append((face_quality(image, locations[0]), image, locations[0]))
+    template, encodings = build_template(candidates)
+    return path, template, encodings
+
+def enroll_directory(root, workers=None, detector_name=DETECTOR):
+    """
+    Enrolls every student folder under root (one folder per student, named First_Last)
+    using a process pool, then inserts all of them in one transaction.
+    """
+    folders = []
+    for folder in sorted(os.listdir(root)):
+        path = os.path.join(root, folder)
+        if os.path.isdir(path):
+            name = parse_folder_name(folder)
+            if name is None:
+                print(f"WARNING: Skipping '{folder}': folder name must be First_Last.")
+            else:
+                folders.append((path, name))
+
+    names = dict(folders)
+    rows, templates = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, template, encodings in pool.map(partial(enroll_folder, detector_name=detector_name), [path for path, _ in folders]):
+            first_name, last_name = names[path]
+            if template is None:
+                print(f"WARNING: No usable face for {first_name} {last_name}, skipped.")
+                continue
+            print(f"OK: {first_name} {last_name} ({len(encodings)} photos used)")
+            rows.append((first_name, last_name, encode_encoding(template)))
+            templates.append([template, *extra_templates(encodings)])
+
+    index_ids, index_encodings = [], []
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        setup_database(conn)
+        with conn:
+            cursor = conn.cursor()
+            for row, student_templates in zip(rows, templates):
+                cursor.execute("""
+                    INSERT INTO Students (first_name, last_name, face_encoding)
+                    VALUES (?, ?, ?)
+                """, row)
+                add_templates(conn, cursor.lastrowid, student_templates[1:])
+                index_ids.extend([cursor.lastrowid] * len(student_templates))
+                index_encodings.extend(student_templates)
+    finally:
+        conn.close()
+    add_many_to_saved_index(index_ids, index_encodings, DB_NAME)
+    print(f"SUCCESS: {len(rows)} of {len(folders)} students enrolled.")
+
 if __name__ == "__main__":
-    register_new_person()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Register students by camera, or in bulk from photo folders.")
+    parser.add_argument("--bulk", metavar="DIR", help="Folder with one sub-folder of photos per student (First_Last)")
+    parser.add_argument("--workers", type=int, help="Worker processes for --bulk (default: one per CPU)")
+    parser.add_argument("--detector", choices=sorted(DETECTORS), default=DETECTOR, help="Face detector backend")
+    parser.add_argument("--add-to", type=int, metavar="STUDENT_ID", help="Capture another template for an enrolled student")
+    args = parser.parse_args()
+
+    if args.bulk:
+        enroll_directory(args.bulk, args.workers, args.detector)
+    else:
+        register_new_person(args.detector, args.add_to)
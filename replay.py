@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+
+from detectors import DEFAULT_DETECTOR, DETECTORS, make_detector
+from encoding_store import load_gallery, load_thresholds
+from face_matcher import AGGREGATIONS, FaceMatcher
+from face_tracker import FaceTracker
+from metrics import LatencyStats
+from motion_gate import MotionGate
+from quantization import PRECISIONS
+from recognition import DELAY_SECONDS, DETECT_SCALES, recognize_frame, update_attendance
+
+# --- SETTINGS ---
+DB_NAME = "attendance.db"
+DEFAULT_FPS = 30.0
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class FrameFolderCapture:
+    """VideoCapture look-alike that yields the images in a folder in name order."""
+
+    def __init__(self, folder):
+        self.paths = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder)
+            if name.lower().endswith(IMAGE_EXTENSIONS))
+        self._next = 0
+
+    def read(self):
+        while self._next < len(self.paths):
+            frame = cv2.imread(self.paths[self._next])
+            self._next += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def release(self):
+        pass
+
+
+def open_source(path):
+    """Returns (capture, fps) for a video file or a folder of frames."""
+    if os.path.isdir(path):
+        return FrameFolderCapture(path), DEFAULT_FPS
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video: {path}")
+    return capture, capture.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+
+
+def replay(source, matcher, fps=DEFAULT_FPS, every=1, delay=DELAY_SECONDS, max_frames=None,
+           motion_gate=False, roi=None, scales=DETECT_SCALES, detector=None):
+    """
+    Runs the live detection, tracking, matching and dwell logic over a recorded source.
+    Time is taken from the frame index, so results do not depend on machine speed.
+    Door, LCD, audio, DB and email are never touched; admissions are only collected.
+    With motion_gate, frames are gated like the live loop and their cost is reported
+    separately as "frame_idle" and "frame_busy". first_recognized_seconds is the time
+    to the first recognized frame, including loading the dlib models on first use.
+    """
+    stats = LatencyStats()
+    tracker = FaceTracker()
+    gate = MotionGate(roi=roi, stats=stats) if motion_gate else None
+    todays_attendance_ids, detection_timers = set(), {}
+    recognized = []
+    frames = processed = 0
+    faces = []
+    first_recognized = None
+
+    start = time.perf_counter()
+    while max_frames is None or frames < max_frames:
+        with stats.timed("capture"):
+            ret, frame = source.read()
+        if not ret:
+            break
+        video_time = frames / fps
+        if frames % every == 0:
+            started = time.perf_counter()
+            stage, admitted = "frame", []
+            if gate is not None:
+                detect = gate.check(frame, video_time, tracking=bool(faces))
+                stage = "frame_busy" if gate.busy else "frame_idle"
+            if gate is None or detect:
+                faces = recognize_frame(frame, matcher, tracker, stats, now=video_time, roi=roi,
+                                         scales=scales, detector=detector)
+                _, _, admitted = update_attendance(
+                    faces, todays_attendance_ids, detection_timers, now=video_time, delay=delay,
+                    live_tracks=tracker.live_track_ids())
+                processed += 1
+                if first_recognized is None:
+                    first_recognized = time.perf_counter() - start
+                stats.incr("faces", len(faces))
+                stats.incr("unknown_faces", sum(1 for face in faces if face.student_id is None))
+            stats.record(stage, time.perf_counter() - started)
+            for student_id, name in admitted:
+                recognized.append({"student_id": student_id, "name": name, "time": round(video_time, 3)})
+        frames += 1
+    elapsed = time.perf_counter() - start
+
+    stages, counters = stats.snapshot()
+    return {
+        "frames": frames,
+        "processed_frames": processed,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+        "first_recognized_seconds": None if first_recognized is None else round(first_recognized, 3),
+        "stages": {stage: {k: round(v, 3) for k, v in s.items()} for stage, s in stages.items()},
+        "counters": counters,
+        "recognized": recognized,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless replay of recorded footage through the recognition logic.")
+    parser.add_argument("source", help="Video file or folder of frames")
+    parser.add_argument("--db", default=DB_NAME, help="Database with the enrolled students")
+    parser.add_argument("--every", type=int, default=1, help="Process every Nth frame")
+    parser.add_argument("--fps", type=float, help="Override the source frame rate")
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--min-fps", type=float, help="Exit with status 1 if throughput falls below this")
+    parser.add_argument("--motion-gate", action="store_true", help="Skip detection on static frames like the live loop")
+    parser.add_argument("--roi", type=float, nargs=4, metavar=("LEFT", "TOP", "RIGHT", "BOTTOM"),
+                        help="Only search this part of the frame (fractions, e.g. 0.25 0 0.75 1)")
+    parser.add_argument("--scales", type=float, nargs="+", default=DETECT_SCALES,
+                        help="Detection scale pyramid, coarse first (default: %(default)s)")
+    parser.add_argument("--detector", choices=sorted(DETECTORS), default=DEFAULT_DETECTOR)
+    parser.add_argument("--aggregation", choices=AGGREGATIONS, default="min",
+                        help="Score students by their nearest template or the mean over all of them")
+    parser.add_argument("--precision", choices=PRECISIONS, default="float32",
+                        help="Gallery storage: float32, or float16/int8/pq to save memory")
+    args = parser.parse_args()
+
+    gallery, ids, names = load_gallery(args.db)
+    matcher = FaceMatcher(gallery, ids, names, tolerance=0.5, thresholds=load_thresholds(args.db),
+                          aggregation=args.aggregation, precision=args.precision)
+    source, fps = open_source(args.source)
+    try:
+        report = replay(source, matcher, fps=args.fps or fps, every=args.every, max_frames=args.max_frames,
+                        motion_gate=args.motion_gate, roi=args.roi, scales=tuple(args.scales),
+                        detector=make_detector(args.detector))
+    finally:
+        source.release()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.min_fps is not None and report["fps"] < args.min_fps:
+        print(f"REGRESSION: {report['fps']} fps < {args.min_fps} fps", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# The modules are flat scripts at the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_setup import setup_database  # noqa: E402
+
+
+@pytest.fixture
+def db_name(tmp_path):
+    """A freshly migrated database file."""
+    path = str(tmp_path / "attendance.db")
+    conn = sqlite3.connect(path)
+    setup_database(conn)
+    conn.close()
+    return path
@@ -0,0 +1,137 @@
+import heapq
+import itertools
+import threading
+
+import pytest
+
+import actuators
+from actuators import (SERVO_CLOSED_DUTY, SERVO_MOVE_SECONDS, SERVO_OPEN_DUTY, ActuatorScheduler, AudioQueue,
+                       Door, LcdWriter, SimAudio, SimLcd, SimServo)
+
+
+class ManualScheduler:
+    """ActuatorScheduler on a virtual clock: events run when the test advances time, never on their own."""
+
+    def __init__(self, start=1000.0):
+        self.start = start  # well after 0, like the real monotonic clock
+        self.now = start
+        self._events = []
+        self._seq = itertools.count()
+
+    def monotonic(self):
+        return self.now
+
+    def schedule(self, delay, func, *args):
+        heapq.heappush(self._events, (self.now + delay, next(self._seq), func, args))
+
+    def call(self, func, *args):
+        self.schedule(0.0, func, *args)
+
+    def advance(self, seconds):
+        """Runs every event due within seconds, in time order, moving the clock to each one."""
+        deadline = self.now + seconds
+        while self._events and self._events[0][0] <= deadline:
+            when, _, func, args = heapq.heappop(self._events)
+            self.now = max(self.now, when)
+            func(*args)
+        self.now = deadline
+
+    def at(self, when):
+        """Seconds from the start to when."""
+        return round(when - self.start, 6)
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = ManualScheduler()
+    # The devices and simulators read the clock through actuators.time.
+    monkeypatch.setattr(actuators, "time", scheduler)
+    return scheduler
+
+
+def test_door_opens_then_closes_and_releases_the_pwm(scheduler):
+    servo = SimServo()
+    door = Door(servo, scheduler, open_seconds=5.0)
+    door.open()
+    scheduler.advance(10.0)
+
+    close_at = 5.0 + SERVO_MOVE_SECONDS
+    assert [(scheduler.at(when), duty) for when, duty in servo.events] == [
+        (0.0, SERVO_OPEN_DUTY), (SERVO_MOVE_SECONDS, 0), (close_at, SERVO_CLOSED_DUTY), (close_at + SERVO_MOVE_SECONDS, 0)]
+    assert not door.is_open
+
+
+def test_reopening_pushes_the_close_back(scheduler):
+    servo = SimServo()
+    door = Door(servo, scheduler, open_seconds=5.0)
+    door.open()
+    scheduler.advance(3.0)
+    door.open()  # the next student arrives while the door is still open
+    scheduler.advance(10.0)
+
+    # The servo is not moved again, and only the second open's close runs.
+    assert [duty for _, duty in servo.events] == [SERVO_OPEN_DUTY, 0, SERVO_CLOSED_DUTY, 0]
+    assert scheduler.at(servo.events[2][0]) == 3.0 + 5.0 + SERVO_MOVE_SECONDS
+
+
+def test_lcd_skips_text_already_on_screen(scheduler):
+    lcd = SimLcd()
+    writer = LcdWriter(lcd, scheduler, min_interval=0.2)
+    for _ in range(5):
+        writer.write("Scan your face", "")
+        scheduler.advance(1.0)
+
+    assert [(line1, line2) for _, line1, line2 in lcd.writes] == [("Scan your face", "")]
+
+
+def test_lcd_merges_writes_within_the_min_interval(scheduler):
+    lcd = SimLcd()
+    writer = LcdWriter(lcd, scheduler, min_interval=0.2)
+    writer.write("Welcome", "Ada")
+    scheduler.advance(0.0)
+    for name in ("Alan", "Grace", "Linus"):
+        writer.write("Welcome", name)
+        scheduler.advance(0.05)
+    scheduler.advance(1.0)
+
+    # The first write goes out at once; the next three collapse into the latest one, 0.2 s later.
+    assert [(scheduler.at(when), line2) for when, _, line2 in lcd.writes] == [(0.0, "Ada"), (0.2, "Linus")]
+    assert writer.writes == 2
+
+
+def test_lcd_flash_returns_to_the_resting_text(scheduler):
+    lcd = SimLcd()
+    writer = LcdWriter(lcd, scheduler, min_interval=0.2)
+    writer.write("Scan your face")
+    scheduler.advance(1.0)
+    writer.flash("Welcome", "Ada", 2.0)
+    scheduler.advance(5.0)
+
+    assert [(scheduler.at(when), line1) for when, line1, _ in lcd.writes] == [
+        (0.0, "Scan your face"), (1.0, "Welcome"), (3.0, "Scan your face")]
+
+
+def test_audio_plays_greetings_in_order_without_overlap(scheduler):
+    audio = SimAudio(length=1.5)
+    queue = AudioQueue(audio, scheduler)
+    for name in ("Ada Lovelace", "Alan Turing", "Grace Hopper"):
+        queue.play(name)
+    scheduler.advance(10.0)
+
+    assert [(scheduler.at(when), key) for when, key in audio.played] == [
+        (0.0, "adalovelace"), (1.5, "alanturing"), (3.0, "gracehopper")]
+
+
+def test_scheduler_runs_events_in_time_order():
+    scheduler = ActuatorScheduler()
+    ran, done = [], threading.Event()
+    try:
+        scheduler.schedule(0.02, ran.append, "late")
+        scheduler.schedule(0.01, ran.append, "middle")
+        scheduler.call(ran.append, "now")
+        scheduler.schedule(0.03, done.set)
+        assert done.wait(timeout=2)
+    finally:
+        scheduler.stop()
+
+    assert ran == ["now", "middle", "late"]
@@ -0,0 +1,27 @@
+import sqlite3
+
+import pytest
+
+from api_server import ReadOnlyPool
+
+
+def test_failed_connects_do_not_use_up_the_pool(tmp_path):
+    pool = ReadOnlyPool(str(tmp_path / "missing" / "attendance.db"), size=2)
+    try:
+        for _ in range(5):
+            with pytest.raises(sqlite3.OperationalError):
+                pool._query("SELECT 1", ())
+        assert pool._idle.qsize() == 2
+    finally:
+        pool.close()
+
+
+def test_pool_reuses_its_connections(db_name):
+    pool = ReadOnlyPool(db_name, size=1)
+    try:
+        assert pool._query("SELECT COUNT(*) AS n FROM Students", ()) == [{"n": 0}]
+        first = pool._idle.queue[0]
+        assert pool._query("SELECT 1 AS one", ()) == [{"one": 1}]
+        assert pool._idle.queue[0] is first
+    finally:
+        pool.close()
@@ -0,0 +1,65 @@
+import sqlite3
+import threading
+
+import pytest
+
+import attendance_writer
+from attendance_writer import AttendanceWriter
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(attendance_writer, "RETRY_SECONDS", 0.01)
+    monkeypatch.setattr(attendance_writer, "MAX_RETRY_SECONDS", 0.05)
+
+
+def present(db_name):
+    conn = sqlite3.connect(db_name)
+    try:
+        return sorted(row[0] for row in conn.execute("SELECT student_id FROM Attendance WHERE status = 'PRESENT'"))
+    finally:
+        conn.close()
+
+
+def hide_attendance_table(db_name, hidden=True):
+    """Makes every insert fail, like a write lock held past the timeout, until shown again."""
+    conn = sqlite3.connect(db_name)
+    old, new = ("Attendance", "AttendanceHidden") if hidden else ("AttendanceHidden", "Attendance")
+    conn.execute(f"ALTER TABLE {old} RENAME TO {new}")
+    conn.commit()
+    conn.close()
+
+
+def test_failed_batch_is_kept_and_retried(db_name):
+    writer = AttendanceWriter(db_name, max_delay=0.01)
+    hide_attendance_table(db_name)
+    writer.check_in(1)
+    writer.check_in(2)
+    flushed = threading.Event()
+    threading.Thread(target=lambda: (writer.flush(), flushed.set()), daemon=True).start()
+
+    # flush() waits while the batch cannot be written...
+    assert not flushed.wait(timeout=0.3)
+    assert writer.stats.snapshot()[1]["db_errors"] >= 2
+
+    # ...and returns once the retry gets it in.
+    hide_attendance_table(db_name, hidden=False)
+    assert flushed.wait(timeout=5)
+    writer.close()
+    assert present(db_name) == [1, 2]
+
+
+def test_close_gives_up_after_a_last_attempt(db_name, capsys):
+    writer = AttendanceWriter(db_name, max_delay=0.01)
+    hide_attendance_table(db_name)
+    writer.check_in(7)
+    writer.close()
+
+    assert "1 check-in(s) could not be saved" in capsys.readouterr().out
+    with pytest.raises(RuntimeError):
+        writer.check_in(8)
+
+
+def test_a_database_that_cannot_be_opened_fails_the_caller(tmp_path):
+    with pytest.raises(sqlite3.OperationalError):
+        AttendanceWriter(str(tmp_path / "missing" / "attendance.db"))
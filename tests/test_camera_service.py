@@ -0,0 +1,103 @@
+import cv2
+import numpy as np
+import pytest
+
+import camera_service
+import recognition
+from actuators import SERVO_OPEN_DUTY, make_actuators
+from camera_service import Camera, load_cameras, run_service
+from face_matcher import FaceMatcher
+
+ADA = np.full(128, 0.1)
+
+
+class BrightFaceDetector:
+    """Sees one face in the middle of every bright frame."""
+
+    def detect(self, rgb_image):
+        height, width = rgb_image.shape[:2]
+        if rgb_image.mean() < 128:
+            return []
+        return [(height // 4, 3 * width // 4, 3 * height // 4, width // 4)]
+
+
+class FakeFaceRecognition:
+    @staticmethod
+    def face_encodings(rgb_image, locations):
+        return [ADA for _ in locations]
+
+
+@pytest.fixture(autouse=True)
+def fake_encoder(monkeypatch):
+    monkeypatch.setattr(recognition, "face_recognition", FakeFaceRecognition)
+
+
+@pytest.fixture(autouse=True)
+def quick_doors(monkeypatch):
+    """Simulated doors and welcome messages that end after 0.1 s, so closing a camera does not wait for them."""
+    monkeypatch.setattr(camera_service, "WELCOME_SECONDS", 0.1)
+    def quick_actuators(**settings):
+        hardware = make_actuators(**settings)
+        hardware.door.open_seconds = 0.1
+        return hardware
+    monkeypatch.setattr(camera_service, "make_actuators", quick_actuators)
+
+
+def frame_folder(path, frames, face_frames):
+    path.mkdir()
+    for i in range(frames):
+        frame = np.full((120, 160, 3), 255 if i in face_frames else 0, dtype=np.uint8)
+        cv2.imwrite(str(path / f"{i:04d}.png"), frame)
+    return str(path)
+
+
+def run(source, delay=1.0):
+    camera = Camera("door", source, simulate=True)
+    camera.detector = BrightFaceDetector()
+    admissions = []
+
+    def admit(camera, student_id, name):
+        admissions.append(name)
+        camera.welcome(name)
+
+    matcher = FaceMatcher(np.array([ADA]), [1], ["Ada Lovelace"], tolerance=0.5)
+    report = run_service([camera], matcher, admit, workers=2, delay=delay, duration=60)
+    return report["door"], admissions, camera.hardware
+
+
+def test_frame_folder_admits_on_video_time(tmp_path):
+    # 3 s at 30 fps with a face from frame 20 to 79: 2 s in view, twice the dwell time.
+    report, admissions, _ = run(frame_folder(tmp_path / "clip", 90, range(20, 80)))
+
+    assert report["frames"] == 90
+    assert report["processed_frames"] == 90
+    assert admissions == ["Ada Lovelace"]
+    # First seen at frame 20; admitted on the first frame a full second of video later.
+    assert report["admitted"] == [{"student_id": 1, "name": "Ada Lovelace", "time": round(50 / 30, 3)}]
+
+
+def test_frame_folder_does_not_admit_a_short_visit(tmp_path):
+    report, admissions, hardware = run(frame_folder(tmp_path / "clip", 90, range(20, 45)))
+
+    assert report["processed_frames"] == 90
+    assert admissions == []
+    assert report["admitted"] == []
+
+
+def test_an_admission_drives_that_camera_s_door(tmp_path):
+    _, _, hardware = run(frame_folder(tmp_path / "clip", 90, range(20, 80)))
+    servo, lcd, audio = hardware.backends
+
+    assert [duty for _, duty in servo.events][:1] == [SERVO_OPEN_DUTY]
+    assert [key for _, key in audio.played] == ["adalovelace"]
+    assert ("Welcome:", "Ada Lovelace") in [(line1, line2) for _, line1, line2 in lcd.writes]
+
+
+def test_hardware_settings_are_read_per_camera(tmp_path):
+    config = tmp_path / "cameras.json"
+    config.write_text('[{"name": "a", "source": 0, "servo_pin": 18, "simulate": true},'
+                      ' {"name": "b", "source": 1, "lcd_address": 38}]')
+    a, b = load_cameras(str(config))
+
+    assert (a.hardware_settings["servo_pin"], a.hardware_settings["simulate"]) == (18, True)
+    assert (b.hardware_settings["lcd_address"], b.hardware_settings["simulate"]) == (38, False)
@@ -0,0 +1,38 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+import jobs
+from database_setup import setup_database
+from jobs import Job, JobScheduler
+
+
+def test_a_failing_job_is_retried_later_and_the_day_stays_open(db_name):
+    calls = []
+
+    def report(date_str):
+        calls.append(date_str)
+        raise ValueError("SMTP down")
+
+    scheduler = JobScheduler([Job("report", "00:00", report)], db_name)
+    now = datetime(2024, 3, 1, 18, 0)
+    assert scheduler.run_pending(now)[0][:2] == ("report", "2024-03-01")
+    assert scheduler.run_pending(now) == []  # waiting out RETRY_SECONDS
+    assert calls == ["2024-03-01"]
+
+
+def test_scheduler_thread_survives_database_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_SLEEP_SECONDS", 0.1)  # the thread wakes up every second
+    db_name = str(tmp_path / "attendance.db")
+    sqlite3.connect(db_name).close()  # no JobRuns table yet: every check fails
+    ran = threading.Event()
+    scheduler = JobScheduler([Job("report", "00:00", lambda date_str: ran.set())], db_name).start()
+    try:
+        assert not ran.wait(timeout=0.2)
+        conn = sqlite3.connect(db_name)
+        setup_database(conn)
+        conn.close()
+        assert ran.wait(timeout=5)
+        assert scheduler._thread.is_alive()
+    finally:
+        scheduler.stop(timeout=5)
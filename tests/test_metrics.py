@@ -0,0 +1,24 @@
+import socket
+import urllib.request
+
+from metrics import LatencyStats, MetricsServer
+
+
+def test_metrics_are_served_on_localhost():
+    stats = LatencyStats()
+    stats.record("detect", 0.01)
+    server = MetricsServer.try_start(lambda: [({}, stats)], 0)
+    try:
+        assert server._server.server_address[0] == "127.0.0.1"
+        body = urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5).read().decode()
+        assert 'stage="detect"' in body
+    finally:
+        server.stop()
+
+
+def test_a_port_in_use_does_not_stop_start_up(capsys):
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        assert MetricsServer.try_start(lambda: [], taken.getsockname()[1]) is None
+    assert "continuing without the endpoint" in capsys.readouterr().out
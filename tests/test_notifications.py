@@ -0,0 +1,147 @@
+import socketserver
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from notifications import NotificationDispatcher, TokenBucket, enqueue_absence_notices
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+class FakeTransport:
+    """Records every message; fail maps a recipient to how many sends fail before one succeeds."""
+
+    def __init__(self, fail=None):
+        self.sent = []
+        self.attempts = []
+        self.fail = dict(fail or {})
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        with self._lock:
+            recipient = message["To"]
+            self.attempts.append((recipient, time.monotonic()))
+            if self.fail.get(recipient, 0) > 0:
+                self.fail[recipient] -= 1
+                raise ConnectionError("temporary failure")
+            self.sent.append(recipient)
+            return f"id-{len(self.sent)}"
+
+
+def enqueue(db_name, count, date_str="2024-03-01"):
+    conn = sqlite3.connect(db_name)
+    enqueue_absence_notices(conn, [(i, f"Student {i}", f"guardian{i}@example.com") for i in range(count)], date_str)
+    conn.commit()
+    conn.close()
+
+
+def outbox(db_name):
+    conn = sqlite3.connect(db_name)
+    try:
+        return conn.execute("SELECT recipient, status, attempts FROM NotificationOutbox ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def dispatcher(transport, db_name, **kwargs):
+    options = dict(workers=4, rate=1000.0, burst=1000, backoff=0.01)
+    options.update(kwargs)
+    return NotificationDispatcher(transport, db_name, **options)
+
+
+def test_token_bucket_limits_sustained_rate():
+    bucket = TokenBucket(rate=50.0, capacity=2)
+    start = time.monotonic()
+    for _ in range(7):
+        bucket.acquire()
+    # Two tokens are free; the other five arrive at 50 per second.
+    assert time.monotonic() - start >= 0.09
+
+
+def test_dispatcher_is_rate_limited_across_workers(db_name):
+    enqueue(db_name, 6)
+    transport = FakeTransport()
+    dispatcher(transport, db_name, rate=20.0, burst=2).run_until_empty()
+
+    times = sorted(t for _, t in transport.attempts)
+    assert len(transport.sent) == 6
+    assert times[-1] - times[0] >= 0.18  # (6 - 2 burst) / 20 per second
+
+
+def test_transient_failure_is_retried(db_name):
+    enqueue(db_name, 2)
+    transport = FakeTransport(fail={"guardian0@example.com": 2})
+    dispatcher(transport, db_name).run_until_empty()
+
+    assert sorted(transport.sent) == ["guardian0@example.com", "guardian1@example.com"]
+    assert outbox(db_name) == [("guardian0@example.com", "SENT", 3), ("guardian1@example.com", "SENT", 1)]
+
+
+def test_row_is_failed_after_max_attempts(db_name):
+    enqueue(db_name, 1)
+    transport = FakeTransport(fail={"guardian0@example.com": 99})
+    dispatcher(transport, db_name, max_attempts=3).run_until_empty()
+
+    assert transport.sent == []
+    assert len(transport.attempts) == 3
+    assert outbox(db_name) == [("guardian0@example.com", "FAILED", 3)]
+
+
+def test_delivered_rows_are_not_sent_again(db_name):
+    enqueue(db_name, 3)
+    transport = FakeTransport()
+    dispatcher(transport, db_name).run_until_empty()
+    # A second run, and the same day's report queued again, send nothing new.
+    enqueue(db_name, 3)
+    dispatcher(transport, db_name).run_until_empty()
+
+    assert len(transport.sent) == 3
+    assert [status for _, status, _ in outbox(db_name)] == ["SENT"] * 3
+
+
+class FakeSmtpHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib.send_message; records each recipient."""
+
+    def handle(self):
+        self.wfile.write(b"220 fake ESMTP\r\n")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b"DATA":
+                self.wfile.write(b"354 go ahead\r\n")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.wfile.write(b"250 queued\r\n")
+            elif command == b"RCPT":
+                self.server.recipients.append(line.decode().split("<")[1].split(">")[0])
+                self.wfile.write(b"250 ok\r\n")
+            elif command == b"QUIT":
+                self.wfile.write(b"221 bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 ok\r\n")
+
+
+def test_command_line_drains_pending_rows(db_name):
+    enqueue(db_name, 3)
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeSmtpHandler)
+    server.daemon_threads = True
+    server.recipients = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        result = subprocess.run(
+            [sys.executable, str(REPO / "notifications.py"), "--db", db_name,
+             "--smtp", f"127.0.0.1:{server.server_address[1]}"],
+            cwd=REPO, capture_output=True, text=True, timeout=60)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert result.returncode == 0, result.stderr
+    assert sorted(server.recipients) == [f"guardian{i}@example.com" for i in range(3)]
+    assert [status for _, status, _ in outbox(db_name)] == ["SENT"] * 3
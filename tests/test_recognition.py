@@ -0,0 +1,71 @@
+import numpy as np
+
+from face_matcher import Match
+from face_tracker import MAX_MISSED, FaceTracker
+from metrics import LatencyStats
+from recognition import detect_faces, update_attendance
+
+
+class FixedFaceDetector:
+    """Finds one face of the same size (in detection pixels) at every scale."""
+
+    def __init__(self, size):
+        self.size = size
+        self.shapes = []
+
+    def detect(self, rgb_image):
+        self.shapes.append(rgb_image.shape[:2])
+        return [(10, 10 + self.size, 10 + self.size, 10)]
+
+
+def test_every_resize_is_timed_as_its_own_stage():
+    stats = LatencyStats()
+    detector = FixedFaceDetector(15)  # 60 px at 0.25, 30 px at 0.5: too small for the coarse pass
+    boxes = detect_faces(np.zeros((480, 640, 3), dtype=np.uint8), (0.25, 0.5), stats=stats, detector=detector)
+
+    stages, counters = stats.snapshot()
+    assert detector.shapes == [(120, 160), (240, 320)]
+    assert stages["resize"]["count"] == 2
+    assert counters["detect_escalations"] == 1
+    assert boxes == [(20, 50, 50, 20)]
+
+
+def test_a_doorway_sized_face_stops_at_the_coarse_scale():
+    stats = LatencyStats()
+    detector = FixedFaceDetector(30)  # 120 px tall in the 480 px frame
+    boxes = detect_faces(np.zeros((480, 640, 3), dtype=np.uint8), (0.25, 0.5), stats=stats, detector=detector)
+
+    assert detector.shapes == [(120, 160)]
+    assert "detect_escalations" not in stats.snapshot()[1]
+    assert boxes == [(40, 160, 160, 40)]
+
+
+def test_detect_faces_works_without_stats():
+    detector = FixedFaceDetector(20)
+    assert detect_faces(np.zeros((100, 100, 3), dtype=np.uint8), (1,), detector=detector) == [(10, 30, 30, 10)]
+
+
+def track_frames(frames, delay=1.0):
+    """Runs (time, face visible) frames of one student through the tracker and dwell rule."""
+    tracker, admitted_at, timers, checked_in = FaceTracker(), [], {}, set()
+    box = (100, 200, 200, 100)
+    for now, visible in frames:
+        locations = [box] if visible else []
+        tracks, to_encode = tracker.update(locations, now)
+        tracker.assign([tracks[i] for i in to_encode], [Match(1, "Ada Lovelace", 0.3)] * len(to_encode), now)
+        _, _, admitted = update_attendance(tracker.snapshot(tracks), checked_in, timers, now=now, delay=delay,
+                                           live_tracks=tracker.live_track_ids())
+        admitted_at += [now for _ in admitted]
+    return admitted_at, timers
+
+
+def test_a_missed_detection_keeps_the_dwell_time():
+    admitted_at, _ = track_frames([(0.0, True), (0.4, True), (0.6, False), (0.8, True), (1.0, True), (1.2, True)])
+    assert admitted_at == [1.0]
+
+
+def test_the_timer_goes_with_a_dropped_track():
+    frames = [(0.0, True)] + [(0.1 * (i + 1), False) for i in range(MAX_MISSED + 1)]
+    admitted_at, timers = track_frames(frames)
+    assert admitted_at == []
+    assert timers == {}
@@ -0,0 +1,126 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+import register_person
+from database_setup import MIGRATIONS
+
+
+@pytest.fixture
+def baseline_db(tmp_path, monkeypatch):
+    """A database created by the original database_setup.py: two tables, no migrations."""
+    path = str(tmp_path / "attendance.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE Students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            guardian_phone TEXT,
+            guardian_email TEXT,
+            face_encoding BLOB NOT NULL
+        );
+        CREATE TABLE Attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            check_in_time TEXT,
+            status TEXT NOT NULL,
+            FOREIGN KEY (student_id) REFERENCES Students (id)
+        );
+    """)
+    conn.close()
+    monkeypatch.setattr(register_person, "DB_NAME", path)
+    return path
+
+
+def encoding(seed):
+    return np.random.default_rng(seed).normal(size=128)
+
+
+def counts(db_name):
+    conn = sqlite3.connect(db_name)
+    try:
+        return (conn.execute("PRAGMA user_version").fetchone()[0],
+                conn.execute("SELECT COUNT(*) FROM Students").fetchone()[0],
+                conn.execute("SELECT COUNT(*) FROM FaceTemplates").fetchone()[0])
+    finally:
+        conn.close()
+
+
+def test_save_encoding_migrates_a_baseline_database(baseline_db):
+    register_person.save_encoding_to_db("Ada", "Lovelace", encoding(0), [encoding(1), encoding(2)])
+
+    assert counts(baseline_db) == (len(MIGRATIONS), 1, 2)
+
+
+def test_add_templates_migrates_a_baseline_database(baseline_db):
+    conn = sqlite3.connect(baseline_db)
+    with conn:
+        conn.execute("INSERT INTO Students (first_name, last_name, face_encoding) VALUES ('Ada', 'Lovelace', x'00')")
+    conn.close()
+
+    register_person.add_templates_to_student(1, [encoding(3)])
+
+    assert counts(baseline_db) == (len(MIGRATIONS), 1, 1)
+
+
+def test_enroll_directory_migrates_a_baseline_database(baseline_db, tmp_path, monkeypatch):
+    photos = tmp_path / "photos"
+    for folder in ("Ada_Lovelace", "Alan_Turing"):
+        (photos / folder).mkdir(parents=True)
+
+    def fake_enroll_folder(path, detector_name=None):
+        return path, encoding(4), [encoding(5), encoding(6)]
+
+    # Threads instead of processes, so the monkeypatched enroll_folder is the one called.
+    monkeypatch.setattr(register_person, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(register_person, "enroll_folder", fake_enroll_folder)
+    register_person.enroll_directory(str(photos), workers=1)
+
+    # FaceTemplates holds the single faces kept next to each averaged template.
+    assert counts(baseline_db) == (len(MIGRATIONS), 2, 2 * (register_person.ENROLL_TEMPLATES - 1))
+
+
+class BatchRecordingDetector:
+    """Finds one large face in every image and records the size of every batch."""
+
+    def __init__(self):
+        self.batches = []
+
+    def detect_batch(self, rgb_images):
+        self.batches.append(len(rgb_images))
+        return [[(5, image.shape[1] - 5, image.shape[0] - 5, 5)] for image in rgb_images]
+
+
+class FakeFaceRecognition:
+    @staticmethod
+    def load_image_file(path):
+        return cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2RGB)
+
+    @staticmethod
+    def face_landmarks(rgb_image, locations, model="large"):
+        return []
+
+    @staticmethod
+    def face_encodings(rgb_image, locations):
+        return [encoding(7) for _ in locations]
+
+
+def test_enroll_folder_detects_same_sized_photos_in_one_batch(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    for i, (height, width) in enumerate([(400, 300)] * 3 + [(300, 300)] * 2):
+        cv2.imwrite(str(tmp_path / f"{i}.png"), rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+    (tmp_path / "notes.txt").write_text("not a photo")
+    detector = BatchRecordingDetector()
+    monkeypatch.setattr(register_person, "face_recognition", FakeFaceRecognition)
+    monkeypatch.setattr(register_person, "make_detector", lambda name: detector)
+
+    path, template, encodings = register_person.enroll_folder(str(tmp_path))
+
+    assert sorted(detector.batches) == [2, 3]
+    assert len(encodings) == 5
+    assert np.allclose(template, encoding(7))